@@ -0,0 +1,110 @@
+"""
+Bearer-token validation cache.
+
+Resolving a Spotify access token to a user means a ``/me`` round-trip.
+``TokenCache`` remembers the outcome, keyed by a hash of the token so raw
+tokens are never held as dictionary keys, until the token itself expires.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def hash_token(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
+class AuthSession:
+    """A validated access token and the Spotify user it belongs to."""
+
+    __slots__ = ("access_token", "user_id", "product", "expires_at", "profile")
+
+    def __init__(self, access_token: str, profile: Dict[str, Any], expires_at: float):
+        self.access_token = access_token
+        self.user_id = profile["id"]
+        self.product = profile.get("product", "free")
+        self.expires_at = expires_at
+        self.profile = profile
+
+    @property
+    def is_premium(self) -> bool:
+        return self.product == "premium"
+
+
+class TokenCache:
+    """Bounded map of token hash -> AuthSession that honours token expiry."""
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._sessions: "OrderedDict[str, AuthSession]" = OrderedDict()
+        self._expiry_hints: "OrderedDict[str, float]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def remember_expiry(self, access_token: str, expires_at: float) -> None:
+        """Record when a token issued by our own OAuth routes expires."""
+        self._expiry_hints[hash_token(access_token)] = expires_at
+        while len(self._expiry_hints) > self.max_entries:
+            self._expiry_hints.popitem(last=False)
+
+    def invalidate(self, access_token: str) -> None:
+        key = hash_token(access_token)
+        self._sessions.pop(key, None)
+        self._expiry_hints.pop(key, None)
+
+    def get(self, access_token: str) -> Optional[AuthSession]:
+        key = hash_token(access_token)
+        session = self._sessions.get(key)
+        if session is None:
+            return None
+        if session.expires_at <= time.time():
+            del self._sessions[key]
+            return None
+        self._sessions.move_to_end(key)
+        return session
+
+    async def resolve(
+        self,
+        access_token: str,
+        fetch_profile: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> AuthSession:
+        session = self.get(access_token)
+        if session is not None:
+            self.hits += 1
+            return session
+
+        key = hash_token(access_token)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            profile = await fetch_profile()
+            expires_at = self._expiry_hints.pop(key, time.time() + self.default_ttl)
+            session = AuthSession(access_token, profile, expires_at)
+            self._sessions[key] = session
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(session)
+            return session
+        finally:
+            del self._inflight[key]
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions), "hits": self.hits, "misses": self.misses}
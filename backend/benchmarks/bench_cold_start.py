@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark: how long a fresh backend process takes to serve.
+
+Each run starts a new ``uvicorn server:app`` process against the local
+Spotify stub and measures, from spawn:
+
+- ready: the first ``/api/health`` answer
+- first search: the latency of the first ``/api/search`` after that, which
+  pays for anything deferred to first use
+
+It also collects the worker's own startup report from ``/api/stats``
+(``time_to_ready_s`` and the import and warm-up phases). Pass
+``--profile-imports`` to add per-module import times (``STARTUP_PROFILE=1``);
+tracing imports makes them slightly slower.
+
+Usage: python benchmarks/bench_cold_start.py [--runs 10] [--profile-imports]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from harness import (
+    OPS_HEADERS, OPS_TOKEN, SERVER_PORT, STUB_PORT, UNGOVERNED_ENV, start_process, stub_env, wait_ready,
+)
+
+BASE_URL = f"http://127.0.0.1:{SERVER_PORT}"
+
+
+async def poll_health(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{BASE_URL}/api/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.005)
+    raise RuntimeError("backend did not become ready")
+
+
+async def cold_start(env: dict) -> dict:
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        started = time.perf_counter()
+        server = start_process(
+            ["-m", "uvicorn", "server:app", "--port", str(SERVER_PORT), "--log-level", "warning"],
+            {**stub_env(), **UNGOVERNED_ENV, "OPS_TOKEN": OPS_TOKEN, **env},
+        )
+        try:
+            await poll_health(client)
+            ready = time.perf_counter() - started
+            search_started = time.perf_counter()
+            response = await client.get(
+                f"{BASE_URL}/api/search", params={"q": "cold start"}, headers={"Authorization": "Bearer bench-token"}
+            )
+            response.raise_for_status()
+            first_search = time.perf_counter() - search_started
+            startup = (await client.get(f"{BASE_URL}/api/stats", headers=OPS_HEADERS)).json().get("startup")
+        finally:
+            server.terminate()
+            server.wait()
+    return {"ready_s": round(ready, 3), "first_search_ms": round(first_search * 1000, 1), "startup": startup}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--profile-imports", action="store_true")
+    args = parser.parse_args()
+
+    env = {"STARTUP_PROFILE": "1"} if args.profile_imports else {}
+    stub = start_process(["benchmarks/spotify_stub.py"], {"STUB_PORT": str(STUB_PORT)})
+    try:
+        await wait_ready(f"http://127.0.0.1:{STUB_PORT}/docs")
+        runs = []
+        for _ in range(args.runs):
+            run = await cold_start(env)
+            runs.append(run)
+            print(json.dumps(run))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(json.dumps({
+        "runs": len(runs),
+        "ready_s": {"median": round(statistics.median(r["ready_s"] for r in runs), 3),
+                    "min": min(r["ready_s"] for r in runs)},
+        "first_search_ms": {"median": round(statistics.median(r["first_search_ms"] for r in runs), 1)},
+    }))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
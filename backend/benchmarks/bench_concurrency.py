@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the backend against the local Spotify stub.
+
+Starts the stub and the backend as subprocesses, then drives /api/search at
+increasing concurrency. With non-blocking upstream calls, throughput should
+grow with concurrency instead of staying pinned at 1000 / STUB_LATENCY_MS.
+
+Usage: python benchmarks/bench_concurrency.py [--requests 400] [--levels 1,8,32,64]
+"""
+
+import argparse
+import asyncio
+import json
+
+from harness import UNGOVERNED_ENV, run_load, stub_and_server
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--levels", default="1,8,32,64")
+    args = parser.parse_args()
+
+    headers = {"Authorization": "Bearer bench-token"}
+    async with stub_and_server(server_env=UNGOVERNED_ENV) as base_url:
+        for level in (int(x) for x in args.levels.split(",")):
+            # Distinct queries per level so every request reaches the stub, not the search cache
+            result = await run_load(
+                lambda i: f"{base_url}/api/search?q=bench-{level}-{i}&type=track&limit=10",
+                level,
+                args.requests,
+                lambda i: headers,
+            )
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Response encoding benchmark: encode time and bytes on the wire per route.
+
+Runs in-process on the stub's payloads (no stub or server). "before" is
+FastAPI's default path for a returned dict: ``jsonable_encoder`` followed by
+Starlette's stdlib ``json.dumps``. "after" is what the routes do now:
+``available_markets`` stripped once when the payload enters the cache,
+then orjson per response, and optionally a ``fields`` projection. Wire
+sizes use the compression middleware's own gzip level / brotli quality.
+Bodies below the middleware's threshold are reported uncompressed.
+
+Usage: python benchmarks/bench_encoding.py [--iterations 2000] [--min-bytes 1024]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from harness import BACKEND_DIR, percentile
+from spotify_stub import full_track
+
+sys.path.insert(0, BACKEND_DIR)
+
+import orjson  # noqa: E402
+
+from compression import _Compressor, brotli  # noqa: E402
+from projections import SLIM_BY_TYPE, parse_fields, project, strip_unused  # noqa: E402
+
+
+def stdlib_render(content) -> bytes:
+    # Starlette's JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def search_payload(limit: int) -> dict:
+    items = [full_track(i) for i in range(limit)]
+    return {"tracks": {"items": items, "total": 1000, "limit": limit, "offset": 0, "href": "", "next": None}}
+
+
+def routes() -> list:
+    search = search_payload(50)
+    # The stub answers every search type with tracks
+    slim_all = {kind: [SLIM_BY_TYPE["track"](item) for item in search["tracks"]["items"][:10]]
+                for kind in ("tracks", "artists", "playlists")}
+    playback = {
+        "is_playing": True,
+        "progress_ms": 1000,
+        "device": {"id": "device1", "name": "Stub Device", "volume_percent": 50},
+        "item": full_track(0),
+    }
+    devices = {"devices": [{"id": "device1", "name": "Stub Device", "is_active": True}]}
+    return [
+        # (route, raw payload, strip markets?, fields filter)
+        ("/api/search?limit=50", search, True, None),
+        ("/api/search?limit=50&fields=...", search, True, "tracks.items(id,name,uri,artists(name),album(name,images)),tracks.total"),
+        ("/api/search/all", slim_all, False, None),
+        ("/api/playback/state", playback, True, None),
+        ("/api/playback/state?fields=...", playback, True, "is_playing,progress_ms,item(id,name,duration_ms)"),
+        ("/api/devices", devices, False, None),
+    ]
+
+
+def timed(fn, iterations: int) -> float:
+    """Median microseconds per call over ``iterations`` calls."""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return round(percentile(samples, 50) * 1e6, 1)
+
+
+def wire_sizes(body: bytes, min_bytes: int) -> dict:
+    if len(body) < min_bytes:
+        return {"gzip": len(body), "br": len(body)}
+    sizes = {"gzip": len(_Compressor("gzip", 5, 4).compress(body, final=True))}
+    sizes["br"] = len(_Compressor("br", 5, 4).compress(body, final=True)) if brotli is not None else None
+    return sizes
+
+
+def bench(route: str, payload, strip: bool, fields, iterations: int, min_bytes: int) -> dict:
+    before = stdlib_render(jsonable_encoder(payload))
+    cached = strip_unused(payload) if strip else payload
+    spec = parse_fields(fields) if fields else None
+    after = orjson.dumps(project(cached, spec))
+    return {
+        "route": route,
+        "before_encode_us": timed(lambda: stdlib_render(jsonable_encoder(payload)), iterations),
+        "after_encode_us": timed(lambda: orjson.dumps(project(cached, spec)), iterations),
+        # Paid once per upstream fetch, not per response, for cached search results
+        "strip_us": timed(lambda: strip_unused(payload), iterations) if strip else 0.0,
+        "before_bytes": len(before),
+        "after_bytes": len(after),
+        "after_wire_bytes": wire_sizes(after, min_bytes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--min-bytes", type=int, default=1024)
+    args = parser.parse_args()
+    for route, payload, strip, fields in routes():
+        print(json.dumps(bench(route, payload, strip, fields, args.iterations, args.min_bytes)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+NDJSON export benchmark: time-to-first-byte, total time and server memory.
+
+For each playlist size the stub is restarted to serve a playlist of that
+many tracks, and ``/api/export/playlists/{id}/tracks`` is streamed to the
+end. The baseline is what a buffered route would pay: paging through the
+stub one page after another before it could answer.
+
+Usage: python benchmarks/bench_export.py [--sizes 1000,10000] [--window 4]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from harness import OPS_HEADERS, STUB_PORT, UNGOVERNED_ENV, stub_and_server
+
+PAGE_SIZE = 100
+
+
+async def sequential_baseline(size: int) -> float:
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{STUB_PORT}/v1", timeout=60.0) as client:
+        for offset in range(0, size, PAGE_SIZE):
+            response = await client.get("/playlists/playlist0/tracks", params={"offset": offset, "limit": PAGE_SIZE})
+            response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def bench(size: int, window: int) -> dict:
+    stub_env = {"STUB_PLAYLIST_TRACKS": str(size)}
+    async with stub_and_server(server_env={**UNGOVERNED_ENV, "EXPORT_WINDOW": str(window)}, stub_extra_env=stub_env) as base_url:
+        headers = {"Authorization": "Bearer bench-token"}
+        async with httpx.AsyncClient(base_url=base_url, timeout=120.0, headers=headers) as client:
+            # Warm up token validation and the connection pool
+            (await client.get("/api/user/profile")).raise_for_status()
+            before = (await client.get("/api/stats", headers=OPS_HEADERS)).json()["process"]
+
+            rows = 0
+            in_order = True
+            first_byte = None
+            started = time.perf_counter()
+            async with client.stream("GET", "/api/export/playlists/playlist0/tracks") as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    if not line:
+                        continue
+                    in_order = in_order and json.loads(line)["position"] == rows
+                    rows += 1
+            elapsed = time.perf_counter() - started
+            after = (await client.get("/api/stats", headers=OPS_HEADERS)).json()["process"]
+
+        baseline = await sequential_baseline(size)
+
+    return {
+        "tracks": size,
+        "rows": rows,
+        "in_order": in_order,
+        "window": window,
+        "ttfb_ms": round(first_byte * 1000, 1),
+        "total_ms": round(elapsed * 1000, 1),
+        "sequential_paging_ms": round(baseline * 1000, 1),
+        "server_peak_rss_growth_kb": after["peak_rss_kb"] - before["peak_rss_kb"],
+        "server_peak_rss_kb": after["peak_rss_kb"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--window", type=int, default=4)
+    args = parser.parse_args()
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(json.dumps(await bench(size, args.window)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
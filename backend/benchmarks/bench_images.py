@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Image proxy benchmark: bytes per page and proxy latency, cold vs cached.
+
+The stub serves generated album art (640 px JPEGs, plus the 300 and 64 px
+sizes Spotify also lists). The "before" page loads what the frontend
+draws from Spotify's own URLs: ``images[0]`` (640 px) for the top result,
+artist and playlist cards, and ``images[2]`` (64 px) for track rows.
+"after" loads the same slots from the URLs the backend rewrote to
+``/api/images``, WebP-negotiated like a browser.
+
+Latency is measured three ways:
+
+- cold: the original is fetched from the stub and the variant rendered
+- render: the original is already on disk, only the variant is rendered
+- cached: the variant is served from disk
+
+Usage: python benchmarks/bench_images.py [--images 50] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import httpx
+
+from harness import OPS_HEADERS, STUB_PORT, UNGOVERNED_ENV, percentile, stub_and_server
+
+STUB_IMAGES = f"http://127.0.0.1:{STUB_PORT}/image"
+BROWSER_ACCEPT = {"Accept": "image/avif,image/webp,*/*"}
+# Slots on a search results page: (cards drawn from images[0], rows drawn from images[2])
+PAGE_CARDS = 13
+PAGE_ROWS = 10
+
+
+async def total_bytes(client: httpx.AsyncClient, urls, headers=None) -> int:
+    responses = await asyncio.gather(*(client.get(url, headers=headers) for url in urls))
+    for response in responses:
+        response.raise_for_status()
+    return sum(len(response.content) for response in responses)
+
+
+async def timed_gets(client: httpx.AsyncClient, urls, concurrency: int, headers=None) -> dict:
+    latencies = []
+    remaining = iter(urls)
+
+    async def worker():
+        for url in remaining:
+            started = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            if response.is_error:
+                response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        server_env = {
+            **UNGOVERNED_ENV,
+            "IMAGE_PROXY_HOSTS": f"127.0.0.1:{STUB_PORT}",
+            "IMAGE_CACHE_DIR": cache_dir,
+        }
+        async with stub_and_server(server_env=server_env, stub_extra_env={"STUB_IMAGE_URL": STUB_IMAGES}) as base_url:
+            headers = {"Authorization": "Bearer bench-token"}
+            async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+                search = await client.get("/api/search", params={"q": "images", "limit": PAGE_CARDS + PAGE_ROWS},
+                                          headers=headers)
+                items = search.json()["tracks"]["items"]
+                rewritten = [item["album"]["images"] for item in items]
+                print(json.dumps({"rewritten_images": rewritten[0]}))
+
+                # Spotify's own URLs for the same slots
+                originals = [httpx.URL(images[0]["url"]).params["src"] for images in rewritten]
+                before = await total_bytes(client, originals[:PAGE_CARDS]) + await total_bytes(
+                    client, [f"{url}-64" for url in originals[PAGE_CARDS:]]
+                )
+                after = await total_bytes(
+                    client,
+                    [images[0]["url"] for images in rewritten[:PAGE_CARDS]]
+                    + [images[-1]["url"] for images in rewritten[PAGE_CARDS:]],
+                    headers=BROWSER_ACCEPT,
+                )
+                print(json.dumps({
+                    "page": f"{PAGE_CARDS} cards + {PAGE_ROWS} rows",
+                    "before_bytes": before,
+                    "after_bytes": after,
+                    "ratio": round(after / before, 3),
+                }))
+
+                widths = [image["width"] for image in rewritten[0]]
+                sizes = {"upstream_640_jpeg": len((await client.get(originals[0])).content)}
+                for image in rewritten[0]:
+                    for label, accept in (("webp", BROWSER_ACCEPT), ("jpeg", {"Accept": "image/jpeg"})):
+                        response = await client.get(image["url"], headers=accept)
+                        sizes[f"{image['width']}_{label}"] = len(response.content)
+                print(json.dumps({"variant_bytes": sizes}))
+
+                # Album IDs past the page, so nothing is cached yet
+                first = PAGE_CARDS + PAGE_ROWS
+                ids = range(first, first + args.images)
+                proxied = [f"{base_url}/api/images?src={STUB_IMAGES}/{i}&w={widths[0]}" for i in ids]
+                cold = await timed_gets(client, proxied, 1, BROWSER_ACCEPT)
+                render = await timed_gets(client, proxied, 1, {"Accept": "image/jpeg"})
+                cached = await timed_gets(client, proxied * 10, args.concurrency, BROWSER_ACCEPT)
+                etag = (await client.get(proxied[0], headers=BROWSER_ACCEPT)).headers["etag"]
+                revalidate = await timed_gets(
+                    client, proxied[:1] * 200, args.concurrency, {**BROWSER_ACCEPT, "If-None-Match": etag}
+                )
+                for phase, result in (("cold", cold), ("render", render), ("cached", cached),
+                                      ("not_modified", revalidate)):
+                    print(json.dumps({"phase": phase, **result}))
+                print(json.dumps({"image_cache": (await client.get("/api/stats", headers=OPS_HEADERS)).json()["image_cache"]}))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
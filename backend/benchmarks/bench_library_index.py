@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Library index benchmark: build time, memory and query latency.
+
+Runs in-process against synthetic saved-track libraries (no stub or server).
+Memory covers the index structures only; track payloads are shared with the
+caller. Latency is reported per query kind: 2-3 letter prefixes, whole
+words, and a word plus the prefix of another word from the same track.
+
+Usage: python benchmarks/bench_library_index.py [--sizes 10000,50000] [--queries 2000]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from harness import BACKEND_DIR, percentile
+
+sys.path.insert(0, BACKEND_DIR)
+
+from library_index import LibraryIndex  # noqa: E402
+
+QUERY_KINDS = ("prefix", "word", "two_words")
+LETTERS = "etaoinshrdlcumwfgypbvkjxqz"
+LETTER_WEIGHTS = [12, 9, 8, 8, 7, 7, 6, 6, 6, 4, 4, 3, 3, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 1]
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    return ["".join(rng.choices(LETTERS, LETTER_WEIGHTS, k=rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_library(size: int, rng: random.Random) -> list:
+    # Zipf-like word frequencies over a vocabulary that grows with the library
+    vocabulary = make_vocabulary(max(2000, size // 2), rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    def word(rng: random.Random) -> str:
+        return rng.choices(vocabulary, weights)[0]
+
+    artists = [" ".join(word(rng) for _ in range(rng.randint(1, 2))).title() for _ in range(max(1, size // 10))]
+    albums = [" ".join(word(rng) for _ in range(rng.randint(1, 3))).title() for _ in range(max(1, size // 8))]
+    return [
+        {
+            "added_at": f"2024-01-01T00:00:{i:08d}Z",
+            "track": {
+                "id": f"track{i}",
+                "name": " ".join(word(rng) for _ in range(rng.randint(1, 4))).title(),
+                "artists": [{"id": f"artist{i}", "name": rng.choice(artists)}],
+                "album": {"id": f"album{i}", "name": rng.choice(albums), "images": []},
+            },
+        }
+        for i in range(size)
+    ]
+
+
+def make_queries(library: list, count: int, rng: random.Random) -> list:
+    """(kind, query) pairs built from words that occur in the library."""
+    queries = []
+    for i in range(count):
+        track = rng.choice(library)["track"]
+        words = list(dict.fromkeys(f"{track['name']} {track['artists'][0]['name']}".lower().split()))
+        kind = QUERY_KINDS[i % len(QUERY_KINDS)]
+        if kind == "prefix":
+            queries.append((kind, rng.choice(words)[:rng.randint(2, 3)]))
+        elif kind == "word" or len(words) < 2:
+            queries.append(("word", rng.choice(words)))
+        else:
+            first, second = rng.sample(words, 2)
+            queries.append((kind, f"{first} {second[:3]}"))
+    return queries
+
+
+def bench(size: int, query_count: int) -> dict:
+    rng = random.Random(size)
+    library = make_library(size, rng)
+
+    # Traced on its own: tracemalloc slows allocation-heavy code several times over
+    tracemalloc.start()
+    traced = LibraryIndex()
+    traced.add_many(library)
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+
+    started = time.perf_counter()
+    index = LibraryIndex()
+    index.add_many(library)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    report = {
+        "tracks": size,
+        "posting_lists": len(index._postings),
+        "build_ms": round(build_ms, 1),
+        "index_mb": round(index_bytes / 2**20, 2),
+        "index_mb_per_10k": round(index_bytes / 2**20 * 10000 / size, 2),
+    }
+    latencies = {kind: [] for kind in QUERY_KINDS}
+    matches = {kind: 0 for kind in QUERY_KINDS}
+    for kind, query in make_queries(library, query_count, rng):
+        started = time.perf_counter()
+        matches[kind] += index.search(query, limit=20)["total"]
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+    for kind, samples in latencies.items():
+        if samples:
+            report[kind] = {
+                "queries": len(samples),
+                "avg_matches": round(matches[kind] / len(samples), 1),
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,50000")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(json.dumps(bench(size, args.queries)))
+
+
+if __name__ == "__main__":
+    main()
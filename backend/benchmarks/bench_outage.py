@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Fault-injection benchmark: search latency while Spotify is down.
+
+Each run warms the search cache, lets the entries expire, and then makes
+the stub fail every Web API call for ``--duration`` seconds, either by
+hanging (``slow``: every call takes ``--hang-ms``) or by answering 503
+(``errors``). Concurrent clients keep searching throughout: most of them
+repeat a warmed query, some send a query that was never cached. The
+stub is then healed and the same load runs again to show recovery.
+
+The outage phase is run with the circuit breaker on and off. With it on,
+no call waits out the hang: calls that reach Spotify give up after the
+slow-call threshold, and once the breaker trips every request should be a
+stale cache answer or a fast 503.
+
+Usage: python benchmarks/bench_outage.py [--mode slow|errors] [--duration 10] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+import httpx
+
+from harness import OPS_HEADERS, STUB_PORT, UNGOVERNED_ENV, percentile, stub_and_server
+
+WARM_QUERIES = 20
+BREAKER_ENV = {
+    "SPOTIFY_BREAKER_MIN_CALLS": "5",
+    "SPOTIFY_BREAKER_SLOW_CALL": "1",
+    "SPOTIFY_BREAKER_OPEN_SECONDS": "3",
+    "SEARCH_CACHE_TTL": "1",
+}
+
+
+async def load(client: httpx.AsyncClient, duration: float, concurrency: int, cold_share: float) -> dict:
+    latencies = []
+    outcomes = Counter()
+    cold = itertools.count()
+    deadline = time.monotonic() + duration
+
+    async def worker(rng: random.Random):
+        while time.monotonic() < deadline:
+            if rng.random() < cold_share:
+                q = f"cold {next(cold)}"
+            else:
+                q = f"warm {rng.randrange(WARM_QUERIES)}"
+            started = time.perf_counter()
+            try:
+                response = await client.get("/api/search", params={"q": q, "limit": 10})
+            except httpx.TimeoutException:
+                outcomes["client_timeout"] += 1
+                latencies.append(time.perf_counter() - started)
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code == 200:
+                outcomes["stale" if "warning" in response.headers else "fresh"] += 1
+            else:
+                outcomes[str(response.status_code)] += 1
+
+    await asyncio.gather(*(worker(random.Random(seed)) for seed in range(concurrency)))
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+        "over_1s": sum(latency > 1 for latency in latencies),
+        "outcomes": dict(outcomes),
+    }
+
+
+async def run(mode: str, breaker: bool, duration: float, concurrency: int, hang_ms: float) -> dict:
+    server_env = {**UNGOVERNED_ENV, **BREAKER_ENV, "SPOTIFY_BREAKER": "1" if breaker else "0"}
+    async with stub_and_server(server_env=server_env) as base_url:
+        stub = httpx.AsyncClient(base_url=f"http://127.0.0.1:{STUB_PORT}")
+        headers = {"Authorization": "Bearer bench-token"}
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30.0,
+                                     limits=httpx.Limits(max_connections=concurrency)) as client:
+            for i in range(WARM_QUERIES):
+                (await client.get("/api/search", params={"q": f"warm {i}", "limit": 10})).raise_for_status()
+            await asyncio.sleep(1.5)  # past SEARCH_CACHE_TTL: only stale copies remain
+
+            if mode == "slow":
+                await stub.post("/stub/faults", params={"latency_ms": hang_ms})
+            else:
+                await stub.post("/stub/faults", params={"error_rate": 1.0, "status": 503})
+            outage = await load(client, duration, concurrency, cold_share=0.2)
+
+            await stub.post("/stub/faults")
+            await asyncio.sleep(float(BREAKER_ENV["SPOTIFY_BREAKER_OPEN_SECONDS"]))
+            recovery = await load(client, min(duration, 5.0), concurrency, cold_share=0.2)
+            breakers = (await client.get("/api/stats", headers=OPS_HEADERS)).json()["breakers"]
+        await stub.aclose()
+
+    return {"mode": mode, "breaker": breaker, "outage": outage, "recovery": recovery, "breakers": breakers}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=("slow", "errors"), default="slow")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--hang-ms", type=float, default=5000)
+    args = parser.parse_args()
+    for breaker in (False, True):
+        print(json.dumps(await run(args.mode, breaker, args.duration, args.concurrency, args.hang_ms)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
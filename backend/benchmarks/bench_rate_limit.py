@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Burst replay against a stub that enforces a rate limit and answers 429.
+
+Fires a burst of distinct searches (so the search cache cannot absorb them)
+from many users, with /api/pause calls mixed in, and reports how the
+governor paced traffic: upstream 429s seen, client-visible statuses, and
+latency of playback control versus background reads.
+
+Usage: python benchmarks/bench_rate_limit.py [--searches 200] [--controls 20] [--stub-limit 30]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+
+from harness import OPS_HEADERS, STUB_PORT, percentile, stub_and_server
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--controls", type=int, default=20)
+    parser.add_argument("--stub-limit", type=int, default=30)
+    args = parser.parse_args()
+
+    stub_env = {"STUB_RATE_LIMIT": str(args.stub_limit), "STUB_LATENCY_MS": "20"}
+    server_env = {"SPOTIFY_APP_RATE": str(args.stub_limit * 0.8), "SPOTIFY_APP_BURST": str(args.stub_limit // 2)}
+    async with stub_and_server(server_env=server_env, stub_extra_env=stub_env) as base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+            # Warm the auth cache so the burst measures the governed routes only
+            for user in range(20):
+                await client.get("/api/user/profile", headers={"Authorization": f"Bearer user-{user}"})
+            await asyncio.sleep(1.5)
+
+            latencies = {"search": [], "pause": []}
+            statuses = Counter()
+
+            async def call(kind: str, i: int):
+                headers = {"Authorization": f"Bearer user-{i % 20}"}
+                started = time.perf_counter()
+                if kind == "search":
+                    response = await client.get(f"/api/search?q=burst-{i}", headers=headers)
+                else:
+                    response = await client.post("/api/pause", json={}, headers=headers)
+                latencies[kind].append(time.perf_counter() - started)
+                statuses[f"{kind} {response.status_code}"] += 1
+
+            tasks = [call("search", i) for i in range(args.searches)]
+            step = max(1, args.searches // max(1, args.controls))
+            for n in range(args.controls):
+                tasks.insert(n * step + n, call("pause", n))
+            await asyncio.gather(*tasks)
+
+            stub_stats = (await client.get(f"http://127.0.0.1:{STUB_PORT}/stub/stats")).json()
+            governor = (await client.get("/api/stats", headers=OPS_HEADERS)).json()["governor"]
+
+    report = {
+        "statuses": dict(statuses),
+        "upstream_429s": stub_stats.get("429", 0),
+        "governor": governor,
+    }
+    for kind, samples in latencies.items():
+        if samples:
+            report[f"{kind}_p50_ms"] = round(percentile(samples, 50) * 1000, 1)
+            report[f"{kind}_p99_ms"] = round(percentile(samples, 99) * 1000, 1)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
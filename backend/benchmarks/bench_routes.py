@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Route load test: throughput and p50/p95/p99 latency for every backend route.
+
+Starts the Spotify stub and the backend, then drives each route in turn
+with ``--requests`` calls at every concurrency level in ``--concurrency``.
+The stub's latency, error rate and 429 rate can be set, so the same suite
+covers the happy path and a degraded upstream.
+
+Routes are measured as follows:
+
+- Streaming exports are read to the end.
+- The SSE stream is measured to its first event.
+- Library routes are skipped when the MongoDB mirror is not available.
+
+Each result is printed as a JSON line. ``--output`` also writes the full
+report with run metadata. ``--compare`` checks a run against an earlier
+report and exits non-zero when a route got slower or lost throughput by
+more than ``--tolerance``.
+
+Usage: python benchmarks/bench_routes.py [--concurrency 1,8,32] [--requests 200]
+       [--routes search,devices] [--latency-ms 50] [--error-rate 0] [--throttle-rate 0]
+       [--output report.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+
+from harness import BACKEND_DIR, OPS_HEADERS, STUB_PORT, UNGOVERNED_ENV, percentile, stub_and_server
+
+AUTH = {"Authorization": "Bearer bench-token"}
+
+
+class Route(NamedTuple):
+    name: str
+    method: str
+    path: str
+    # Request number -> extra httpx request arguments (params, json)
+    args: Callable[[int], Dict[str, Any]] = lambda i: {}
+    auth: bool = True
+    mode: str = "request"  # "request", "stream" (read to the end) or "sse" (first event)
+    share: float = 1.0  # fraction of --requests to send, for expensive routes
+    needs_library: bool = False
+    ops: bool = False  # sends the ops token instead of a user's
+
+
+def catalog_ids(i: int) -> List[str]:
+    # 22-character base62 IDs; 200 distinct ones so later rounds hit the entity cache
+    return [f"bench{(i * 7 + k) % 200:017d}" for k in range(20)]
+
+
+ROUTES = [
+    Route("root", "GET", "/", auth=False),
+    Route("health", "GET", "/api/health", auth=False),
+    Route("stats", "GET", "/api/stats", auth=False, ops=True),
+    Route("metrics", "GET", "/metrics", auth=False, ops=True),
+    Route("auth_login", "GET", "/api/auth/login", auth=False),
+    Route("auth_callback", "GET", "/api/auth/callback", lambda i: {"params": {"code": f"code-{i}"}}, auth=False),
+    Route("auth_refresh", "POST", "/api/auth/refresh", lambda i: {"json": {"refresh_token": "stub-refresh-token"}},
+          auth=False),
+    Route("profile", "GET", "/api/user/profile"),
+    Route("search", "GET", "/api/search", lambda i: {"params": {"q": f"query {i % 50}", "limit": 20}}),
+    Route("search_all", "GET", "/api/search/all", lambda i: {"params": {"q": f"query {i % 50}"}}),
+    Route("search_suggest", "GET", "/api/search/suggest", lambda i: {"params": {"q": f"query {i % 50}"[:1 + i % 8]}}),
+    Route("catalog", "POST", "/api/catalog", lambda i: {"json": {"type": "track", "ids": catalog_ids(i)}}),
+    Route("play", "POST", "/api/play", lambda i: {"json": {"context_uri": "spotify:playlist:playlist0", "offset": i % 10}}),
+    Route("pause", "POST", "/api/pause", lambda i: {"json": {}}),
+    Route("player_commands", "POST", "/api/player/commands", lambda i: {"json": {"commands": [
+        {"op": "queue", "uri": f"spotify:track:track{i}"},
+        {"op": "volume", "volume_percent": i % 100},
+        {"op": "seek", "position_ms": i * 1000},
+    ]}}),
+    Route("playback_state", "GET", "/api/playback/state"),
+    Route("playback_stream", "GET", "/api/playback/stream", mode="sse", share=0.25),
+    Route("devices", "GET", "/api/devices"),
+    Route("library_tracks", "GET", "/api/library/tracks", lambda i: {"params": {"offset": i % 150}},
+          needs_library=True),
+    Route("library_search", "GET", "/api/library/search", lambda i: {"params": {"q": f"track {i % 100}"}},
+          needs_library=True),
+    Route("library_playlists", "GET", "/api/library/playlists", needs_library=True),
+    Route("library_playlist_tracks", "GET", "/api/library/playlists/playlist0/tracks", needs_library=True),
+    Route("library_sync", "POST", "/api/library/sync", share=0.1, needs_library=True),
+    Route("export_tracks", "GET", "/api/export/tracks", mode="stream", share=0.1),
+    Route("export_playlist", "GET", "/api/export/playlists/playlist0/tracks", mode="stream", share=0.1),
+]
+
+
+async def call(client: httpx.AsyncClient, route: Route, i: int) -> int:
+    headers = OPS_HEADERS if route.ops else AUTH if route.auth else None
+    if route.mode == "request":
+        response = await client.request(route.method, route.path, headers=headers, **route.args(i))
+        return response.status_code
+    async with client.stream(route.method, route.path, headers=headers, **route.args(i)) as response:
+        if route.mode == "sse":
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    break
+        else:
+            async for _ in response.aiter_raw():
+                pass
+        return response.status_code
+
+
+async def measure(client: httpx.AsyncClient, route: Route, concurrency: int, requests: int) -> Dict[str, Any]:
+    total = max(concurrency, int(requests * route.share))
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = iter(range(total))
+
+    async def worker():
+        for i in remaining:
+            started = time.perf_counter()
+            try:
+                status = str(await call(client, route, i))
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "route": route.name,
+        "method": route.method,
+        "path": route.path,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(n for status, n in statuses.items() if not status.startswith(("2", "3"))),
+        "statuses": dict(statuses),
+        "req_per_s": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """One entry per route/concurrency present in both runs, flagged when it regressed."""
+    before = {(r["route"], r["concurrency"]): r for r in baseline["results"]}
+    rows = []
+    for result in results:
+        old = before.get((result["route"], result["concurrency"]))
+        if old is None:
+            continue
+        p95_ratio = result["p95_ms"] / old["p95_ms"] if old["p95_ms"] else 1.0
+        throughput_ratio = result["req_per_s"] / old["req_per_s"] if old["req_per_s"] else 1.0
+        rows.append({
+            "route": result["route"],
+            "concurrency": result["concurrency"],
+            "p95_ratio": round(p95_ratio, 3),
+            "throughput_ratio": round(throughput_ratio, 3),
+            "regressed": p95_ratio > 1 + tolerance or throughput_ratio < 1 - tolerance,
+        })
+    return rows
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--routes", help="comma-separated route names (default: all)")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="stub requests/s before 429 (0 = off)")
+    parser.add_argument("--governed", action="store_true", help="keep the backend's default outbound rate limits")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    selected = set(args.routes.split(",")) if args.routes else None
+    routes = [route for route in ROUTES if selected is None or route.name in selected]
+    stub = {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_LATENCY_JITTER_MS": str(args.jitter_ms),
+        "STUB_ERROR_RATE": str(args.error_rate),
+        "STUB_THROTTLE_RATE": str(args.throttle_rate),
+        "STUB_RATE_LIMIT": str(args.rate_limit),
+    }
+    server_env = {"LIBRARY_MIRROR": "1", **({} if args.governed else UNGOVERNED_ENV)}
+
+    results = []
+    async with stub_and_server(server_env=server_env, stub_extra_env=stub) as base_url:
+        limits = httpx.Limits(max_connections=max(levels))
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+            # Validate the bench token once; an explicit sync fills the mirror, if MongoDB is up
+            await client.get("/api/user/profile", headers=AUTH)
+            library = (await client.post("/api/library/sync", headers=AUTH)).status_code == 200
+            for route in routes:
+                if route.needs_library and not library:
+                    print(json.dumps({"route": route.name, "skipped": "library mirror not available"}))
+                    continue
+                for concurrency in levels:
+                    result = await measure(client, route, concurrency, args.requests)
+                    results.append(result)
+                    print(json.dumps(result), flush=True)
+        async with httpx.AsyncClient() as stub_client:
+            upstream = (await stub_client.get(f"http://127.0.0.1:{STUB_PORT}/stub/stats")).json()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "concurrency": levels,
+            "requests": args.requests,
+            "stub": stub,
+            "governed": args.governed,
+            "upstream_calls": upstream,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(results, json.load(f), args.tolerance)
+        for row in rows:
+            print(json.dumps({"compare": row}))
+        if any(row["regressed"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Dev vs prod launch mode benchmark.
+
+Runs the backend once with `python server.py --mode dev` (single worker,
+file-watching reloader) and once with `--mode prod` (N workers, uvloop and
+httptools when installed), against the same local Spotify stub, and reports
+req/s and p99 for /api/health and a stubbed /api/search.
+
+Usage: python benchmarks/bench_server_modes.py [--workers 4] [--requests 2000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import json
+
+from harness import SERVER_PORT, UNGOVERNED_ENV, run_load, stub_and_server
+
+
+async def bench_mode(mode: str, workers: int, requests: int, concurrency: int) -> dict:
+    server_args = ["server.py", "--mode", mode, "--port", str(SERVER_PORT), "--workers", str(workers)]
+    async with stub_and_server(server_env=UNGOVERNED_ENV, server_args=server_args) as base_url:
+        # Let every prod worker finish booting before measuring
+        await asyncio.sleep(2)
+        health = await run_load(lambda i: f"{base_url}/api/health", concurrency, requests)
+        search = await run_load(
+            lambda i: f"{base_url}/api/search?q={mode}-{i % 200}",
+            concurrency,
+            requests,
+            lambda i: {"Authorization": f"Bearer bench-{i % 20}"},
+        )
+    return {"mode": mode, "workers": 1 if mode == "dev" else workers, "health": health, "search": search}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    for mode in ("dev", "prod"):
+        print(json.dumps(await bench_mode(mode, args.workers, args.requests, args.concurrency)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Suggestion index benchmark: memory, merge cost and lookup latency at scale.
+
+Runs in-process (no stub or server). The index is filled with ``--entries``
+distinct phrases of one to four words from a Zipf-distributed vocabulary.
+Each phrase is searched two or three times, so it passes the minimum hit
+count for queries. Memory is the size of the index's own structures
+(``sys.getsizeof`` over keys, arrays and display texts). Lookups use 1-6
+character prefixes of stored phrases, as typed one keystroke at a time.
+Broad prefixes are timed separately on their first lookup, before their
+top entries are cached.
+
+The build merges inline, so ``merge_ms`` is the cost of one merge. As in the
+server, the last phase then records ``--background-keys`` new keys inside an event
+loop, where merges run in a worker thread. ``loop_lag_ms`` is how late a
+1 ms timer fires meanwhile, i.e. how long requests would stall.
+
+Usage: python benchmarks/bench_suggestions.py [--entries 1000000] [--lookups 20000]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+from bench_library_index import make_vocabulary
+from harness import BACKEND_DIR, percentile
+
+sys.path.insert(0, BACKEND_DIR)
+
+from suggestions import SuggestionIndex  # noqa: E402
+
+
+def make_phrases(count: int, rng: random.Random) -> list:
+    vocabulary = make_vocabulary(max(5000, count // 20), rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    phrases = set()
+    while len(phrases) < count:
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(1, 4))
+        phrases.add(" ".join(words))
+    return list(phrases)
+
+
+def index_bytes(index: SuggestionIndex) -> int:
+    strings = index._keys + [text for text in index._texts if text is not None]
+    arrays = (index._weights, index._block_max, index._kinds)
+    return (
+        sys.getsizeof(index._keys) + sys.getsizeof(index._texts)
+        + sum(map(sys.getsizeof, strings)) + sum(map(sys.getsizeof, arrays))
+    )
+
+
+async def background_merges(index: SuggestionIndex, phrases: list) -> list:
+    """Timer lateness while ``phrases`` are recorded and merged as under the server."""
+    lags = []
+    recording = True
+
+    async def ticker():
+        while recording:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - started - 0.001)
+
+    task = asyncio.create_task(ticker())
+    for i, phrase in enumerate(phrases):
+        for user in ("user4", "user5"):
+            index.record_search(phrase, user)
+        if i % 64 == 0:
+            # Requests interleave with other work rather than arriving back to back
+            await asyncio.sleep(0)
+    while index._merge_task is not None and not index._merge_task.done():
+        await index._merge_task
+    recording = False
+    await task
+    return lags
+
+
+def micros(samples: list) -> dict:
+    return {
+        "p50_us": round(percentile(samples, 50) * 1e6, 1),
+        "p95_us": round(percentile(samples, 95) * 1e6, 1),
+        "p99_us": round(percentile(samples, 99) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--background-keys", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(args.entries)
+    phrases = make_phrases(args.entries, rng)
+    index = SuggestionIndex(max_entries=int(args.entries * 1.2))
+
+    started = time.perf_counter()
+    merges = []
+    for phrase in phrases:
+        for user in range(rng.randint(2, 3)):
+            pending = len(index._pending)
+            merge_started = time.perf_counter()
+            index.record_search(phrase, f"user{user}")
+            if len(index._pending) < pending:
+                merges.append(time.perf_counter() - merge_started)
+    index.merge()
+    build = time.perf_counter() - started
+    memory = index_bytes(index)
+
+    record_existing = []
+    for phrase in rng.sample(phrases, 10000):
+        started = time.perf_counter()
+        index.record_search(phrase, "user3")
+        record_existing.append(time.perf_counter() - started)
+
+    prefixes = []
+    for phrase in rng.sample(phrases, args.lookups // 6):
+        prefixes += [phrase[:n] for n in range(1, 7)]
+    broad = []
+    for prefix in sorted({prefix for prefix in prefixes if len(prefix) <= 2}):
+        started = time.perf_counter()
+        index.suggest(prefix)
+        broad.append(time.perf_counter() - started)
+    lookups = []
+    empty = 0
+    for prefix in prefixes:
+        started = time.perf_counter()
+        results = index.suggest(prefix)
+        lookups.append(time.perf_counter() - started)
+        empty += not results
+
+    merges_before = index.merges
+    fresh = [f"{phrase} live" for phrase in rng.sample(phrases, args.background_keys)]
+    lags = asyncio.run(background_merges(index, fresh))
+
+    print(json.dumps({
+        "entries": len(index),
+        "build_s": round(build, 1),
+        "memory_mb": round(memory / 2**20, 1),
+        "bytes_per_entry": round(memory / len(index)),
+        "merges": len(merges),
+        "merge_ms": {
+            "p50": round(percentile(merges, 50) * 1000, 1),
+            "max": round(max(merges) * 1000, 1),
+        },
+        "record_existing": micros(record_existing),
+        "lookup": {"count": len(lookups), "empty": empty, **micros(lookups)},
+        "broad_prefix_uncached": {"count": len(broad), **micros(broad)},
+        "background_merges": index.merges - merges_before,
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50) * 1000, 1),
+            "p99": round(percentile(lags, 99) * 1000, 1),
+            "max": round(max(lags) * 1000, 1),
+        },
+    }))
+
+
+if __name__ == "__main__":
+    main()
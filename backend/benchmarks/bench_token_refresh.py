@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Token refresh check against the stub's fake token endpoint.
+
+1. Fires concurrent /api/auth/refresh calls for one refresh token and
+   reports how many upstream token exchanges they caused (expected: 1).
+2. Logs in through /api/auth/callback with short-lived stub tokens and
+   verifies the background refresher renews the session on its own, so
+   later /api/auth/refresh calls are answered from memory.
+
+Usage: python benchmarks/bench_token_refresh.py [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from harness import OPS_HEADERS, STUB_PORT, stub_and_server
+
+STUB_URL = f"http://127.0.0.1:{STUB_PORT}"
+
+
+async def upstream_token_calls(client: httpx.AsyncClient) -> int:
+    stats = (await client.get(f"{STUB_URL}/stub/stats")).json()
+    return stats.get("POST /api/token", 0)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    server_env = {"TOKEN_REFRESH_MARGIN": "4", "TOKEN_REFRESH_CHECK_INTERVAL": "0.5"}
+    stub_env = {"STUB_TOKEN_EXPIRES_IN": "5"}
+    async with stub_and_server(server_env=server_env, stub_extra_env=stub_env) as base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+            await client.post(f"{STUB_URL}/stub/reset")
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/api/auth/refresh", json={"refresh_token": "shared-refresh-token"})
+                for _ in range(args.concurrency)
+            ))
+            burst = {
+                "concurrent_refreshes": args.concurrency,
+                "statuses": sorted({r.status_code for r in responses}),
+                "upstream_exchanges": await upstream_token_calls(client),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            print(json.dumps({"coalescing": burst}))
+
+            # Stub tokens last 5s and the margin is 4s: renewal is due after ~1s
+            login = (await client.get("/api/auth/callback", params={"code": "bench"})).json()
+            await asyncio.sleep(2)
+            await client.post(f"{STUB_URL}/stub/reset")
+            started = time.perf_counter()
+            refreshed = (await client.post("/api/auth/refresh", json={"refresh_token": login["refresh_token"]})).json()
+            proactive = {
+                "token_rotated": refreshed["access_token"] != login["access_token"],
+                "upstream_exchanges_on_request": await upstream_token_calls(client),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                "sessions": (await client.get("/api/stats", headers=OPS_HEADERS)).json()["sessions"],
+            }
+            print(json.dumps({"proactive": proactive}))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
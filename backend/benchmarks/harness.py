@@ -0,0 +1,124 @@
+"""
+Shared helpers for the benchmark scripts: process management for the
+Spotify stub and the backend, plus latency percentiles.
+"""
+
+import asyncio
+import contextlib
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_PORT = 8900
+SERVER_PORT = 8901
+# /api/stats and /metrics are off unless the server has an OPS_TOKEN
+OPS_TOKEN = "bench-ops-token"
+OPS_HEADERS = {"Authorization": f"Bearer {OPS_TOKEN}"}
+
+
+def start_process(args, env=None):
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+def stub_env(stub_port: int = STUB_PORT) -> dict:
+    return {
+        "SPOTIFY_API_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "SPOTIFY_ACCOUNTS_URL": f"http://127.0.0.1:{stub_port}",
+    }
+
+
+# Lift the outbound governor so benchmarks measure the backend, not the pacing
+UNGOVERNED_ENV = {
+    "SPOTIFY_APP_RATE": "1000000",
+    "SPOTIFY_APP_BURST": "1000000",
+    "SPOTIFY_USER_RATE": "1000000",
+    "SPOTIFY_USER_BURST": "1000000",
+}
+
+
+@contextlib.asynccontextmanager
+async def stub_and_server(server_env=None, stub_extra_env=None, server_args=None):
+    """Run the Spotify stub and the backend, yielding the backend base URL."""
+    stub = start_process(
+        ["benchmarks/spotify_stub.py"],
+        {"STUB_PORT": str(STUB_PORT), **(stub_extra_env or {})},
+    )
+    server = start_process(
+        server_args or ["-m", "uvicorn", "server:app", "--port", str(SERVER_PORT), "--log-level", "warning"],
+        # Album art links need the server's public URL, as in production
+        {
+            **stub_env(),
+            "IMAGE_PROXY_BASE_URL": f"http://127.0.0.1:{SERVER_PORT}",
+            "OPS_TOKEN": OPS_TOKEN,
+            **(server_env or {}),
+        },
+    )
+    try:
+        await wait_ready(f"http://127.0.0.1:{STUB_PORT}/docs")
+        await wait_ready(f"http://127.0.0.1:{SERVER_PORT}/api/health")
+        yield f"http://127.0.0.1:{SERVER_PORT}"
+    finally:
+        server.terminate()
+        stub.terminate()
+        server.wait()
+        stub.wait()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_load(
+    url_for: Callable[[int], str],
+    concurrency: int,
+    total: int,
+    headers_for: Optional[Callable[[int], dict]] = None,
+) -> dict:
+    """Issue ``total`` GETs with ``concurrency`` workers; report throughput and latency."""
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker(client):
+        for i in remaining:
+            start = time.perf_counter()
+            response = await client.get(url_for(i), headers=headers_for(i) if headers_for else None)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "req_per_s": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
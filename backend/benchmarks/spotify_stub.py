@@ -0,0 +1,342 @@
+"""
+Local stand-in for the Spotify Web API and Accounts service.
+
+Serves canned payloads with a configurable artificial delay so the backend
+can be benchmarked without real credentials. Point the backend at it with
+SPOTIFY_API_URL=http://127.0.0.1:8900/v1 and
+SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8900.
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import time
+from collections import Counter, deque
+from functools import lru_cache
+
+from fastapi import FastAPI, Request, Response
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+# Each response is delayed by LATENCY_MS plus up to this much, uniformly
+LATENCY_JITTER_MS = float(os.getenv("STUB_LATENCY_JITTER_MS", "0"))
+TOKEN_EXPIRES_IN = int(os.getenv("STUB_TOKEN_EXPIRES_IN", "3600"))
+# Web API requests allowed per rolling second before answering 429 (0 = unlimited)
+RATE_LIMIT = int(os.getenv("STUB_RATE_LIMIT", "0"))
+RETRY_AFTER = os.getenv("STUB_RETRY_AFTER", "1")
+SAVED_TRACKS = int(os.getenv("STUB_SAVED_TRACKS", "200"))
+PLAYLISTS = int(os.getenv("STUB_PLAYLISTS", "5"))
+PLAYLIST_TRACKS = int(os.getenv("STUB_PLAYLIST_TRACKS", "100"))
+# Where album art links point; set to this stub's /image to serve generated artwork
+IMAGE_URL = os.getenv("STUB_IMAGE_URL", "https://i.scdn.co/image")
+
+app = FastAPI(title="Spotify Stub")
+
+# Upstream calls received, per path, so benchmarks can assert on call counts
+calls = Counter()
+token_serial = itertools.count(1)
+recent_requests = deque()
+# Injected faults for /v1 paths starting with `prefix`; POST /stub/faults changes them
+faults = {
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),
+    "status": int(os.getenv("STUB_ERROR_STATUS", "503")),
+    "throttle_rate": float(os.getenv("STUB_THROTTLE_RATE", "0")),
+    "latency_ms": 0.0,
+    "prefix": "/v1/",
+}
+
+
+def rate_limited() -> bool:
+    now = time.monotonic()
+    while recent_requests and now - recent_requests[0] > 1.0:
+        recent_requests.popleft()
+    if len(recent_requests) >= RATE_LIMIT:
+        return True
+    recent_requests.append(now)
+    return False
+
+
+@app.middleware("http")
+async def count_calls(request: Request, call_next):
+    if request.url.path.startswith("/stub/"):
+        return await call_next(request)
+    calls[f"{request.method} {request.url.path}"] += 1
+    if RATE_LIMIT and request.url.path.startswith("/v1/") and rate_limited():
+        calls["429"] += 1
+        return Response(status_code=429, headers={"Retry-After": RETRY_AFTER})
+    if request.url.path.startswith(faults["prefix"]):
+        if faults["latency_ms"] > 0:
+            await asyncio.sleep(faults["latency_ms"] / 1000)
+        if random.random() < faults["error_rate"]:
+            calls["injected_error"] += 1
+            return Response(status_code=faults["status"])
+        if random.random() < faults["throttle_rate"]:
+            calls["429"] += 1
+            return Response(status_code=429, headers={"Retry-After": RETRY_AFTER})
+    return await call_next(request)
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return dict(calls)
+
+
+@app.post("/stub/faults")
+async def stub_faults(
+    error_rate: float = 0.0,
+    status: int = 503,
+    throttle_rate: float = 0.0,
+    latency_ms: float = 0.0,
+    prefix: str = "/v1/",
+):
+    faults.update(
+        error_rate=error_rate, status=status, throttle_rate=throttle_rate, latency_ms=latency_ms, prefix=prefix
+    )
+    return faults
+
+
+@app.post("/stub/reset")
+async def stub_reset():
+    calls.clear()
+    return {}
+
+
+# Library state, newest saved track first; /stub/library mutates it
+saved_track_ids = list(range(SAVED_TRACKS - 1, -1, -1))
+next_track_id = itertools.count(SAVED_TRACKS)
+playlist_snapshots = [1] * PLAYLISTS
+
+
+@app.post("/stub/library")
+async def stub_library(add: int = 0, remove: int = 0, touch_playlist: int = -1):
+    for _ in range(add):
+        saved_track_ids.insert(0, next(next_track_id))
+    del saved_track_ids[len(saved_track_ids) - remove:]
+    if 0 <= touch_playlist < PLAYLISTS:
+        playlist_snapshots[touch_playlist] += 1
+    return {"saved_tracks": len(saved_track_ids), "snapshots": playlist_snapshots}
+
+
+async def delay():
+    latency_ms = LATENCY_MS + (random.uniform(0, LATENCY_JITTER_MS) if LATENCY_JITTER_MS else 0)
+    if latency_ms > 0:
+        await asyncio.sleep(latency_ms / 1000)
+
+
+def make_track(i: int) -> dict:
+    return {
+        "id": f"track{i}",
+        "name": f"Track {i}",
+        "uri": f"spotify:track:track{i}",
+        "duration_ms": 180000 + i,
+        "preview_url": None,
+        "artists": [{"id": f"artist{i}", "name": f"Artist {i}"}],
+        "album": {
+            "id": f"album{i}",
+            "name": f"Album {i}",
+            "images": [{"url": f"{IMAGE_URL}/{i}", "width": 640, "height": 640}],
+        },
+    }
+
+
+# Every market Spotify lists when a request names none (185 at the time of writing)
+MARKETS = [a + b for a in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" for b in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"][:185]
+
+
+def full_track(i: int, market=None) -> dict:
+    """make_track plus the subtrees a real search/player payload carries."""
+    track = make_track(i)
+    extras = {"available_markets": MARKETS} if market is None else {"is_playable": True}
+    track.update(
+        extras,
+        href=f"https://api.spotify.com/v1/tracks/track{i}",
+        external_urls={"spotify": f"https://open.spotify.com/track/track{i}"},
+        external_ids={"isrc": f"STUB{i:08d}"},
+        popularity=i % 100,
+        explicit=False,
+        disc_number=1,
+        track_number=1 + i % 12,
+        is_local=False,
+        type="track",
+    )
+    track["album"].update(
+        extras,
+        album_type="album",
+        href=f"https://api.spotify.com/v1/albums/album{i}",
+        external_urls={"spotify": f"https://open.spotify.com/album/album{i}"},
+        release_date="2020-01-01",
+        release_date_precision="day",
+        total_tracks=12,
+        type="album",
+        uri=f"spotify:album:album{i}",
+    )
+    return track
+
+
+@app.get("/v1/me")
+async def me():
+    await delay()
+    return {
+        "id": "stub-user",
+        "display_name": "Stub User",
+        "email": "stub@example.com",
+        "product": "premium",
+        "country": "SE",
+        "images": [],
+        "followers": {"total": 0},
+    }
+
+
+@app.get("/v1/search")
+async def search(q: str, type: str = "track", limit: int = 10, offset: int = 0, market: str = None):
+    await delay()
+    result = {}
+    for kind in type.split(","):
+        items = [full_track(offset + i, market) for i in range(limit)]
+        result[f"{kind}s"] = {"items": items, "total": 1000, "limit": limit, "offset": offset}
+    return result
+
+
+def catalog_entity(kind: str, entity_id: str) -> dict:
+    if kind == "track":
+        return {**make_track(0), "id": entity_id, "uri": f"spotify:track:{entity_id}"}
+    return {"id": entity_id, "name": f"{kind.title()} {entity_id}", "uri": f"spotify:{kind}:{entity_id}", "images": []}
+
+
+@app.get("/v1/tracks")
+@app.get("/v1/artists")
+@app.get("/v1/albums")
+async def several(request: Request, ids: str):
+    await delay()
+    kind = request.url.path.rsplit("/", 1)[1][:-1]
+    # IDs starting with "0000" stand in for unknown IDs, which Spotify answers with null
+    return {f"{kind}s": [None if i.startswith("0000") else catalog_entity(kind, i) for i in ids.split(",")]}
+
+
+@app.get("/v1/me/player")
+async def current_playback(market: str = None):
+    await delay()
+    return {
+        "is_playing": True,
+        "progress_ms": 1000,
+        "device": {"id": "device1", "name": "Stub Device", "volume_percent": 50},
+        "item": full_track(0, market),
+    }
+
+
+@app.get("/v1/me/player/devices")
+async def devices():
+    await delay()
+    return {"devices": [{"id": "device1", "name": "Stub Device", "is_active": True}]}
+
+
+@app.put("/v1/me/player/play")
+@app.put("/v1/me/player/pause")
+@app.put("/v1/me/player/seek")
+@app.put("/v1/me/player/volume")
+@app.put("/v1/me/player")
+@app.post("/v1/me/player/queue")
+@app.post("/v1/me/player/next")
+@app.post("/v1/me/player/previous")
+async def player_command():
+    await delay()
+    return Response(status_code=204)
+
+
+def added_at(track_id: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1_600_000_000 + track_id * 60))
+
+
+def paging(request: Request, items: list, total: int, limit: int, offset: int) -> dict:
+    has_next = offset + limit < total
+    next_url = str(request.url.include_query_params(offset=offset + limit)) if has_next else None
+    return {"items": items, "total": total, "limit": limit, "offset": offset, "next": next_url}
+
+
+@app.get("/v1/me/tracks")
+async def saved_tracks(request: Request, limit: int = 20, offset: int = 0):
+    await delay()
+    page = saved_track_ids[offset:offset + limit]
+    items = [{"added_at": added_at(i), "track": make_track(i)} for i in page]
+    return paging(request, items, len(saved_track_ids), limit, offset)
+
+
+@app.get("/v1/me/playlists")
+async def playlists(request: Request, limit: int = 20, offset: int = 0):
+    await delay()
+    items = [
+        {
+            "id": f"playlist{i}",
+            "name": f"Playlist {i}",
+            "uri": f"spotify:playlist:playlist{i}",
+            "description": "",
+            "images": [],
+            "owner": {"display_name": "Stub User"},
+            "snapshot_id": f"snapshot{i}-{playlist_snapshots[i]}",
+            "tracks": {"total": PLAYLIST_TRACKS},
+        }
+        for i in range(offset, min(offset + limit, PLAYLISTS))
+    ]
+    return paging(request, items, PLAYLISTS, limit, offset)
+
+
+@app.get("/v1/playlists/{playlist_id}/tracks")
+async def playlist_tracks(request: Request, playlist_id: str, limit: int = 100, offset: int = 0):
+    await delay()
+    items = [
+        {"added_at": added_at(i), "track": make_track(i)}
+        for i in range(offset, min(offset + limit, PLAYLIST_TRACKS))
+    ]
+    return paging(request, items, PLAYLIST_TRACKS, limit, offset)
+
+
+@app.post("/api/token")
+async def token(request: Request):
+    await delay()
+    form = await request.form()
+    token_info = {
+        "access_token": f"stub-access-token-{next(token_serial)}",
+        "token_type": "Bearer",
+        "expires_in": TOKEN_EXPIRES_IN,
+    }
+    if form.get("grant_type") == "authorization_code":
+        token_info["refresh_token"] = "stub-refresh-token"
+    return token_info
+
+
+@lru_cache(maxsize=256)
+def album_art(i: int, size: int) -> bytes:
+    """A 640 px JPEG (or ``size`` px) of gradient, shapes and grain, about as heavy as real artwork."""
+    import io
+
+    from PIL import Image, ImageDraw, ImageFilter, ImageOps
+
+    rng = random.Random(i)
+    background = Image.linear_gradient("L").resize((640, 640)).rotate(rng.randrange(360))
+    image = ImageOps.colorize(background, tuple(rng.randrange(256) for _ in range(3)),
+                              tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y, r = rng.randrange(640), rng.randrange(640), rng.randrange(20, 160)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    # Coarse grain, so detail survives downscaling as it does in real artwork
+    grain = Image.effect_noise((213, 213), 60).convert("RGB").resize((640, 640), Image.BICUBIC)
+    image = Image.blend(image.filter(ImageFilter.GaussianBlur(2)), grain, 0.25)
+    if size != 640:
+        image = image.resize((size, size), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+# Image CDN stand-in: /image/<i> is 640 px, /image/<i>-<size> the smaller sizes Spotify also lists
+@app.get("/image/{name}")
+async def image(name: str):
+    await delay()
+    i, _, size = name.partition("-")
+    return Response(album_art(int(i), int(size or 640)), media_type="image/jpeg")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("STUB_PORT", "8900")), log_level="warning")
@@ -0,0 +1,169 @@
+"""
+Circuit breakers for upstream Spotify calls, one per endpoint group.
+
+Each group (``search``, ``player``, ``me``, ``library``, ``catalog``,
+``auth``) records the outcome of its calls over a rolling time window.
+These count as failures:
+
+- 5xx answers
+- transport errors and timeouts
+- calls slower than ``slow_call_seconds``. Reads are abandoned at that
+  point rather than waited out; writes run to the HTTP timeout, since
+  Spotify may act on them anyway
+
+Once at least ``min_calls`` calls are in the window and the failure share
+reaches ``failure_rate``, the breaker opens. While open, calls are refused
+immediately for ``open_seconds`` instead of tying up a worker on a dead
+dependency. It then half-opens and lets ``half_open_calls`` probes through.
+A successful probe closes it again; a failed one reopens it.
+"""
+
+import time
+from collections import deque
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Numeric states for the gauge export
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def endpoint_group(path: str) -> str:
+    """Breaker group for a Web API path relative to ``/v1``."""
+    if path.startswith("/search"):
+        return "search"
+    if path.startswith("/me/player"):
+        return "player"
+    if path == "/me":
+        return "me"
+    # Saved tracks, playlists, albums, follows: paged bulk reads that must not trip token validation
+    if path.startswith("/me/"):
+        return "library"
+    return "catalog"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window: float = 30.0,
+        slow_call_seconds: float = 2.0,
+        open_seconds: float = 15.0,
+        half_open_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes: "deque[tuple]" = deque()
+        self._failures = 0
+        self._probes = 0
+        self.opened = 0
+        self.rejected = 0
+        self.slow_calls = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; every allowed call must be ``record``ed or ``release``d."""
+        if self.state == OPEN:
+            if time.monotonic() < self.opened_at + self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a call through again (0 when it would now)."""
+        if self.state == OPEN:
+            return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+        if self.state == HALF_OPEN and self._probes >= self.half_open_calls:
+            return self.open_seconds
+        return 0.0
+
+    def record(self, failed: bool, elapsed: float) -> None:
+        if elapsed >= self.slow_call_seconds:
+            self.slow_calls += 1
+            failed = True
+        if self.state == HALF_OPEN:
+            self._probes -= 1
+            if failed:
+                self._open()
+            else:
+                self._close()
+            return
+        if self.state == OPEN:
+            # Started before the breaker opened
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, old_failed = self._outcomes.popleft()
+            self._failures -= old_failed
+        if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_rate * len(self._outcomes):
+            self._open()
+
+    def release(self) -> None:
+        """Give back an allowed call that ended without an outcome (e.g. cancelled)."""
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.opened += 1
+        self._outcomes.clear()
+        self._failures = 0
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+
+class BreakerSet:
+    """Lazily created breakers sharing one configuration."""
+
+    def __init__(self, enabled: bool = True, **settings):
+        self.enabled = enabled
+        self.settings = settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, group: str) -> CircuitBreaker:
+        breaker = self._breakers.get(group)
+        if breaker is None:
+            breaker = self._breakers[group] = CircuitBreaker(group, **self.settings)
+        return breaker
+
+    def is_open(self, group: str) -> bool:
+        """Whether calls to ``group`` are currently being refused or only probed."""
+        breaker = self._breakers.get(group)
+        return self.enabled and breaker is not None and breaker.state != CLOSED
+
+    def retry_in(self, group: str) -> float:
+        breaker = self._breakers.get(group)
+        return breaker.retry_in() if breaker is not None else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        stats: Dict[str, float] = {}
+        for group, breaker in self._breakers.items():
+            stats[f"{group}_state"] = _STATE_VALUES[breaker.state]
+            stats[f"{group}_opened"] = breaker.opened
+            stats[f"{group}_rejected"] = breaker.rejected
+            stats[f"{group}_slow_calls"] = breaker.slow_calls
+        return stats
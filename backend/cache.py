@@ -0,0 +1,316 @@
+"""
+In-process response cache with TTL, LRU eviction and single-flight fetches.
+
+Entries are bounded by their JSON-encoded size rather than by count, so a
+handful of huge payloads cannot crowd out the process. Concurrent misses
+for the same key share one in-flight fetch. An optional shared backend lets
+several workers reuse each other's results.
+
+With ``stale_ttl`` an expired entry is kept that much longer as a fallback.
+``get_or_fetch_stale`` serves it, and schedules one background refresh for
+the key, when the refresh fails with an outage-type error, when the caller
+says the upstream is known to be down, or while another caller's refresh
+of the key is still in flight.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable string key for a tuple of request parameters."""
+    raw = json.dumps(parts, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class SharedCacheBackend:
+    """Cross-worker cache tier. Values are JSON-encoded bytes."""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+
+class MongoCacheBackend(SharedCacheBackend):
+    """Shared tier stored in a MongoDB collection with a TTL index."""
+
+    def __init__(self, mongo_url: str, database: str = "spotify_clone", collection: str = "response_cache"):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.client = AsyncIOMotorClient(mongo_url)
+        self.collection = self.client[database][collection]
+        self._index_ready = False
+
+    async def _ensure_index(self) -> None:
+        if not self._index_ready:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        doc = await self.collection.find_one({"_id": key})
+        if not doc or doc["expires_at"].replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+            return None
+        return doc["value"]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._ensure_index()
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        await self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "value": value, "expires_at": expires_at},
+            upsert=True,
+        )
+
+
+class TTLCache:
+    """Byte-bounded LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_bytes: int,
+        shared: Optional[SharedCacheBackend] = None,
+        name: str = "cache",
+        stale_ttl: float = 0.0,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.name = name
+        self.current_bytes = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_served = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                self._remove(key)
+                self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key: Hashable) -> Any:
+        """The entry for ``key`` even if expired, as long as it is within ``stale_ttl``."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] + self.stale_ttl <= time.monotonic():
+            return None
+        return entry[2]
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None) -> None:
+        if size is None:
+            size = len(json.dumps(value, separators=(",", ":")))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        """Drop ``key`` if present, e.g. after a write that makes it stale."""
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._fetch_through_shared(key, fetch)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure with no waiters is not logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def get_or_fetch_stale(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        use_stale: Callable[[Exception], bool],
+        refresh_in: Callable[[], float] = lambda: 0.0,
+        upstream_down: Callable[[], bool] = lambda: False,
+    ) -> Tuple[Any, bool]:
+        """``get_or_fetch`` that falls back to a stale entry; returns ``(value, stale)``.
+
+        A failed fetch falls back only when ``use_stale(error)`` holds. The
+        key is then refreshed once in the background after ``refresh_in()``
+        seconds.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, False
+        value = self.get_stale(key)
+        if value is None or not (key in self._inflight or upstream_down()):
+            try:
+                return await self.get_or_fetch(key, fetch), False
+            except Exception as e:
+                value = self.get_stale(key)
+                if value is None or not use_stale(e):
+                    raise
+        self.stale_served += 1
+        if key not in self._refreshing:
+            task = asyncio.create_task(self._refresh(key, fetch, refresh_in()))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return value, True
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]], delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await self.get_or_fetch(key, fetch)
+        except Exception as e:
+            logger.info(f"Background {self.name} refresh failed: {str(e)}")
+
+    async def get_or_fetch_many(
+        self,
+        keys: Iterable[Hashable],
+        fetch_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+    ) -> Dict[Hashable, Any]:
+        """Batch form of ``get_or_fetch``: one ``fetch_many`` call for every miss.
+
+        Keys already being fetched by another caller are awaited rather than
+        fetched again. Keys that ``fetch_many`` leaves out of its result are
+        missing from the returned dict and are not cached.
+        """
+        found: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, asyncio.Future] = {}
+        missing: List[Hashable] = []
+        for key in dict.fromkeys(keys):
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                found[key] = value
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                missing.append(key)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._inflight.update(futures)
+            try:
+                fetched = await fetch_many(missing)
+            except asyncio.CancelledError:
+                for future in futures.values():
+                    future.cancel()
+                raise
+            except Exception as e:
+                for future in futures.values():
+                    future.set_exception(e)
+                    future.exception()
+                raise
+            else:
+                for key, future in futures.items():
+                    value = fetched.get(key)
+                    if value is not None:
+                        self.set(key, value)
+                        found[key] = value
+                    future.set_result(value)
+            finally:
+                for key in missing:
+                    del self._inflight[key]
+
+        if waiting:
+            values = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+            found.update((key, value) for key, value in zip(waiting, values) if value is not None)
+        return found
+
+    async def _fetch_through_shared(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if self.shared is not None:
+            try:
+                encoded = await self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared {self.name} lookup failed: {str(e)}")
+                encoded = None
+            if encoded is not None:
+                self.shared_hits += 1
+                value = json.loads(encoded)
+                self.set(key, value, len(encoded))
+                return value
+
+        value = await fetch()
+        if value is None:
+            return None
+        encoded = json.dumps(value, separators=(",", ":")).encode()
+        self.set(key, value, len(encoded))
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, encoded, self.ttl)
+            except Exception as e:
+                logger.warning(f"Shared {self.name} store failed: {str(e)}")
+        return value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale_served": self.stale_served,
+            "refreshing": len(self._refreshing),
+        }
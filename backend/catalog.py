@@ -0,0 +1,65 @@
+"""
+Batch catalog lookups for tracks, artists and albums.
+
+Each entity is cached on its own, so overlapping batches (a playlist view, then
+an album view sharing tracks) only fetch what is new. Misses go through
+Spotify's multi-ID endpoints in the largest chunks each one accepts, with the
+chunks fetched concurrently.
+"""
+
+import asyncio
+import re
+from typing import Any, Dict, List, Optional
+
+from cache import TTLCache
+from projections import SLIM_BY_TYPE
+from spotify_client import SpotifyClient
+
+# Maximum IDs per request for each multi-ID endpoint
+CHUNK_SIZES = {"track": 50, "artist": 50, "album": 20}
+
+_SPOTIFY_ID = re.compile(r"^[0-9A-Za-z]{22}$")
+
+
+def is_spotify_id(value: str) -> bool:
+    return bool(_SPOTIFY_ID.match(value))
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def fetch_entities(sp: SpotifyClient, kind: str, ids: List[str], market: Optional[str] = None) -> Dict[str, Any]:
+    """Slim entities by ID, fetched in concurrent maximum-size chunks."""
+    if kind == "track":
+        fetch = lambda chunk: sp.tracks(chunk, market=market)
+    elif kind == "album":
+        fetch = lambda chunk: sp.albums(chunk, market=market)
+    else:
+        fetch = sp.artists
+    pages = await asyncio.gather(*(fetch(chunk) for chunk in _chunks(ids, CHUNK_SIZES[kind])))
+    slim = SLIM_BY_TYPE[kind]
+    found = {}
+    for page in pages:
+        # Unknown IDs come back as null entries
+        for entity in (page or {}).get(f"{kind}s") or []:
+            if entity and entity.get("id"):
+                found[entity["id"]] = slim(entity)
+    return found
+
+
+async def get_entities(
+    cache: TTLCache,
+    sp: SpotifyClient,
+    kind: str,
+    ids: List[str],
+    market: Optional[str] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """Entities in the order of ``ids`` (duplicates included); ``None`` where Spotify has none."""
+
+    async def fetch_many(keys: List[tuple]) -> Dict[tuple, Any]:
+        found = await fetch_entities(sp, kind, [entity_id for _, _, entity_id in keys], market)
+        return {(kind, market, entity_id): entity for entity_id, entity in found.items()}
+
+    entities = await cache.get_or_fetch_many([(kind, market, entity_id) for entity_id in ids], fetch_many)
+    return [entities.get((kind, market, entity_id)) for entity_id in ids]
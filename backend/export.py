@@ -0,0 +1,86 @@
+"""
+Streaming NDJSON export of large paged collections.
+
+The first page reveals ``total``. The remaining pages are then fetched
+concurrently, within a sliding window of ``window`` requests, and yielded
+strictly in order as soon as each one arrives. At most ``window + 1`` pages
+are held at once, so time-to-first-byte and memory stay flat however long
+the playlist or library is.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+
+from projections import slim_track
+
+logger = logging.getLogger(__name__)
+
+
+async def iter_pages(
+    fetch_page: Callable[[int], Awaitable[Dict[str, Any]]],
+    page_size: int,
+    window: int = 4,
+    first_page: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(offset, page)`` in offset order, prefetching up to ``window`` pages ahead."""
+    if first_page is None:
+        first_page = await fetch_page(0)
+    yield 0, first_page
+
+    offsets = iter(range(page_size, first_page.get("total", 0), page_size))
+    pending: "deque[Tuple[int, asyncio.Task]]" = deque(
+        (offset, asyncio.create_task(fetch_page(offset))) for offset in islice(offsets, window)
+    )
+    try:
+        while pending:
+            offset, task = pending.popleft()
+            page = await task
+            # Refill before yielding so the window stays full while the client reads
+            next_offset = next(offsets, None)
+            if next_offset is not None:
+                pending.append((next_offset, asyncio.create_task(fetch_page(next_offset))))
+            yield offset, page
+    finally:
+        # Client went away or a page failed: stop the prefetches
+        for _, task in pending:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+
+def track_rows(offset: int, page: Dict[str, Any]) -> bytes:
+    """One NDJSON line per saved-track or playlist item, numbered by position."""
+    lines = []
+    for position, item in enumerate(page.get("items") or [], start=offset):
+        track = (item or {}).get("track")
+        row = {
+            "position": position,
+            "added_at": (item or {}).get("added_at"),
+            "track": slim_track(track) if track else None,
+        }
+        lines.append(orjson.dumps(row))
+    return b"\n".join(lines) + b"\n" if lines else b""
+
+
+async def ndjson_stream(
+    pages: AsyncIterator[Tuple[int, Dict[str, Any]]],
+    rows: Callable[[int, Dict[str, Any]], bytes] = track_rows,
+) -> AsyncIterator[bytes]:
+    """Encode pages as NDJSON chunks, one chunk per page.
+
+    The status line is already sent when a later page fails, so the failure
+    is reported as a final ``{"error": ...}`` row.
+    """
+    try:
+        async for offset, page in pages:
+            chunk = rows(offset, page)
+            if chunk:
+                yield chunk
+    except Exception as e:
+        logger.error(f"Export stream failed: {str(e)}")
+        yield (json.dumps({"error": str(e)}) + "\n").encode()
@@ -0,0 +1,159 @@
+"""
+Outbound rate-limit governor for Spotify Web API calls.
+
+Every upstream call first takes a token from its user's bucket and then from
+the app-wide bucket. When the app bucket is empty, callers wait in a
+priority queue so playback control goes ahead of background reads. A 429
+from Spotify pauses all outbound traffic for the advertised Retry-After
+(plus jitter) instead of letting every route fail at once.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Lower values are dispatched first
+PRIORITY_CONTROL = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_READ = 2
+PRIORITY_BACKGROUND = 3
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        """Seconds until one token is available."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateGovernor:
+    def __init__(
+        self,
+        app_rate: float = 20.0,
+        app_burst: float = 40.0,
+        user_rate: float = 5.0,
+        user_burst: float = 10.0,
+        max_users: int = 10000,
+        max_retries: int = 2,
+        max_retry_wait: float = 10.0,
+    ):
+        self.app_bucket = TokenBucket(app_rate, app_burst)
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self._user_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.blocked_until = 0.0
+        self.granted = 0
+        self.queued = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.throttled = 0
+        self.retries = 0
+
+    def _user_bucket(self, user_key: str) -> TokenBucket:
+        bucket = self._user_buckets.get(user_key)
+        if bucket is None:
+            bucket = self._user_buckets[user_key] = TokenBucket(self.user_rate, self.user_burst)
+            while len(self._user_buckets) > self.max_users:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_key)
+        return bucket
+
+    async def acquire(self, priority: int = PRIORITY_READ, user_key: Optional[str] = None) -> None:
+        started = time.monotonic()
+        if user_key is not None:
+            bucket = self._user_bucket(user_key)
+            # Playback control is charged to the user but never waits behind their reads
+            while not bucket.try_take() and priority > PRIORITY_CONTROL:
+                await asyncio.sleep(bucket.delay())
+
+        if not self._heap and self.blocked_until <= time.monotonic() and self.app_bucket.try_take():
+            self._granted(started)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), future))
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._heap))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+        self._granted(started)
+
+    def _granted(self, started: float) -> None:
+        waited = time.monotonic() - started
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    async def _dispatch(self) -> None:
+        while self._heap:
+            pause = self.blocked_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            _, _, future = self._heap[0]
+            if future.done():
+                # Waiter was cancelled while queued
+                heapq.heappop(self._heap)
+                continue
+            if not self.app_bucket.try_take():
+                await asyncio.sleep(self.app_bucket.delay())
+                continue
+            heapq.heappop(self._heap)
+            future.set_result(None)
+
+    def record_throttle(self, retry_after: float, attempt: int = 0) -> float:
+        """Pause outbound traffic after a 429. Returns the jittered pause in seconds."""
+        self.throttled += 1
+        pause = retry_after + random.uniform(0, 0.25 * (attempt + 1) * max(retry_after, 1.0))
+        self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+        return pause
+
+    def should_retry(self, retry_after: float, attempt: int) -> bool:
+        if attempt >= self.max_retries or retry_after > self.max_retry_wait:
+            return False
+        self.retries += 1
+        return True
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "queue_depth": len(self._heap),
+            "max_queue_depth": self.max_queue_depth,
+            "granted": self.granted,
+            "queued": self.queued,
+            "avg_wait_ms": round(self.total_wait / self.granted * 1000, 3) if self.granted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "blocked_for_ms": round(max(0.0, self.blocked_until - time.monotonic()) * 1000, 1),
+        }
@@ -0,0 +1,28 @@
+# Gunicorn settings for production: gunicorn -c gunicorn.conf.py server:app
+import multiprocessing
+import os
+import secrets
+
+from dotenv import load_dotenv
+
+# server.py reads most settings at import, which preload_app runs in this process
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+backlog = int(os.getenv("SERVER_BACKLOG", "2048"))
+keepalive = int(os.getenv("SERVER_KEEP_ALIVE", "5"))
+# SIGTERM: stop accepting, give in-flight requests this long to finish
+graceful_timeout = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+timeout = 60
+# Import the app once in the master; workers are forked with it loaded and only run the
+# lifespan startup. Code changes then need a full restart rather than a HUP.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+accesslog = None
+
+# Let each worker know how many siblings share the app-wide rate budget
+raw_env = [f"WEB_CONCURRENCY={workers}"]
+# Stream tickets are signed; without preload each worker imports server.py on its own,
+# so they need this shared secret to redeem each other's tickets
+os.environ.setdefault("STREAM_TICKET_SECRET", secrets.token_hex(32))
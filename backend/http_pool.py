@@ -0,0 +1,159 @@
+"""
+Process-wide pooled HTTP client for upstream Spotify traffic.
+
+One ``httpx.AsyncClient`` is built in the FastAPI lifespan hook and shared by
+every route and every user token. The API and Accounts hosts each get their
+own connection pool so a burst of token exchanges cannot starve API calls.
+
+Tunables (environment variables):
+    SPOTIFY_HTTP2                     use HTTP/2 when the ``h2`` package is installed (default 1)
+    SPOTIFY_HTTP_TIMEOUT              overall read/write/pool timeout in seconds (default 10)
+    SPOTIFY_HTTP_CONNECT_TIMEOUT      connect timeout in seconds (default 5)
+    SPOTIFY_HTTP_KEEPALIVE_EXPIRY     idle keep-alive lifetime in seconds (default 30)
+    SPOTIFY_API_MAX_CONNECTIONS       pool size for the Web API host (default 100)
+    SPOTIFY_API_MAX_KEEPALIVE         idle connections kept for the Web API host (default 50)
+    SPOTIFY_ACCOUNTS_MAX_CONNECTIONS  pool size for the Accounts host (default 20)
+    SPOTIFY_ACCOUNTS_MAX_KEEPALIVE    idle connections kept for the Accounts host (default 10)
+    IMAGE_HTTP_MAX_CONNECTIONS        pool size for the image proxy's CDN client (default 20)
+
+The image proxy gets a separate client: CDN downloads are neither rate
+limited nor worth per-endpoint upstream metrics.
+"""
+
+import logging
+import os
+import ssl
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def http2_available() -> bool:
+    if os.getenv("SPOTIFY_HTTP2", "1") in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ConnectionStats:
+    """Counts upstream requests against newly opened connections.
+
+    ``trace_factory`` may build a per-request callback that also receives
+    every httpcore trace event, e.g. for phase timing.
+    """
+
+    def __init__(self, trace_factory: Optional[Callable[[httpx.URL], Callable[[str, Dict[str, Any]], None]]] = None):
+        self.trace_factory = trace_factory
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    @property
+    def connections_reused(self) -> int:
+        return max(0, self.requests - self.connections_opened)
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        observer = self.trace_factory(request.url) if self.trace_factory else None
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            if observer is not None:
+                observer(event_name, info)
+
+        request.extensions["trace"] = trace
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            "tls_handshakes": self.tls_handshakes,
+        }
+
+
+def _host_pattern(base_url: str) -> str:
+    url = httpx.URL(base_url)
+    return f"all://{url.host}" if url.port is None else f"all://{url.host}:{url.port}"
+
+
+def import_transport() -> None:
+    """Import httpcore, which httpx only loads when the first transport is built."""
+    import httpcore  # noqa: F401
+
+
+@lru_cache(maxsize=1)
+def ssl_context() -> ssl.SSLContext:
+    # Loading the CA bundle takes tens of milliseconds; every pool shares one context
+    return httpx.create_ssl_context()
+
+
+def _transport(max_connections: int, max_keepalive: int, http2: bool) -> httpx.AsyncHTTPTransport:
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=_env_float("SPOTIFY_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    return httpx.AsyncHTTPTransport(verify=ssl_context(), limits=limits, http2=http2)
+
+
+def create_http_client(
+    api_url: str,
+    accounts_url: str,
+    stats: ConnectionStats,
+    response_hooks: Iterable[Callable[[httpx.Response], Any]] = (),
+) -> httpx.AsyncClient:
+    http2 = http2_available()
+    mounts = {
+        _host_pattern(accounts_url): _transport(
+            _env_int("SPOTIFY_ACCOUNTS_MAX_CONNECTIONS", 20),
+            _env_int("SPOTIFY_ACCOUNTS_MAX_KEEPALIVE", 10),
+            http2,
+        ),
+        # Registered last so the API pool wins when both share a host (local stub)
+        _host_pattern(api_url): _transport(
+            _env_int("SPOTIFY_API_MAX_CONNECTIONS", 100),
+            _env_int("SPOTIFY_API_MAX_KEEPALIVE", 50),
+            http2,
+        ),
+    }
+    timeout = httpx.Timeout(
+        _env_float("SPOTIFY_HTTP_TIMEOUT", 10.0),
+        connect=_env_float("SPOTIFY_HTTP_CONNECT_TIMEOUT", 5.0),
+    )
+    logger.info(f"Creating upstream HTTP client (http2={http2})")
+    return httpx.AsyncClient(
+        mounts=mounts,
+        timeout=timeout,
+        verify=ssl_context(),
+        http2=http2,
+        event_hooks={"request": [stats.on_request], "response": list(response_hooks)},
+    )
+
+
+def create_image_client() -> httpx.AsyncClient:
+    max_connections = _env_int("IMAGE_HTTP_MAX_CONNECTIONS", 20)
+    return httpx.AsyncClient(
+        transport=_transport(max_connections, max_connections, http2_available()),
+        timeout=httpx.Timeout(
+            _env_float("SPOTIFY_HTTP_TIMEOUT", 10.0),
+            connect=_env_float("SPOTIFY_HTTP_CONNECT_TIMEOUT", 5.0),
+        ),
+    )
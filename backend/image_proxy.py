@@ -0,0 +1,478 @@
+"""
+Album-art proxy: resized, content-addressed images cached on local disk.
+
+Spotify payloads link full-size artwork (640 px JPEGs) that the frontend
+cards draw at 64-300 px. ``ImageProxy.rewrite`` replaces every ``images``
+list in a response with proxy URLs, one per width in ``widths``. Each URL
+points at the smallest upstream image that is at least that wide.
+
+``ImageCache`` serves those URLs. An upstream image is downloaded once and
+stored under the SHA-256 of its bytes, so artwork reached through several
+URLs is stored once. Resized variants, as WebP for clients that accept it,
+are rendered with Pillow on first use and stored next to the original.
+Once the directory grows past ``max_bytes``, the least recently used files
+are deleted. Without Pillow the proxy still caches and serves the upstream
+images, but cannot resize or transcode them. Pillow is imported in a
+thread by the first request that can use it, not at import or startup.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Spotify's image CDNs; anything else is refused so the proxy is not an open relay
+DEFAULT_HOSTS = (
+    "i.scdn.co",
+    "mosaic.scdn.co",
+    "image-cdn-ak.spotifycdn.com",
+    "image-cdn-fa.spotifycdn.com",
+    "thisis-images.spotifycdn.com",
+    "seed-mix-image.spotifycdn.com",
+)
+
+# Width assumed for images Spotify lists without one (playlist mosaics are 640 px)
+UNKNOWN_WIDTH = 640
+
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+_EXTENSIONS = {media_type: ext for ext, media_type in MEDIA_TYPES.items()}
+
+
+@lru_cache(maxsize=65536)
+def _quoted(url: str) -> str:
+    # Responses repeat the same artwork URLs; quoting dominated the rewrite cost
+    return quote(url, safe="")
+
+
+class ImageError(Exception):
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CachedImage(NamedTuple):
+    path: str
+    media_type: str
+    etag: str
+    stat: os.stat_result
+
+
+class ImageProxy:
+    """Which image URLs may be proxied, and rewriting of payloads to use the proxy."""
+
+    def __init__(
+        self,
+        widths: Iterable[int],
+        hosts: Iterable[str] = DEFAULT_HOSTS,
+        path: str = "/api/images",
+        memo_size: int = 256,
+    ):
+        self.widths = sorted(set(widths), reverse=True)
+        self.hosts = frozenset(hosts)
+        self.path = path
+        self.memo_size = memo_size
+        # (id(payload), base_url) -> (payload, rewritten); holding the payload keeps its id from being reused
+        self._memo: "OrderedDict[Tuple[int, str], Tuple[Any, Any]]" = OrderedDict()
+
+    def allowed(self, url: Any) -> bool:
+        if not isinstance(url, str):
+            return False
+        parts = urlsplit(url)
+        return parts.scheme in ("https", "http") and parts.netloc in self.hosts
+
+    def url(self, base_url: str, src: str, width: int) -> str:
+        return f"{base_url}{self.path}?src={_quoted(src)}&w={width}"
+
+    def rewrite_images(self, images: List[Any], base_url: str) -> List[Any]:
+        sources = sorted(
+            (image for image in images if isinstance(image, dict) and self.allowed(image.get("url"))),
+            key=lambda image: image.get("width") or UNKNOWN_WIDTH,
+        )
+        if not sources:
+            return images
+        rewritten = []
+        for width in self.widths:
+            # Smallest upstream image at least this wide, else the largest there is (no upscaling)
+            source = next((s for s in sources if (s.get("width") or UNKNOWN_WIDTH) >= width), sources[-1])
+            source_width = source.get("width") or UNKNOWN_WIDTH
+            width = min(width, source_width)
+            if rewritten and rewritten[-1]["width"] == width:
+                continue
+            height = source.get("height")
+            rewritten.append({
+                "url": self.url(base_url, source["url"], width),
+                "width": width,
+                "height": round(height * width / source_width) if height and source.get("width") else None,
+            })
+        return rewritten
+
+    def rewrite_cached(self, value: Any, base_url: str) -> Any:
+        """``rewrite`` for payloads served many times as the same object, e.g. cache entries."""
+        key = (id(value), base_url)
+        memo = self._memo.get(key)
+        if memo is not None:
+            self._memo.move_to_end(key)
+            return memo[1]
+        rewritten = self.rewrite(value, base_url)
+        self._memo[key] = (value, rewritten)
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return rewritten
+
+    def rewrite(self, value: Any, base_url: str) -> Any:
+        """``value`` with every ``images`` list pointed at the proxy; unchanged subtrees are shared, not copied."""
+        if isinstance(value, dict):
+            changed = None
+            for key, item in value.items():
+                if key == "images" and isinstance(item, list):
+                    new = self.rewrite_images(item, base_url)
+                elif isinstance(item, (dict, list)):
+                    new = self.rewrite(item, base_url)
+                else:
+                    continue
+                if new is not item:
+                    if changed is None:
+                        changed = dict(value)
+                    changed[key] = new
+            return value if changed is None else changed
+        if isinstance(value, list):
+            changed = None
+            for i, item in enumerate(value):
+                if isinstance(item, (dict, list)):
+                    new = self.rewrite(item, base_url)
+                    if new is not item:
+                        if changed is None:
+                            changed = list(value)
+                        changed[i] = new
+            return value if changed is None else changed
+        return value
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _read_text(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def _stat_paths(paths: List[str]) -> List[Optional[os.stat_result]]:
+    stats = []
+    for path in paths:
+        try:
+            stats.append(os.stat(path))
+        except FileNotFoundError:
+            stats.append(None)
+    return stats
+
+
+def _remove_paths(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _webp_supported() -> bool:
+    from PIL import features
+
+    return features.check("webp")
+
+
+def _render(source: str, target: str, width: int, ext: str, quality: int) -> int:
+    """Write ``source`` scaled down to ``width`` (0: full size) as ``ext``; returns the file size."""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        if width:
+            # JPEG decodes straight to a nearby power-of-two scale, much cheaper than a full decode
+            image.draft("RGB", (width, width))
+            image.thumbnail((width, width * 8), Image.LANCZOS, reducing_gap=3.0)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "P", "PA") else "RGB")
+        tmp = f"{target}.{os.getpid()}.tmp"
+        if ext == "webp":
+            image.save(tmp, "WEBP", quality=quality, method=4)
+        elif ext == "png":
+            image.save(tmp, "PNG", optimize=True)
+        else:
+            image.convert("RGB").save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp, target)
+    return os.path.getsize(target)
+
+
+class ImageCache:
+    """Size-capped LRU of upstream images and their resized variants under ``directory``.
+
+    Layout: ``refs/<sha256(url)>`` holds the digest and media type of what the
+    URL served; ``objects/<digest>`` is the original and
+    ``objects/<digest>-<width>.<ext>`` a variant. The LRU order lives in
+    memory and is rebuilt from file mtimes on ``load``. With several
+    workers each one accounts for the files it knows about, so the cap is
+    approximate.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        widths: Iterable[int],
+        quality: int = 80,
+        max_source_bytes: int = 5 * 1024 * 1024,
+        http: Optional[httpx.AsyncClient] = None,
+        http_factory: Optional[Callable[[], httpx.AsyncClient]] = None,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.widths = sorted(set(widths))
+        self.quality = quality
+        self.max_source_bytes = max_source_bytes
+        # Built on the first download when not given
+        self.http = http
+        self.http_factory = http_factory
+        self.resize = importlib.util.find_spec("PIL") is not None
+        # Known once the first request asking for WebP has imported Pillow
+        self.webp: Optional[bool] = None
+        self.current_bytes = 0
+        # path -> (size, ref contents or None)
+        self._files: "OrderedDict[str, Tuple[int, Optional[Tuple[str, str]]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.fetches = 0
+        self.renders = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def load(self) -> None:
+        """Index the files a previous run left behind, least recently written first."""
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # Left by a crash mid-write
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._files[path] = (size, None)
+            self.current_bytes += size
+        # Already off the event loop
+        _remove_paths(self._evict())
+        logger.info(f"Image cache: {len(self._files)} files, {self.current_bytes} bytes in {self.directory}")
+
+    def variant_width(self, width: int) -> int:
+        """Nearest configured width at or above ``width``; 0 (full size) for 0 or anything wider."""
+        if width <= 0:
+            return 0
+        return next((w for w in self.widths if w >= width), 0)
+
+    def _ref_path(self, src: str) -> str:
+        key = hashlib.sha256(src.encode()).hexdigest()
+        return os.path.join(self.directory, "refs", key[:2], key)
+
+    def _object_path(self, digest: str, suffix: str = "") -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest + suffix)
+
+    async def _lookup(self, *paths: str) -> List[Optional[os.stat_result]]:
+        """Stats of the indexed ``paths`` in one thread hop; None for unknown or vanished files."""
+        known = [path for path in paths if path in self._files]
+        stats = dict(zip(known, await asyncio.to_thread(_stat_paths, known))) if known else {}
+        for path, stat in stats.items():
+            if path not in self._files:
+                continue
+            if stat is None:
+                # Evicted by another worker
+                self._drop(path)
+            else:
+                self._files.move_to_end(path)
+        return [stats.get(path) for path in paths]
+
+    async def _add(self, path: str, size: int, ref: Optional[Tuple[str, str]] = None) -> None:
+        if path in self._files:
+            self._drop(path)
+        self._files[path] = (size, ref)
+        self.current_bytes += size
+        evicted = self._evict()
+        if evicted:
+            await asyncio.to_thread(_remove_paths, evicted)
+
+    def _drop(self, path: str) -> None:
+        size, _ = self._files.pop(path)
+        self.current_bytes -= size
+
+    def _evict(self) -> List[str]:
+        """Unindex files until under ``max_bytes``; returns their paths for the caller to delete."""
+        evicted = []
+        # Never the newest file: it is about to be served
+        while self.current_bytes > self.max_bytes and len(self._files) > 1:
+            path = next(iter(self._files))
+            self._drop(path)
+            self.evictions += 1
+            evicted.append(path)
+        return evicted
+
+    async def _single_flight(self, key: str, make: Callable[[], Awaitable[Any]]) -> Any:
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await make()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _cached_ref(self, ref_path: str) -> Optional[Tuple[str, str]]:
+        """Digest and media type recorded for a source URL, if indexed."""
+        entry = self._files.get(ref_path)
+        if entry is None:
+            return None
+        size, ref = entry
+        if ref is None:
+            # Indexed by load(); read once
+            try:
+                digest, media_type = (await asyncio.to_thread(_read_text, ref_path)).split()
+            except FileNotFoundError:
+                if ref_path in self._files:
+                    self._drop(ref_path)
+                return None
+            ref = (digest, media_type)
+            if ref_path in self._files:
+                self._files[ref_path] = (size, ref)
+        return ref
+
+    async def _download(self, src: str) -> Tuple[bytes, str]:
+        try:
+            if self.http is None:
+                self.http = self.http_factory()
+            async with self.http.stream("GET", src) as response:
+                if response.status_code != 200:
+                    raise ImageError(f"Upstream image returned {response.status_code}")
+                media_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                if media_type not in _EXTENSIONS:
+                    raise ImageError(f"Upstream returned unsupported content type {media_type!r}")
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_source_bytes:
+                        raise ImageError("Upstream image is too large")
+                    chunks.append(chunk)
+        except httpx.HTTPError as e:
+            raise ImageError(f"Error fetching upstream image: {str(e)}")
+        return b"".join(chunks), media_type
+
+    async def _fetch_original(self, src: str) -> Tuple[str, str]:
+        body, media_type = await self._download(src)
+        self.fetches += 1
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if (await self._lookup(path))[0] is None:
+            await asyncio.to_thread(_write_atomic, path, body)
+            await self._add(path, len(body))
+        ref = f"{digest} {media_type}".encode()
+        await asyncio.to_thread(_write_atomic, self._ref_path(src), ref)
+        await self._add(self._ref_path(src), len(ref), (digest, media_type))
+        return digest, media_type
+
+    async def _render_variant(self, original: str, path: str, width: int, ext: str) -> None:
+        try:
+            size = await asyncio.to_thread(_render, original, path, width, ext, self.quality)
+        except FileNotFoundError:
+            raise ImageError("Cached image was evicted, retry", status_code=503)
+        except OSError:
+            raise ImageError("Upstream image could not be decoded")
+        self.renders += 1
+        await self._add(path, size)
+
+    def _variant(self, ref: Tuple[str, str], width: int, webp: bool) -> Optional[Tuple[str, str]]:
+        """``(path, ext)`` of the rendered file to serve, or None to serve the original."""
+        digest, media_type = ref
+        webp = webp and bool(self.webp) and media_type != "image/gif"
+        if not self.resize or (not width and (not webp or media_type == "image/webp")):
+            return None
+        ext = "webp" if webp else ("png" if media_type == "image/png" else "jpg")
+        return self._object_path(digest, f"-{width}.{ext}"), ext
+
+    async def get(self, src: str, width: int, webp: bool) -> CachedImage:
+        """The file for ``src`` at ``width`` (0: full size), as WebP if ``webp`` and supported."""
+        width = self.variant_width(width)
+        if webp and self.webp is None and self.resize:
+            self.webp = await asyncio.to_thread(_webp_supported)
+
+        # A cache hit checks the ref, the original and the variant in one stat batch
+        ref_path = self._ref_path(src)
+        ref = await self._cached_ref(ref_path)
+        stats = None
+        if ref is not None:
+            variant = self._variant(ref, width, webp)
+            stats = await self._lookup(ref_path, self._object_path(ref[0]), *(variant[:1] if variant else ()))
+            if stats[0] is None or stats[1] is None:
+                ref = stats = None
+        if ref is None:
+            ref = await self._single_flight(src, lambda: self._fetch_original(src))
+        digest, media_type = ref
+        original = self._object_path(digest)
+        variant = self._variant(ref, width, webp)
+
+        if variant is None:
+            stat = stats[1] if stats is not None else (await self._lookup(original))[0]
+            if stat is None:
+                raise ImageError("Cached image was evicted, retry", status_code=503)
+            self.hits += 1
+            return CachedImage(original, media_type, f'"{digest[:32]}"', stat)
+
+        path, ext = variant
+        stat = stats[2] if stats is not None else (await self._lookup(path))[0]
+        if stat is None:
+            await self._single_flight(path, lambda: self._render_variant(original, path, width, ext))
+            stat = await asyncio.to_thread(os.stat, path)
+        else:
+            self.hits += 1
+        return CachedImage(path, MEDIA_TYPES[ext], f'"{digest[:32]}-{width}.{ext}"', stat)
+
+    async def aclose(self) -> None:
+        if self.http is not None:
+            await self.http.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "files": len(self._files),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "fetches": self.fetches,
+            "renders": self.renders,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "resize": int(self.resize),
+        }
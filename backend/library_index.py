@@ -0,0 +1,307 @@
+"""
+In-process inverted index over a user's saved tracks.
+
+Filtering "my liked songs" is answered from memory instead of going back to
+Spotify's catalog search. Each user gets a ``LibraryIndex``:
+
+- Tracks are numbered in the order they were added, so a higher document
+  number means a more recently saved track.
+- Every token of the track name, artist names and album name has posting
+  lists: ``array('I')`` runs of document numbers, one per combination of
+  fields the token occurs in. A track costs four bytes per token instead
+  of a Python object per posting, and scoring a posting list is a single
+  C-level ``dict.fromkeys`` call.
+- A sorted vocabulary turns a query prefix into one contiguous run of keys
+  (two bisects). Every query token is treated as a prefix, so results can
+  update on each keystroke.
+
+Removals set a tombstone. The index compacts itself once a quarter of its
+documents are dead.
+"""
+
+import asyncio
+import bisect
+import heapq
+import itertools
+import re
+import unicodedata
+from array import array
+from collections import OrderedDict
+from operator import itemgetter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+FIELD_NAME = 1
+FIELD_ARTIST = 2
+FIELD_ALBUM = 4
+# Score contribution of a match in each field; combined fields add up
+FIELD_WEIGHTS = {FIELD_NAME: 3.0, FIELD_ARTIST: 2.0, FIELD_ALBUM: 1.0}
+EXACT_BONUS = 0.5
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-folded alphanumeric tokens."""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()
+    return _TOKEN.findall(folded)
+
+
+def _field_score(fields: int) -> float:
+    return sum(weight for bit, weight in FIELD_WEIGHTS.items() if fields & bit)
+
+
+# Precomputed for every combination of field bits
+_FIELD_SCORES = [_field_score(fields) for fields in range(8)]
+
+
+class LibraryIndex:
+    """Prefix and ranked search over one user's saved tracks."""
+
+    def __init__(self):
+        self.tracks: List[Dict[str, Any]] = []
+        self.added_at: List[str] = []
+        self._doc_by_id: Dict[str, int] = {}
+        self._alive = bytearray()
+        # term + chr(field bits) -> document numbers, ascending
+        self._postings: Dict[str, array] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_by_id)
+
+    def add(self, track: Dict[str, Any], added_at: str = "") -> None:
+        """Index a track, replacing any earlier copy of the same track id."""
+        track_id = track.get("id")
+        doc = self._doc_by_id.get(track_id) if track_id else None
+        if doc is not None:
+            if self.tracks[doc] == track and self.added_at[doc] == added_at:
+                # Re-sent unchanged (e.g. by a sync): tombstoning it would only cost the fast path
+                return
+            self.remove(track_id)
+        doc = len(self.tracks)
+        self.tracks.append(track)
+        self.added_at.append(added_at)
+        self._alive.append(1)
+        if track_id:
+            self._doc_by_id[track_id] = doc
+
+        terms: Dict[str, int] = {}
+        for token in tokenize(track.get("name")):
+            terms[token] = terms.get(token, 0) | FIELD_NAME
+        for artist in track.get("artists") or []:
+            for token in tokenize(artist.get("name")):
+                terms[token] = terms.get(token, 0) | FIELD_ARTIST
+        for token in tokenize((track.get("album") or {}).get("name")):
+            terms[token] = terms.get(token, 0) | FIELD_ALBUM
+
+        for term, fields in terms.items():
+            key = term + chr(fields)
+            postings = self._postings.get(key)
+            if postings is None:
+                postings = self._postings[key] = array("I")
+                self._vocabulary_dirty = True
+            postings.append(doc)
+
+    def add_many(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Index mirror documents (``{"track": ..., "added_at": ...}``), oldest first."""
+        for item in items:
+            if item.get("track"):
+                self.add(item["track"], item.get("added_at") or "")
+
+    def remove(self, track_id: str) -> bool:
+        doc = self._doc_by_id.pop(track_id, None)
+        if doc is None:
+            return False
+        self._alive[doc] = 0
+        self.dead += 1
+        if self.dead * 4 > len(self.tracks):
+            self._compact()
+        return True
+
+    def _compact(self) -> None:
+        live = [(track, added_at) for doc, (track, added_at) in enumerate(zip(self.tracks, self.added_at)) if self._alive[doc]]
+        self.__init__()
+        for track, added_at in live:
+            self.add(track, added_at)
+
+    def _keys_with_prefix(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\x7f", start)
+        return self._vocabulary[start:end]
+
+    def _runs(self, token: str) -> List[Tuple[float, array]]:
+        """(score, postings) for every posting list matching ``token`` as a prefix."""
+        runs = []
+        for key in self._keys_with_prefix(token):
+            score = _FIELD_SCORES[ord(key[-1])] + (EXACT_BONUS if key[:-1] == token else 0.0)
+            runs.append((score, self._postings[key]))
+        return runs
+
+    def _top_for_token(self, token: str, count: int) -> Tuple[List[Tuple[float, int]], int]:
+        """Single-token fast path: walk runs best score first, newest track first.
+
+        Only ``count`` results are materialised however broad the prefix is.
+        """
+        runs = self._runs(token)
+        if not runs:
+            return [], 0
+        total = len(set().union(*(postings for _, postings in runs))) if len(runs) > 1 else len(runs[0][1])
+        runs.sort(key=itemgetter(0), reverse=True)
+        top: List[Tuple[float, int]] = []
+        seen = set()
+        for score, group in itertools.groupby(runs, key=itemgetter(0)):
+            for doc in heapq.merge(*(reversed(postings) for _, postings in group), reverse=True):
+                if doc not in seen:
+                    seen.add(doc)
+                    top.append((score, doc))
+                    if len(top) >= count:
+                        return top, total
+        return top, total
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Tracks matching every query token (as a prefix), best score first.
+
+        Ties go to the most recently saved track.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return {"items": [], "total": 0}
+
+        if len(tokens) == 1 and not self.dead:
+            top, total = self._top_for_token(tokens[0], offset + limit)
+            return self._page(top[offset:], total)
+
+        buckets = self._match_all(tokens)
+        top: List[Tuple[float, int]] = []
+        for score in sorted(buckets, reverse=True):
+            # Newest first within a score; only as many buckets as the page needs are sorted
+            top.extend((score, doc) for doc in sorted(buckets[score], reverse=True)[:offset + limit - len(top)])
+            if len(top) >= offset + limit:
+                break
+        return self._page(top[offset:], sum(len(docs) for docs in buckets.values()))
+
+    def _match_all(self, tokens: List[str]) -> Dict[float, set]:
+        """Tracks matching every token, bucketed by summed per-token best score.
+
+        Scores only take a few distinct values, so all the work is set
+        intersections over whole buckets rather than per-track Python code.
+        """
+        token_runs = []
+        for token in tokens:
+            runs = self._runs(token)
+            runs.sort(key=itemgetter(0), reverse=True)
+            token_runs.append((set().union(*(postings for _, postings in runs)), runs))
+        # Smallest candidate set first keeps the intersections cheap
+        token_runs.sort(key=lambda entry: len(entry[0]))
+        candidates = token_runs[0][0]
+        for docs, _ in token_runs[1:]:
+            candidates = candidates & docs
+            if not candidates:
+                return {}
+        if self.dead:
+            alive = self._alive
+            candidates = {doc for doc in candidates if alive[doc]}
+
+        buckets: Dict[float, set] = {0.0: candidates}
+        for _, runs in token_runs:
+            remaining = set(candidates)
+            groups: Dict[float, set] = {}
+            # Best run first: a track's first hit is its best score for this token
+            for score, postings in runs:
+                hits = remaining.intersection(postings)
+                if hits:
+                    remaining -= hits
+                    groups.setdefault(score, set()).update(hits)
+                    if not remaining:
+                        break
+            combined: Dict[float, set] = {}
+            for total, docs in buckets.items():
+                for score, hits in groups.items():
+                    both = docs & hits
+                    if both:
+                        combined.setdefault(total + score, set()).update(both)
+            buckets = combined
+        return buckets
+
+    def _page(self, ranked: List[Tuple[float, int]], total: int) -> Dict[str, Any]:
+        return {
+            "items": [
+                {"track": self.tracks[doc], "added_at": self.added_at[doc], "score": score}
+                for score, doc in ranked
+            ],
+            "total": total,
+        }
+
+
+class LibraryIndexes:
+    """Per-user indexes, built on first use and kept for the most active users."""
+
+    def __init__(self, load_tracks: Callable[[str], Awaitable[List[Dict[str, Any]]]], max_users: int = 1000):
+        self.load_tracks = load_tracks
+        self.max_users = max_users
+        self._indexes: "OrderedDict[str, LibraryIndex]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.builds = 0
+        self.incremental_updates = 0
+        self.invalidations = 0
+
+    async def get(self, user_id: str) -> LibraryIndex:
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            return index
+
+        inflight = self._inflight.get(user_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            index = LibraryIndex()
+            index.add_many(await self.load_tracks(user_id))
+            self.builds += 1
+            self._indexes[user_id] = index
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(index)
+            return index
+        finally:
+            del self._inflight[user_id]
+
+    def on_saved_tracks(self, user_id: str, docs: List[Dict[str, Any]], rebuilt: bool) -> None:
+        """Library sync hook: apply new saves, or drop the index after a full resync."""
+        index = self._indexes.get(user_id)
+        if index is None:
+            return
+        if rebuilt:
+            del self._indexes[user_id]
+            self.invalidations += 1
+            return
+        # Sync pages arrive newest first; the index expects oldest first
+        index.add_many(reversed(docs))
+        self.incremental_updates += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "users": len(self._indexes),
+            "tracks": sum(len(index) for index in self._indexes.values()),
+            "builds": self.builds,
+            "incremental_updates": self.incremental_updates,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,366 @@
+"""
+Incremental MongoDB mirror of each user's saved tracks and playlists.
+
+Library pages are served from the mirror with one indexed query instead of
+paging through Spotify on every visit. A background sync keeps the mirror
+current:
+
+- Saved tracks come back newest first, so a sync only pages until it reaches
+  the ``added_at`` watermark of the previous run. ``added_at`` has one-second
+  resolution, so the IDs mirrored at the watermark are kept too: items tied
+  with it are new only if their ID is not among them. When the upstream
+  total and the mirrored count disagree afterwards, something was removed
+  and the user gets a full resync.
+- The playlist list is cheap to page. A playlist's tracks are only fetched
+  again when its ``snapshot_id`` changed. Playlist contents are stored once
+  per playlist, so followers of the same playlist share them.
+
+All writes are unordered bulk upserts keyed by stable ``_id`` values, so an
+interrupted sync can simply be run again.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from projections import slim_playlist, slim_track
+from spotify_client import SpotifyClient
+
+logger = logging.getLogger(__name__)
+
+SAVED_TRACKS_PAGE = 50
+PLAYLISTS_PAGE = 50
+PLAYLIST_ITEMS_PAGE = 100
+# Only the fields slim_track() keeps
+PLAYLIST_ITEM_FIELDS = (
+    "total,next,items(added_at,track(id,name,uri,duration_ms,preview_url,"
+    "artists(id,name),album(id,name,images)))"
+)
+
+
+class LibraryMirror:
+    """MongoDB collections holding the mirrored library, plus their queries."""
+
+    def __init__(self, mongo_url: str, database: str = "spotify_clone"):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
+        db = self.client[database]
+        self.saved_tracks = db["library_saved_tracks"]
+        self.playlists = db["library_playlists"]
+        self.playlist_tracks = db["library_playlist_tracks"]
+        self.playlist_contents = db["library_playlist_contents"]
+        self.state = db["library_state"]
+        self._indexes_ready = False
+
+    async def ensure_indexes(self) -> None:
+        if self._indexes_ready:
+            return
+        await self.saved_tracks.create_index([("user_id", 1), ("added_at", -1)])
+        await self.saved_tracks.create_index([("user_id", 1), ("generation", 1)])
+        await self.playlists.create_index([("user_id", 1), ("position", 1)])
+        await self.playlists.create_index([("user_id", 1), ("generation", 1)])
+        await self.playlist_tracks.create_index([("playlist_id", 1), ("position", 1)])
+        self._indexes_ready = True
+
+    async def bulk_upsert(self, collection, docs: List[Dict[str, Any]]) -> int:
+        """Upsert documents by ``_id``; returns how many were newly inserted."""
+        if not docs:
+            return 0
+        from pymongo import ReplaceOne
+
+        result = await collection.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs],
+            ordered=False,
+        )
+        return result.upserted_count
+
+    async def get_state(self, user_id: str) -> Dict[str, Any]:
+        return await self.state.find_one({"_id": user_id}) or {"_id": user_id}
+
+    async def set_state(self, user_id: str, **fields: Any) -> None:
+        await self.state.update_one({"_id": user_id}, {"$set": fields}, upsert=True)
+
+    async def list_saved_tracks(self, user_id: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        cursor = (
+            self.saved_tracks.find({"user_id": user_id}, {"_id": 0, "added_at": 1, "track": 1})
+            .sort("added_at", -1)
+            .skip(offset)
+            .limit(limit)
+        )
+        return await cursor.to_list(length=limit)
+
+    async def all_saved_tracks(self, user_id: str) -> List[Dict[str, Any]]:
+        """Every saved track, oldest first."""
+        cursor = self.saved_tracks.find({"user_id": user_id}, {"_id": 0, "added_at": 1, "track": 1}).sort("added_at", 1)
+        return await cursor.to_list(length=None)
+
+    async def list_playlists(self, user_id: str) -> List[Dict[str, Any]]:
+        cursor = self.playlists.find(
+            {"user_id": user_id}, {"_id": 0, "user_id": 0, "generation": 0}
+        ).sort("position", 1)
+        return await cursor.to_list(length=None)
+
+    async def get_playlist(self, user_id: str, playlist_id: str) -> Optional[Dict[str, Any]]:
+        return await self.playlists.find_one(
+            {"_id": f"{user_id}:{playlist_id}"}, {"_id": 0, "user_id": 0, "generation": 0}
+        )
+
+    async def list_playlist_tracks(self, playlist_id: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        cursor = (
+            self.playlist_tracks.find(
+                {"playlist_id": playlist_id, "position": {"$gte": offset}},
+                {"_id": 0, "position": 1, "added_at": 1, "track": 1},
+            )
+            .sort("position", 1)
+            .limit(limit)
+        )
+        return await cursor.to_list(length=limit)
+
+
+class LibrarySync:
+    """Runs mirror syncs, at most one per user at a time."""
+
+    def __init__(
+        self,
+        mirror: LibraryMirror,
+        client_factory: Callable[[str, str], SpotifyClient],
+        sync_interval: float = 300.0,
+        max_concurrent_syncs: int = 4,
+        playlist_concurrency: int = 4,
+        on_saved_tracks: Optional[Callable[[str, List[Dict[str, Any]], bool], None]] = None,
+    ):
+        self.mirror = mirror
+        self.client_factory = client_factory
+        # Called with (user_id, new saved-track docs newest first, rebuilt) after each sync
+        self.on_saved_tracks = on_saved_tracks
+        self.sync_interval = sync_interval
+        self.playlist_concurrency = playlist_concurrency
+        self._sync_slots = asyncio.Semaphore(max_concurrent_syncs)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: set = set()
+        self.syncs = 0
+        self.full_resyncs = 0
+        self.failed_syncs = 0
+        self.saved_tracks_added = 0
+        self.playlists_fetched = 0
+        self.playlists_skipped = 0
+        self.upstream_pages = 0
+
+    async def ensure_synced(self, user_id: str, access_token: str) -> Dict[str, Any]:
+        """Return the user's sync state, starting a background sync if it is missing or stale.
+
+        Nothing waits on Spotify here: a user who was never synced gets an
+        empty mirror (no ``synced_at``) until the first sync has filled it.
+        """
+        state = await self.mirror.get_state(user_id)
+        if "synced_at" not in state or time.time() - state["synced_at"] > self.sync_interval:
+            self.schedule(user_id, access_token)
+        return state
+
+    def schedule(self, user_id: str, access_token: str) -> None:
+        if user_id in self._inflight:
+            return
+        task = asyncio.create_task(self._background_sync(user_id, access_token))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _background_sync(self, user_id: str, access_token: str) -> None:
+        try:
+            await self.sync(user_id, access_token)
+        except Exception as e:
+            logger.warning(f"Background library sync failed: {str(e)}")
+
+    async def sync(self, user_id: str, access_token: str, full: bool = False) -> Dict[str, Any]:
+        """Sync one user's library, sharing the run with concurrent callers."""
+        inflight = self._inflight.get(user_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            async with self._sync_slots:
+                state = await self._run(user_id, self.client_factory(access_token, user_id), full)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.failed_syncs += 1
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(state)
+            return state
+        finally:
+            del self._inflight[user_id]
+
+    async def _run(self, user_id: str, sp: SpotifyClient, full: bool) -> Dict[str, Any]:
+        await self.mirror.ensure_indexes()
+        state = await self.mirror.get_state(user_id)
+        generation = state.get("generation", 0) + 1
+        saved = await self._sync_saved_tracks(sp, user_id, state, generation, full)
+        playlists = await self._sync_playlists(sp, user_id, generation)
+        self.syncs += 1
+        fields = {"generation": generation, "synced_at": time.time(), **saved, **playlists}
+        await self.mirror.set_state(user_id, **fields)
+        return {**state, **fields}
+
+    async def _pages(self, fetch: Callable[[int], Awaitable[Dict[str, Any]]], page_size: int):
+        offset = 0
+        while True:
+            page = await fetch(offset)
+            self.upstream_pages += 1
+            yield page
+            offset += page_size
+            if not page.get("next") or offset >= page.get("total", 0):
+                return
+
+    async def _sync_saved_tracks(
+        self, sp: SpotifyClient, user_id: str, state: Dict[str, Any], generation: int, full: bool
+    ) -> Dict[str, Any]:
+        watermark = None if full else state.get("saved_tracks_watermark")
+        count = 0 if watermark is None else state.get("saved_tracks_count", 0)
+        # Track IDs mirrored at the watermark, and at the newest added_at seen in this run
+        mirrored = set(state.get("saved_tracks_watermark_ids") or ()) if watermark is not None else set()
+        newest, newest_ids = watermark, set(mirrored)
+        total = 0
+        added: List[Dict[str, Any]] = []
+
+        async for page in self._pages(
+            lambda offset: sp.saved_tracks(limit=SAVED_TRACKS_PAGE, offset=offset, background=True),
+            SAVED_TRACKS_PAGE,
+        ):
+            total = page.get("total", 0)
+            docs = []
+            reached_watermark = False
+            for item in page.get("items") or []:
+                track, added_at = item.get("track"), item.get("added_at") or ""
+                if not track or not track.get("id"):
+                    continue
+                if watermark is not None and added_at < watermark:
+                    reached_watermark = True
+                    break
+                if added_at == watermark and track["id"] in mirrored:
+                    continue
+                if newest is None or added_at > newest:
+                    newest, newest_ids = added_at, set()
+                if added_at == newest:
+                    newest_ids.add(track["id"])
+                docs.append({
+                    "_id": f"{user_id}:{track['id']}",
+                    "user_id": user_id,
+                    "added_at": added_at,
+                    "track": slim_track(track),
+                    "generation": generation,
+                })
+            inserted = await self.mirror.bulk_upsert(self.mirror.saved_tracks, docs)
+            if watermark is not None:
+                added.extend(docs)
+            count += inserted if watermark is not None else len(docs)
+            self.saved_tracks_added += inserted
+            if reached_watermark:
+                break
+
+        if watermark is None:
+            # Full pass: anything not seen in this generation was removed upstream
+            await self.mirror.saved_tracks.delete_many({"user_id": user_id, "generation": {"$ne": generation}})
+        elif count != total:
+            # Removals leave no trace in an added_at scan; rebuild from scratch
+            self.full_resyncs += 1
+            return await self._sync_saved_tracks(sp, user_id, state, generation, full=True)
+
+        if self.on_saved_tracks is not None:
+            self.on_saved_tracks(user_id, added, watermark is None)
+        return {
+            "saved_tracks_watermark": newest,
+            "saved_tracks_watermark_ids": sorted(newest_ids),
+            "saved_tracks_count": count,
+        }
+
+    async def _sync_playlists(self, sp: SpotifyClient, user_id: str, generation: int) -> Dict[str, Any]:
+        docs = []
+        async for page in self._pages(
+            lambda offset: sp.current_user_playlists(limit=PLAYLISTS_PAGE, offset=offset, background=True),
+            PLAYLISTS_PAGE,
+        ):
+            for playlist in page.get("items") or []:
+                if not playlist or not playlist.get("id"):
+                    continue
+                docs.append({
+                    "_id": f"{user_id}:{playlist['id']}",
+                    "user_id": user_id,
+                    "position": len(docs),
+                    "snapshot_id": playlist.get("snapshot_id"),
+                    "generation": generation,
+                    **slim_playlist(playlist),
+                })
+        await self.mirror.bulk_upsert(self.mirror.playlists, docs)
+        await self.mirror.playlists.delete_many({"user_id": user_id, "generation": {"$ne": generation}})
+
+        known = {
+            doc["_id"]: doc.get("snapshot_id")
+            async for doc in self.mirror.playlist_contents.find(
+                {"_id": {"$in": [doc["id"] for doc in docs]}}, {"snapshot_id": 1}
+            )
+        }
+        changed = [doc for doc in docs if known.get(doc["id"]) != doc["snapshot_id"] or not doc["snapshot_id"]]
+        self.playlists_skipped += len(docs) - len(changed)
+
+        slots = asyncio.Semaphore(self.playlist_concurrency)
+
+        async def refetch(doc: Dict[str, Any]) -> None:
+            async with slots:
+                await self._sync_playlist_tracks(sp, doc["id"], doc["snapshot_id"])
+
+        await asyncio.gather(*(refetch(doc) for doc in changed))
+        return {"playlists_count": len(docs)}
+
+    async def _sync_playlist_tracks(self, sp: SpotifyClient, playlist_id: str, snapshot_id: Optional[str]) -> None:
+        position = 0
+        async for page in self._pages(
+            lambda offset: sp.playlist_items(
+                playlist_id, limit=PLAYLIST_ITEMS_PAGE, offset=offset, fields=PLAYLIST_ITEM_FIELDS, background=True
+            ),
+            PLAYLIST_ITEMS_PAGE,
+        ):
+            docs = []
+            for item in page.get("items") or []:
+                track = (item or {}).get("track")
+                docs.append({
+                    "_id": f"{playlist_id}:{position}",
+                    "playlist_id": playlist_id,
+                    "position": position,
+                    "added_at": (item or {}).get("added_at"),
+                    # Unavailable and local tracks keep their slot so positions match Spotify
+                    "track": slim_track(track) if track else None,
+                })
+                position += 1
+            await self.mirror.bulk_upsert(self.mirror.playlist_tracks, docs)
+
+        await self.mirror.playlist_tracks.delete_many({"playlist_id": playlist_id, "position": {"$gte": position}})
+        await self.mirror.playlist_contents.replace_one(
+            {"_id": playlist_id},
+            {"_id": playlist_id, "snapshot_id": snapshot_id, "total": position, "synced_at": time.time()},
+            upsert=True,
+        )
+        self.playlists_fetched += 1
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "syncs": self.syncs,
+            "in_progress": len(self._inflight),
+            "full_resyncs": self.full_resyncs,
+            "failed_syncs": self.failed_syncs,
+            "saved_tracks_added": self.saved_tracks_added,
+            "playlists_fetched": self.playlists_fetched,
+            "playlists_skipped": self.playlists_skipped,
+            "upstream_pages": self.upstream_pages,
+        }
@@ -0,0 +1,286 @@
+"""
+Low-overhead request and upstream metrics in Prometheus text format.
+
+``MetricsMiddleware`` is a plain ASGI middleware (no per-request task or
+body buffering) that records per-route latency histograms, status counts
+and in-flight gauges, and can add a ``Server-Timing`` header splitting
+time spent in this process from time spent waiting on Spotify.
+
+Upstream phases come from httpcore trace events: ``connect`` (DNS lookup
+and TCP connect, which httpcore does not separate), ``tls``, ``wait`` (request
+sent until response headers) and ``body``.
+"""
+
+import bisect
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from starlette.routing import Match
+
+# (method, path) -> route template for the in-flight gauge; cleared when full
+MAX_MATCHED_PATHS = 4096
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds spent waiting on Spotify during the current inbound request
+upstream_time: ContextVar[Optional[List[float]]] = ContextVar("upstream_time", default=None)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Tuple[str, ...] = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], seconds: float) -> None:
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, seconds)] += 1
+        row[-1] += seconds
+
+    def samples(self) -> Iterable[str]:
+        for labels, row in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            cumulative += row[len(self.buckets)]
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {row[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, extra_gauges: Optional[Dict[str, Dict[str, Any]]] = None, prefix: str = "spotify_clone") -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        # Component snapshots (caches, sessions, governor...) exported as gauges
+        for section, values in (extra_gauges or {}).items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{prefix}_{section}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Inbound request latency by route", ("method", "route"),
+))
+request_status = registry.register(Counter(
+    "http_requests_total", "Inbound requests by route and status", ("method", "route", "status"),
+))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Inbound requests currently being served", ("route",),
+))
+upstream_latency = registry.register(Histogram(
+    "spotify_request_duration_seconds", "Upstream Spotify call latency by endpoint", ("endpoint",),
+))
+upstream_phase = registry.register(Histogram(
+    "spotify_request_phase_seconds", "Upstream Spotify call time by phase", ("endpoint", "phase"),
+))
+upstream_status = registry.register(Counter(
+    "spotify_responses_total", "Upstream Spotify responses by endpoint and status", ("endpoint", "status"),
+))
+
+conditional_responses = registry.register(Counter(
+    "http_conditional_responses_total", "ETag-tagged responses by route and outcome (not_modified or full)",
+    ("route", "result"),
+))
+
+_SPOTIFY_ID = re.compile(r"^[0-9A-Za-z]{22}$")
+_PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "receive_response_headers": "wait",
+    "receive_response_body": "body",
+}
+
+
+def upstream_endpoint(url: httpx.URL) -> str:
+    """Low-cardinality label for a Spotify URL, e.g. ``/v1/playlists/{id}/tracks``."""
+    return "/".join("{id}" if _SPOTIFY_ID.match(part) else part for part in url.path.split("/"))
+
+
+class UpstreamTrace:
+    """httpcore trace callback timing the phases of one upstream request."""
+
+    __slots__ = ("endpoint", "started", "marks", "accumulator")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self.accumulator = upstream_time.get()
+
+    def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        name, _, stage = event_name.rpartition(".")
+        step = name.partition(".")[2]
+        if step not in _PHASES:
+            return
+        now = time.perf_counter()
+        if stage == "started":
+            self.marks[step] = now
+        elif stage == "complete" and step in self.marks:
+            upstream_phase.observe((self.endpoint, _PHASES[step]), now - self.marks.pop(step))
+            if step == "receive_response_body":
+                elapsed = now - self.started
+                upstream_latency.observe((self.endpoint,), elapsed)
+                if self.accumulator is not None:
+                    self.accumulator.append(elapsed)
+
+
+def conditional_snapshot() -> Dict[str, float]:
+    """304 counts and hit rate over all ETag-tagged routes."""
+    totals = {"not_modified": 0.0, "full": 0.0}
+    for (_, result), value in conditional_responses.values.items():
+        totals[result] += value
+    served = totals["not_modified"] + totals["full"]
+    return {**totals, "hit_rate": round(totals["not_modified"] / served, 4) if served else 0.0}
+
+
+def process_snapshot() -> Dict[str, float]:
+    """Resident and peak memory of this worker, where the platform reports them."""
+    snapshot: Dict[str, float] = {}
+    try:
+        import resource
+    except ImportError:
+        return snapshot
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in KiB on Linux
+    snapshot["peak_rss_kb"] = usage.ru_maxrss
+    snapshot["cpu_seconds"] = round(usage.ru_utime + usage.ru_stime, 3)
+    try:
+        with open("/proc/self/statm") as statm:
+            snapshot["rss_kb"] = int(statm.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        pass
+    return snapshot
+
+
+async def observe_upstream_response(response: httpx.Response) -> None:
+    upstream_status.inc((upstream_endpoint(response.request.url), str(response.status_code)))
+
+
+class MetricsMiddleware:
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+        self._routes: Dict[Any, str] = {}
+        self._matched: Dict[Tuple[str, str], str] = {}
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        label = self._routes.get(endpoint)
+        if label is None:
+            router = scope.get("router")
+            for route in getattr(router, "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    label = route.path
+                    break
+            label = self._routes[endpoint] = label or "unmatched"
+        return label
+
+    def _match_route(self, scope) -> str:
+        """Route template for a request that has not been routed yet, matched as the router will."""
+        key = (scope["method"], scope["path"])
+        label = self._matched.get(key)
+        if label is None:
+            label = "unmatched"
+            router = getattr(scope.get("app"), "router", None)
+            for route in getattr(router, "routes", ()):
+                if route.matches(scope)[0] == Match.FULL:
+                    label = getattr(route, "path", label)
+                    break
+            if len(self._matched) >= MAX_MATCHED_PATHS:
+                self._matched.clear()
+            self._matched[key] = label
+        return label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        upstream: List[float] = []
+        token = upstream_time.set(upstream)
+        status = "500"
+        # Routing has not run yet, so the in-flight gauge matches the route itself
+        flight_key = self._match_route(scope)
+        requests_in_flight.inc((flight_key,))
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if self.server_timing:
+                    app_ms = (time.perf_counter() - started) * 1000
+                    spotify_ms = sum(upstream) * 1000
+                    value = f"app;dur={app_ms:.1f}, spotify;dur={spotify_ms:.1f}"
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            upstream_time.reset(token)
+            requests_in_flight.dec((flight_key,))
+            route = self._route_label(scope)
+            method = scope["method"]
+            request_latency.observe((method, route), time.perf_counter() - started)
+            request_status.inc((method, route, status))
@@ -0,0 +1,268 @@
+"""
+Push-based playback state for any number of open clients.
+
+One poller per user calls Spotify's ``/me/player`` on an adaptive interval
+(fast while playing, slower when paused, slowest when nothing is active)
+and fans the resulting changes out to every subscribed connection. Upstream
+load is therefore per user, not per open tab.
+
+Each poll asks the subscriber's token source for the access token, so a
+stream outlives the token it connected with. If Spotify keeps rejecting the
+token, the poller sends a final ``end`` event and stops.
+
+Browsers' ``EventSource`` cannot send headers, so they connect with a
+``StreamTickets`` ticket instead of a credential in the URL.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from spotify_client import SpotifyAPIError
+
+logger = logging.getLogger(__name__)
+
+# A position change further than this from the expected progress is a seek
+SEEK_TOLERANCE_MS = 3000
+
+# Consecutive 401s after which a stream is ended instead of retried
+MAX_AUTH_FAILURES = 3
+
+TokenSource = Callable[[], Awaitable[str]]
+
+
+def retry_delay(headers: Dict[str, str], default: float) -> float:
+    """Seconds from a Retry-After header, or ``default`` if it is missing or malformed."""
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def playback_summary(state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Reduce a /me/player payload to the fields clients react to."""
+    if not state:
+        return {"active": False}
+    item = state.get("item") or {}
+    device = state.get("device") or {}
+    return {
+        "active": True,
+        "is_playing": bool(state.get("is_playing")),
+        "progress_ms": state.get("progress_ms") or 0,
+        "track": {
+            "id": item.get("id"),
+            "name": item.get("name"),
+            "uri": item.get("uri"),
+            "duration_ms": item.get("duration_ms"),
+            "artists": [{"name": a.get("name")} for a in item.get("artists") or []],
+            "album": {
+                "name": (item.get("album") or {}).get("name"),
+                "images": (item.get("album") or {}).get("images") or [],
+            },
+        } if item else None,
+        "device": {
+            "id": device.get("id"),
+            "name": device.get("name"),
+            "type": device.get("type"),
+            "volume_percent": device.get("volume_percent"),
+        } if device else None,
+    }
+
+
+def diff_playback(previous: Dict[str, Any], current: Dict[str, Any], elapsed_ms: float) -> List[Dict[str, Any]]:
+    """Events describing how ``current`` differs from ``previous``."""
+    if previous.get("active") != current.get("active"):
+        return [{"event": "state", "data": current}]
+    if not current.get("active"):
+        return []
+
+    events = []
+    previous_track = (previous.get("track") or {}).get("id")
+    current_track = (current.get("track") or {}).get("id")
+    if previous_track != current_track:
+        events.append({"event": "track", "data": current})
+    if previous.get("is_playing") != current.get("is_playing"):
+        events.append({"event": "playback", "data": {"is_playing": current["is_playing"], "progress_ms": current["progress_ms"]}})
+    if previous.get("device") != current.get("device"):
+        events.append({"event": "device", "data": {"device": current["device"]}})
+    if previous_track == current_track:
+        expected = previous["progress_ms"] + (elapsed_ms if previous.get("is_playing") else 0)
+        if abs(current["progress_ms"] - expected) > SEEK_TOLERANCE_MS:
+            events.append({"event": "seek", "data": {"progress_ms": current["progress_ms"]}})
+    return events
+
+
+class UserPoller:
+    """Polls one user's playback state while at least one client listens."""
+
+    def __init__(self, hub: "PlaybackHub", user_id: str, token: TokenSource):
+        self.hub = hub
+        self.user_id = user_id
+        self.token = token
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.summary: Optional[Dict[str, Any]] = None
+        self.polled_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    def interval(self) -> float:
+        if not self.summary or not self.summary.get("active"):
+            return self.hub.idle_interval
+        if self.summary.get("is_playing"):
+            return self.hub.playing_interval
+        return self.hub.paused_interval
+
+    def publish(self, events: List[Dict[str, Any]]) -> None:
+        for queue in self.subscribers:
+            for event in events:
+                if queue.full():
+                    # Slow consumer: drop its oldest pending event rather than block others
+                    queue.get_nowait()
+                queue.put_nowait(event)
+
+    async def poll_once(self) -> None:
+        state = await self.hub.fetch_state(await self.token(), self.user_id)
+        now = time.monotonic()
+        summary = playback_summary(state)
+        if self.summary is None:
+            events = [{"event": "state", "data": summary}]
+        else:
+            events = diff_playback(self.summary, summary, (now - self.polled_at) * 1000)
+        self.summary, self.polled_at = summary, now
+        self.hub.polls += 1
+        if events:
+            self.publish(events)
+
+    async def run(self) -> None:
+        failures = 0
+        auth_failures = 0
+        while self.subscribers:
+            try:
+                await self.poll_once()
+                failures = auth_failures = 0
+                delay = self.interval()
+            except SpotifyAPIError as e:
+                failures += 1
+                delay = retry_delay(e.headers, min(60.0, self.hub.idle_interval * failures))
+                logger.warning(f"Playback poll failed for {self.user_id}: {str(e)}")
+                if e.http_status == 401:
+                    auth_failures += 1
+                    if auth_failures >= self.hub.max_auth_failures:
+                        # The token source had its chances to refresh; a new subscribe restarts polling
+                        self.publish([{"event": "end", "data": {"detail": "Invalid or expired token"}}])
+                        return
+                    # Retry soon: the token source may already hold a refreshed token
+                    delay = min(delay, self.hub.playing_interval)
+                else:
+                    auth_failures = 0
+            except Exception as e:
+                failures += 1
+                delay = min(60.0, self.hub.idle_interval * failures)
+                logger.error(f"Playback poll error for {self.user_id}: {str(e)}")
+            await asyncio.sleep(delay)
+
+
+class PlaybackHub:
+    """Registry of per-user pollers shared by all streaming connections."""
+
+    def __init__(
+        self,
+        fetch_state: Callable[[str, str], Awaitable[Optional[Dict[str, Any]]]],
+        playing_interval: float = 1.0,
+        paused_interval: float = 5.0,
+        idle_interval: float = 15.0,
+        queue_size: int = 32,
+        max_auth_failures: int = MAX_AUTH_FAILURES,
+    ):
+        self.fetch_state = fetch_state
+        self.playing_interval = playing_interval
+        self.paused_interval = paused_interval
+        self.idle_interval = idle_interval
+        self.queue_size = queue_size
+        self.max_auth_failures = max_auth_failures
+        self._pollers: Dict[str, UserPoller] = {}
+        self.polls = 0
+
+    def subscribe(self, user_id: str, token: TokenSource) -> asyncio.Queue:
+        """Queue of events for one connection; ``token`` is awaited for the access token on every poll."""
+        poller = self._pollers.get(user_id)
+        if poller is None:
+            poller = self._pollers[user_id] = UserPoller(self, user_id, token)
+        # Newest connection's token source wins so a re-authenticated tab revives the shared poller
+        poller.token = token
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if poller.summary is not None:
+            queue.put_nowait({"event": "state", "data": poller.summary})
+        poller.subscribers.add(queue)
+        if poller.task is None or poller.task.done():
+            poller.task = asyncio.create_task(poller.run())
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        poller = self._pollers.get(user_id)
+        if poller is None:
+            return
+        poller.subscribers.discard(queue)
+        if not poller.subscribers:
+            if poller.task is not None:
+                poller.task.cancel()
+            del self._pollers[user_id]
+
+    async def close(self) -> None:
+        for poller in list(self._pollers.values()):
+            if poller.task is not None:
+                poller.task.cancel()
+        self._pollers.clear()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "users": len(self._pollers),
+            "connections": sum(len(p.subscribers) for p in self._pollers.values()),
+            "polls": self.polls,
+        }
+
+
+class StreamTickets:
+    """Short-lived, single-use tickets that stand in for a session on stream URLs.
+
+    Tickets are signed rather than stored, so any worker holding the same
+    ``secret`` can redeem one. Each worker remembers the tickets it redeemed
+    until they expire; a ticket seen in a log is useless after ``ttl`` seconds.
+    """
+
+    def __init__(self, secret: str, ttl: float = 30.0):
+        self.secret = secret.encode()
+        self.ttl = ttl
+        # nonce -> expiry, in issue order, which is also expiry order
+        self._redeemed: "OrderedDict[str, float]" = OrderedDict()
+
+    def _sign(self, body: str) -> str:
+        return hmac.new(self.secret, body.encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, session_id: str, user_id: str) -> str:
+        claims = {"s": session_id, "u": user_id, "e": time.time() + self.ttl, "n": secrets.token_hex(16)}
+        body = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+        return f"{body}.{self._sign(body)}"
+
+    def redeem(self, ticket: str) -> Optional[Tuple[str, str]]:
+        """``(session_id, user_id)`` for a valid, unused ticket, else None."""
+        body, _, signature = ticket.partition(".")
+        if not hmac.compare_digest(signature, self._sign(body)):
+            return None
+        try:
+            claims = json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+        except ValueError:
+            return None
+        now = time.time()
+        while self._redeemed and next(iter(self._redeemed.values())) < now:
+            self._redeemed.popitem(last=False)
+        if claims["e"] < now or claims["n"] in self._redeemed:
+            return None
+        self._redeemed[claims["n"]] = claims["e"]
+        return claims["s"], claims["u"]
@@ -0,0 +1,174 @@
+"""
+Batched playback commands.
+
+A client sends an ordered list of player operations in one request; the
+backend runs them against Spotify with as little waiting as the ordering
+allows:
+
+- ``play``, ``pause``, ``next``, ``previous`` and ``transfer`` change what is
+  playing, or where. They act as barriers, so everything before one finishes
+  before it is sent, and it finishes before anything after it starts.
+- Between two barriers, ``queue`` additions go out one after another
+  to keep their order. ``seek`` and ``volume`` run alongside them.
+- Only the last ``seek`` and the last ``volume`` of a run between barriers
+  are sent. Earlier ones would be overwritten immediately and are reported
+  as ``superseded``.
+
+A ``transfer`` also becomes the target device of the commands after it.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from spotify_client import SpotifyAPIError, SpotifyClient
+
+BARRIER_OPS = {"play", "pause", "next", "previous", "transfer"}
+SETTING_OPS = {"seek", "volume"}
+COMMAND_OPS = BARRIER_OPS | SETTING_OPS | {"queue"}
+
+
+def play_offset(offset: Any) -> Optional[Dict[str, Any]]:
+    """Spotify's offset object from a position, a track URI or the object itself."""
+    if offset is None or isinstance(offset, dict):
+        return offset
+    if isinstance(offset, bool):
+        raise ValueError("offset must be a position, a track URI or an object")
+    if isinstance(offset, int):
+        return {"position": offset}
+    if isinstance(offset, str):
+        return {"uri": offset}
+    raise ValueError("offset must be a position, a track URI or an object")
+
+
+def play_arguments(command: Dict[str, Any]) -> Dict[str, Any]:
+    """Validated ``start_playback`` keyword arguments for a play request or command."""
+    uris = command.get("uris")
+    if uris is None and command.get("track_uri"):
+        uris = [command["track_uri"]]
+    context_uri = command.get("context_uri")
+    if uris is not None and (not isinstance(uris, list) or not all(isinstance(uri, str) for uri in uris)):
+        raise ValueError("uris must be a list of Spotify URIs")
+    if uris and context_uri:
+        raise ValueError("Pass either context_uri or uris, not both")
+    offset = play_offset(command.get("offset"))
+    if offset is not None and not (uris or context_uri):
+        raise ValueError("offset requires context_uri or uris")
+    position_ms = command.get("position_ms")
+    if position_ms is not None and (not isinstance(position_ms, int) or position_ms < 0):
+        raise ValueError("position_ms must be a non-negative integer")
+    # No uris and no context resumes whatever was playing
+    return {"context_uri": context_uri, "uris": uris or None, "offset": offset, "position_ms": position_ms}
+
+
+def validate_commands(commands: Any, max_commands: int) -> List[Dict[str, Any]]:
+    if not isinstance(commands, list) or not commands:
+        raise ValueError("commands must be a non-empty list")
+    if len(commands) > max_commands:
+        raise ValueError(f"At most {max_commands} commands per request")
+    for index, command in enumerate(commands):
+        op = command.get("op") if isinstance(command, dict) else None
+        if op not in COMMAND_OPS:
+            raise ValueError(f"commands[{index}]: op must be one of: {', '.join(sorted(COMMAND_OPS))}")
+        try:
+            if op == "play":
+                play_arguments(command)
+            elif op == "queue" and not isinstance(command.get("uri"), str):
+                raise ValueError("queue needs a uri")
+            elif op == "seek" and not (isinstance(command.get("position_ms"), int) and command["position_ms"] >= 0):
+                raise ValueError("seek needs a non-negative position_ms")
+            elif op == "volume" and not (
+                isinstance(command.get("volume_percent"), int) and 0 <= command["volume_percent"] <= 100
+            ):
+                raise ValueError("volume needs a volume_percent between 0 and 100")
+            elif op == "transfer" and not isinstance(command.get("device_id"), str):
+                raise ValueError("transfer needs a device_id")
+        except ValueError as e:
+            raise ValueError(f"commands[{index}]: {str(e)}")
+    return commands
+
+
+async def _send(sp: SpotifyClient, command: Dict[str, Any], device_id: Optional[str]) -> None:
+    op = command["op"]
+    device_id = command.get("device_id", device_id) if op != "transfer" else command["device_id"]
+    if op == "play":
+        await sp.start_playback(device_id=device_id, **play_arguments(command))
+    elif op == "pause":
+        await sp.pause_playback(device_id=device_id)
+    elif op == "next":
+        await sp.next_track(device_id=device_id)
+    elif op == "previous":
+        await sp.previous_track(device_id=device_id)
+    elif op == "transfer":
+        await sp.transfer_playback(device_id, force_play=bool(command.get("play", False)))
+    elif op == "queue":
+        await sp.add_to_queue(command["uri"], device_id=device_id)
+    elif op == "seek":
+        await sp.seek_track(command["position_ms"], device_id=device_id)
+    elif op == "volume":
+        await sp.volume(command["volume_percent"], device_id=device_id)
+
+
+async def run_commands(
+    sp: SpotifyClient,
+    commands: List[Dict[str, Any]],
+    device_id: Optional[str] = None,
+    stop_on_error: bool = True,
+) -> List[Dict[str, Any]]:
+    """Run validated commands; returns one result per command, in order."""
+    results: List[Dict[str, Any]] = [{"op": command["op"], "status": "pending"} for command in commands]
+    failed = False
+
+    async def attempt(index: int, target: Optional[str]) -> bool:
+        try:
+            await _send(sp, commands[index], target)
+        except SpotifyAPIError as e:
+            results[index].update(status="error", http_status=e.http_status, error=e.msg)
+            return False
+        results[index]["status"] = "ok"
+        return True
+
+    async def queue_chain(indexes: List[int], target: Optional[str]) -> bool:
+        ok = True
+        for index in indexes:
+            if not ok and stop_on_error:
+                results[index]["status"] = "skipped"
+                continue
+            ok = await attempt(index, target) and ok
+        return ok
+
+    index = 0
+    while index < len(commands):
+        if failed and stop_on_error:
+            results[index]["status"] = "skipped"
+            index += 1
+            continue
+
+        command = commands[index]
+        if command["op"] in BARRIER_OPS:
+            failed = not await attempt(index, device_id) or failed
+            if command["op"] == "transfer" and results[index]["status"] == "ok":
+                device_id = command["device_id"]
+            index += 1
+            continue
+
+        # Run of non-barrier commands: ordered queue chain alongside the last seek/volume
+        end = index
+        while end < len(commands) and commands[end]["op"] not in BARRIER_OPS:
+            end += 1
+        queue, latest = [], {}
+        for position in range(index, end):
+            op = commands[position]["op"]
+            if op == "queue":
+                queue.append(position)
+            else:
+                if op in latest:
+                    results[latest[op]]["status"] = "superseded"
+                latest[op] = position
+        outcomes = await asyncio.gather(
+            queue_chain(queue, device_id),
+            *(attempt(position, device_id) for position in latest.values()),
+        )
+        failed = not all(outcomes) or failed
+        index = end
+
+    return results
@@ -0,0 +1,155 @@
+"""
+Slim projections of Spotify catalog objects.
+
+Raw Spotify payloads carry large subtrees (``available_markets``,
+``external_urls``, ``href`` links, ...) that the frontend cards never read.
+These helpers keep only the fields the cards actually render, and
+``fields`` lets a client ask for its own subset of a raw payload using the
+same filter syntax as Spotify's ``fields`` parameter.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def slim_images(images: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    return [
+        {"url": image.get("url"), "width": image.get("width"), "height": image.get("height")}
+        for image in images or []
+    ]
+
+
+def slim_track(track: Dict[str, Any]) -> Dict[str, Any]:
+    album = track.get("album") or {}
+    return {
+        "id": track.get("id"),
+        "name": track.get("name"),
+        "uri": track.get("uri"),
+        "duration_ms": track.get("duration_ms"),
+        "preview_url": track.get("preview_url"),
+        "artists": [{"id": a.get("id"), "name": a.get("name")} for a in track.get("artists") or []],
+        "album": {
+            "id": album.get("id"),
+            "name": album.get("name"),
+            "images": slim_images(album.get("images")),
+        },
+    }
+
+
+def slim_artist(artist: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": artist.get("id"),
+        "name": artist.get("name"),
+        "uri": artist.get("uri"),
+        "images": slim_images(artist.get("images")),
+        "followers": {"total": (artist.get("followers") or {}).get("total", 0)},
+    }
+
+
+def slim_album(album: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": album.get("id"),
+        "name": album.get("name"),
+        "uri": album.get("uri"),
+        "release_date": album.get("release_date"),
+        "total_tracks": album.get("total_tracks"),
+        "artists": [{"id": a.get("id"), "name": a.get("name")} for a in album.get("artists") or []],
+        "images": slim_images(album.get("images")),
+    }
+
+
+def slim_playlist(playlist: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": playlist.get("id"),
+        "name": playlist.get("name"),
+        "uri": playlist.get("uri"),
+        "description": playlist.get("description", ""),
+        "images": slim_images(playlist.get("images")),
+        "owner": {"display_name": (playlist.get("owner") or {}).get("display_name", "")},
+        "tracks": {"total": (playlist.get("tracks") or {}).get("total", 0)},
+    }
+
+
+SLIM_BY_TYPE = {
+    "track": slim_track,
+    "artist": slim_artist,
+    "album": slim_album,
+    "playlist": slim_playlist,
+}
+
+
+# Subtrees the frontend never reads; stripped from raw payloads before caching
+UNUSED_KEYS = frozenset({"available_markets"})
+
+
+def strip_unused(value: Any, keys: frozenset = UNUSED_KEYS) -> Any:
+    """Copy of a raw Spotify payload without ``keys`` at any depth."""
+    if isinstance(value, dict):
+        return {k: strip_unused(v, keys) for k, v in value.items() if k not in keys}
+    if isinstance(value, list):
+        return [strip_unused(v, keys) for v in value]
+    return value
+
+
+@lru_cache(maxsize=256)
+def parse_fields(fields: str) -> Dict[str, Any]:
+    """Parse a Spotify-style field filter into a nested spec.
+
+    ``tracks.items(name,uri,album(name)),tracks.total`` becomes
+    ``{"tracks": {"items": {"name": None, "uri": None, "album": {"name": None}}, "total": None}}``;
+    ``None`` keeps the whole subtree. Raises ``ValueError`` on malformed input.
+    """
+    text = fields.replace(" ", "")
+    spec, end = _parse_field_list(text, 0)
+    if end != len(text):
+        raise ValueError(f"Unexpected ')' in fields at {end}")
+    return spec
+
+
+def _parse_field_list(text: str, pos: int) -> Tuple[Dict[str, Any], int]:
+    spec: Dict[str, Any] = {}
+    while True:
+        start = pos
+        while pos < len(text) and text[pos] not in ",()":
+            pos += 1
+        path = text[start:pos].split(".")
+        if not all(path):
+            raise ValueError(f"Empty field name in fields at {start}")
+        sub = None
+        if pos < len(text) and text[pos] == "(":
+            sub, pos = _parse_field_list(text, pos + 1)
+            if pos >= len(text) or text[pos] != ")":
+                raise ValueError("Unbalanced '(' in fields")
+            pos += 1
+        node = spec
+        for name in path[:-1]:
+            child = node.get(name, {})
+            if child is None:
+                break
+            node = node.setdefault(name, child)
+        else:
+            node[path[-1]] = _merge(node.get(path[-1], {}), sub) if path[-1] in node else sub
+        if pos < len(text) and text[pos] == ",":
+            pos += 1
+            continue
+        return spec, pos
+
+
+def _merge(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if a is None or b is None:
+        return None
+    merged = dict(a)
+    for name, sub in b.items():
+        merged[name] = _merge(merged[name], sub) if name in merged else sub
+    return merged
+
+
+def project(value: Any, spec: Optional[Dict[str, Any]]) -> Any:
+    """Keep only the fields named by a ``parse_fields`` spec; lists are projected per item."""
+    if spec is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    if isinstance(value, dict):
+        return {name: project(value[name], sub) for name, sub in spec.items() if name in value}
+    return value
@@ -0,0 +1,75 @@
+"""
+orjson-backed JSON responses.
+
+``FastJSONResponse`` is the app's default response class, so every route
+encodes with orjson instead of the stdlib ``json`` module. FastAPI still
+walks a returned dict through ``jsonable_encoder`` first; routes that pass
+large raw Spotify payloads return ``json_response(...)`` instead, which
+skips that walk entirely.
+
+``conditional_response`` adds a weak ``ETag`` (a hash of the encoded body)
+and answers a matching ``If-None-Match`` with an empty 304. The tag is weak
+because the compression middleware may re-encode the body on the way out.
+"""
+
+import hashlib
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+from metrics import conditional_responses
+from projections import parse_fields, project
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def field_spec(fields: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Parsed ``fields`` query parameter; malformed filters are a 400."""
+    if not fields:
+        return None
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {str(e)}")
+
+
+def json_response(content: Any, spec: Optional[Dict[str, Any]] = None, **kwargs: Any) -> FastJSONResponse:
+    """Encode ``content`` directly, keeping only the fields in ``spec`` when given."""
+    return FastJSONResponse(project(content, spec), **kwargs)
+
+
+def etag_for(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def conditional_response(
+    request: Request,
+    route: str,
+    content: Any,
+    spec: Optional[Dict[str, Any]] = None,
+    cache_control: str = "private, no-cache",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """JSON response tagged with an ETag, or a bodiless 304 when the client's copy matches."""
+    body = orjson.dumps(project(content, spec), option=orjson.OPT_NON_STR_KEYS)
+    headers = {**(headers or {}), "ETag": etag_for(body), "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        conditional_responses.inc((route, "not_modified"))
+        return Response(status_code=304, headers=headers)
+    conditional_responses.inc((route, "full"))
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,21 +1,256 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+# Imported first so the startup profile covers every import below
+from startup import startup_profile
+
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import json
 import os
-from dotenv import load_dotenv
-from typing import Optional
+import secrets
+import tempfile
+from typing import Optional, Tuple
 import logging
 
-# Load environment variables
-load_dotenv()
+from auth import AuthSession, TokenCache
+from breaker import BreakerSet
+from cache import MongoCacheBackend, TTLCache, cache_key
+from catalog import CHUNK_SIZES, get_entities, is_spotify_id
+from compression import CompressionMiddleware
+from export import iter_pages, ndjson_stream, track_rows
+from governor import RateGovernor
+from http_pool import ConnectionStats, create_http_client, create_image_client, import_transport, ssl_context
+from image_proxy import DEFAULT_HOSTS, ImageCache, ImageError, ImageProxy
+from library_index import LibraryIndexes
+from library_sync import PLAYLIST_ITEM_FIELDS, LibraryMirror, LibrarySync
+from metrics import (
+    MetricsMiddleware, UpstreamTrace, observe_upstream_response, conditional_snapshot, process_snapshot, registry, upstream_endpoint
+)
+from playback_stream import PlaybackHub, StreamTickets, TokenSource
+from player_commands import play_arguments, run_commands, validate_commands
+from projections import SLIM_BY_TYPE, strip_unused
+from responses import FastJSONResponse, conditional_response, etag_matches, field_spec, json_response
+from sessions import SessionStore
+from spotify_client import API_BASE_URL, ACCOUNTS_BASE_URL, SpotifyClient, SpotifyOAuth, SpotifyAPIError
+from suggestions import SuggestionIndex
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Spotify Clone API", version="1.0.0")
+SPOTIFY_SCOPE = "user-read-playback-state user-modify-playback-state user-read-private streaming user-read-currently-playing user-library-read playlist-read-private"
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", API_BASE_URL)
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", ACCOUNTS_BASE_URL)
+
+# Number of worker processes sharing the app-wide Spotify budget
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+connection_stats = ConnectionStats(trace_factory=lambda url: UpstreamTrace(upstream_endpoint(url)))
+
+# Paces all outbound Web API calls and absorbs Spotify 429s
+rate_governor = RateGovernor(
+    app_rate=float(os.getenv("SPOTIFY_APP_RATE", "20")) / WORKER_COUNT,
+    app_burst=float(os.getenv("SPOTIFY_APP_BURST", "40")) / WORKER_COUNT,
+    user_rate=float(os.getenv("SPOTIFY_USER_RATE", "5")),
+    user_burst=float(os.getenv("SPOTIFY_USER_BURST", "10")),
+    max_retries=int(os.getenv("SPOTIFY_MAX_RETRIES", "2")),
+    max_retry_wait=float(os.getenv("SPOTIFY_MAX_RETRY_WAIT", "10")),
+)
+
+# Catalog search results are user-independent for a given market
+search_cache = TTLCache(
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "60")),
+    max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    name="search cache",
+    stale_ttl=float(os.getenv("SEARCH_CACHE_STALE_TTL", "3600")),
+)
+
+# Per-user playback state and device list; a conditional GET inside the TTL needs no upstream call.
+# Cleared for the user by playback commands so their own changes show up immediately.
+player_cache = TTLCache(
+    ttl=float(os.getenv("PLAYER_CACHE_TTL", "2")),
+    max_bytes=int(os.getenv("PLAYER_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    name="player cache",
+    stale_ttl=float(os.getenv("PLAYER_CACHE_STALE_TTL", "60")),
+)
+
+# Track/artist/album metadata, cached per entity ID and market
+entity_cache = TTLCache(
+    ttl=float(os.getenv("ENTITY_CACHE_TTL", "3600")),
+    max_bytes=int(os.getenv("ENTITY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    name="entity cache",
+)
+CATALOG_MAX_IDS = int(os.getenv("CATALOG_MAX_IDS", "1000"))
+
+# Upper bound on one /api/player/commands batch
+PLAYER_MAX_COMMANDS = int(os.getenv("PLAYER_MAX_COMMANDS", "50"))
+
+# Album art through /api/images, resized and cached on disk. Links are built from the API's
+# configured public URL, never from a client's Host header, so without IMAGE_PROXY_BASE_URL
+# (or with IMAGE_PROXY=0) image URLs stay Spotify's.
+IMAGE_PROXY_BASE_URL = os.getenv("IMAGE_PROXY_BASE_URL", "").rstrip("/")
+IMAGE_PROXY = os.getenv("IMAGE_PROXY", "1") != "0" and bool(IMAGE_PROXY_BASE_URL)
+IMAGE_WIDTHS = [int(width) for width in os.getenv("IMAGE_PROXY_WIDTHS", "300,160,64").split(",")]
+image_proxy = ImageProxy(
+    IMAGE_WIDTHS,
+    hosts=os.getenv("IMAGE_PROXY_HOSTS", ",".join(DEFAULT_HOSTS)).split(","),
+)
+image_cache = ImageCache(
+    os.getenv("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "spotify-clone-images")),
+    max_bytes=int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    widths=IMAGE_WIDTHS,
+    quality=int(os.getenv("IMAGE_QUALITY", "80")),
+    # Not needed until the first cache miss
+    http_factory=create_image_client,
+)
+
+# Pages fetched ahead of the client by the NDJSON export endpoints
+EXPORT_WINDOW = int(os.getenv("EXPORT_WINDOW", "4"))
+
+# Validated bearer tokens, so protected routes skip redundant /me lookups
+token_cache = TokenCache(
+    max_entries=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")),
+    default_ttl=float(os.getenv("AUTH_CACHE_DEFAULT_TTL", "300")),
+)
+
+# Server-side OAuth sessions, refreshed in the background before expiry
+session_store = SessionStore(
+    oauth_factory=lambda: get_spotify_oauth(),
+    refresh_margin=float(os.getenv("TOKEN_REFRESH_MARGIN", "300")),
+    check_interval=float(os.getenv("TOKEN_REFRESH_CHECK_INTERVAL", "30")),
+    on_token=lambda token_info: token_cache.remember_expiry(token_info["access_token"], token_info["expires_at"]),
+    max_sessions=int(os.getenv("SESSION_MAX_ENTRIES", "100000")),
+    refresh_lease=float(os.getenv("TOKEN_REFRESH_LEASE", "15")),
+    adopt_wait=float(os.getenv("TOKEN_REFRESH_ADOPT_WAIT", "1.5")),
+)
+
+# Fails upstream calls fast while an endpoint group (search, player, me, library, catalog, auth) is down
+breakers = BreakerSet(
+    enabled=os.getenv("SPOTIFY_BREAKER", "1") != "0",
+    failure_rate=float(os.getenv("SPOTIFY_BREAKER_FAILURE_RATE", "0.5")),
+    min_calls=int(os.getenv("SPOTIFY_BREAKER_MIN_CALLS", "10")),
+    window=float(os.getenv("SPOTIFY_BREAKER_WINDOW", "30")),
+    slow_call_seconds=float(os.getenv("SPOTIFY_BREAKER_SLOW_CALL", "2")),
+    open_seconds=float(os.getenv("SPOTIFY_BREAKER_OPEN_SECONDS", "15")),
+    half_open_calls=int(os.getenv("SPOTIFY_BREAKER_HALF_OPEN_CALLS", "1")),
+)
+
+# One playback poller per user, shared by all of that user's open streams
+playback_hub = PlaybackHub(
+    fetch_state=lambda access_token, user_id: fetch_stream_state(access_token, user_id),
+    playing_interval=float(os.getenv("PLAYBACK_POLL_PLAYING", "1")),
+    paused_interval=float(os.getenv("PLAYBACK_POLL_PAUSED", "5")),
+    idle_interval=float(os.getenv("PLAYBACK_POLL_IDLE", "15")),
+)
+
+# Stream URLs carry one of these instead of a credential. Workers must share the secret:
+# run_server and gunicorn.conf.py generate one for their workers when it is not set.
+stream_tickets = StreamTickets(
+    secret=os.getenv("STREAM_TICKET_SECRET") or secrets.token_hex(32),
+    ttl=float(os.getenv("STREAM_TICKET_TTL", "30")),
+)
+
+# Per-user search indexes over the mirrored saved tracks
+library_indexes = LibraryIndexes(
+    load_tracks=lambda user_id: app.state.library_sync.mirror.all_saved_tracks(user_id),
+    max_users=int(os.getenv("LIBRARY_INDEX_MAX_USERS", "1000")),
+)
+
+# Search-as-you-type suggestions from past queries and the titles they returned
+suggestion_index = SuggestionIndex(
+    max_entries=int(os.getenv("SUGGEST_MAX_ENTRIES", "200000")),
+    half_life=float(os.getenv("SUGGEST_HALF_LIFE", "86400")),
+    min_query_hits=int(os.getenv("SUGGEST_MIN_QUERY_HITS", "2")),
+    max_candidates=int(os.getenv("SUGGEST_MAX_CANDIDATES", "50000")),
+    max_searches=int(os.getenv("SUGGEST_MAX_SEARCHES", "200000")),
+)
+
+def configure_process() -> None:
+    # Not at import: run_server does this before starting workers, and the lifespan covers
+    # servers that import server:app directly. Settings read at import come from the real
+    # environment there (gunicorn.conf.py loads .env, uvicorn takes --env-file).
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    # httpx logs every upstream request at INFO; the pooled client makes that one line per call
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup_profile.phase("configure"):
+        configure_process()
+    if os.getenv("IMAGE_PROXY", "1") != "0" and not IMAGE_PROXY_BASE_URL:
+        logger.warning("IMAGE_PROXY_BASE_URL is not set; album art links stay Spotify's")
+    with startup_profile.phase("warm_up"):
+        # Off the event loop and side by side: loading the CA bundle releases the GIL,
+        # so it overlaps the httpcore import and the image cache scan
+        warm_up = [asyncio.to_thread(ssl_context), asyncio.to_thread(import_transport)]
+        if IMAGE_PROXY:
+            warm_up.append(asyncio.to_thread(image_cache.load))
+        await asyncio.gather(*warm_up)
+    # One pooled client and OAuth helper shared by every route and token
+    with startup_profile.phase("http_client"):
+        http_client = create_http_client(
+            SPOTIFY_API_URL, SPOTIFY_ACCOUNTS_URL, connection_stats, response_hooks=[observe_upstream_response]
+        )
+    app.state.http_client = http_client
+    app.state.spotify_oauth = SpotifyOAuth(
+        client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
+        redirect_uri=os.getenv("REDIRECT_URI"),
+        scope=SPOTIFY_SCOPE,
+        http=http_client,
+        accounts_url=SPOTIFY_ACCOUNTS_URL,
+        breakers=breakers,
+    )
+    if os.getenv("TOKEN_STORE") == "mongo":
+        # Sessions shared across workers and restarts; tokens are encrypted at rest
+        encryption_key = os.getenv("TOKEN_ENCRYPTION_KEY")
+        if not encryption_key:
+            logger.error("TOKEN_STORE=mongo needs TOKEN_ENCRYPTION_KEY; sessions stay in memory only")
+        else:
+            try:
+                from token_store import MongoTokenStore, TokenCipher
+
+                session_store.token_store = MongoTokenStore(
+                    os.getenv("MONGO_URL", "mongodb://localhost:27017"),
+                    TokenCipher(encryption_key),
+                    idle_timeout=session_store.idle_timeout,
+                )
+            except ImportError:
+                logger.warning("motor or python-jose is not installed; sessions stay in memory only")
+    if os.getenv("SEARCH_CACHE_SHARED") == "mongo":
+        search_cache.shared = MongoCacheBackend(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    app.state.library_sync = None
+    # Opt-in: needs a reachable MongoDB
+    if os.getenv("LIBRARY_MIRROR") == "1":
+        try:
+            app.state.library_sync = LibrarySync(
+                LibraryMirror(os.getenv("MONGO_URL", "mongodb://localhost:27017")),
+                client_factory=get_spotify_client,
+                sync_interval=float(os.getenv("LIBRARY_SYNC_INTERVAL", "300")),
+                max_concurrent_syncs=int(os.getenv("LIBRARY_MAX_CONCURRENT_SYNCS", "4")),
+                on_saved_tracks=library_indexes.on_saved_tracks,
+            )
+        except ImportError:
+            logger.warning("motor is not installed; library mirror disabled")
+    session_store.start()
+    startup_profile.ready()
+    yield
+    if app.state.library_sync is not None:
+        await app.state.library_sync.stop()
+    await playback_hub.close()
+    await session_store.stop()
+    await image_cache.aclose()
+    await http_client.aclose()
+
+app = FastAPI(
+    title="Spotify Clone API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # CORS middleware
 app.add_middleware(
@@ -26,14 +261,154 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for JSON and NDJSON bodies of at least COMPRESSION_MIN_BYTES; COMPRESSION=0 disables
+if os.getenv("COMPRESSION", "1") != "0":
+    app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")))
+
+# Route latency/status metrics; METRICS_SERVER_TIMING=1 adds Server-Timing headers
+app.add_middleware(MetricsMiddleware, server_timing=os.getenv("METRICS_SERVER_TIMING") == "1")
+
 # Spotify OAuth configuration
-def get_spotify_oauth():
-    return SpotifyOAuth(
-        client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-        client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
-        redirect_uri=os.getenv("REDIRECT_URI"),
-        scope="user-read-playback-state user-modify-playback-state user-read-private streaming user-read-currently-playing user-library-read playlist-read-private"
+def get_spotify_oauth() -> SpotifyOAuth:
+    return app.state.spotify_oauth
+
+def get_spotify_client(access_token: str, user_id: Optional[str] = None) -> SpotifyClient:
+    return SpotifyClient(app.state.http_client, access_token, SPOTIFY_API_URL, rate_governor, breakers, user_id)
+
+async def fetch_stream_state(access_token: str, user_id: str):
+    state = await get_spotify_client(access_token, user_id).current_playback(background=True)
+    return proxied_images(state)
+
+def upstream_outage(e: Exception) -> bool:
+    # Worth answering from a stale copy: Spotify down, slow, throttling, or our circuit open
+    return isinstance(e, SpotifyAPIError) and (e.http_status >= 500 or e.http_status == 429)
+
+def stale_headers(stale: bool) -> Optional[dict]:
+    return {"Warning": '110 - "Response is Stale"'} if stale else None
+
+def resolve_market(market: Optional[str], session: AuthSession) -> Optional[str]:
+    # Spotify answers user tokens for their own country when no market is given, so shared
+    # caches must key on that country rather than on None or "from_token"
+    if market is None or market == "from_token":
+        return session.profile.get("country")
+    return market.upper()
+
+async def cached_search(sp: SpotifyClient, q: str, type: str, limit: int, market: Optional[str], user_id: str):
+    # Spotify search ignores case and extra spaces; send the query the key was built from
+    query = " ".join(q.lower().split())
+    # Without a known country the results may be country-specific, so they are not shared
+    key = cache_key("search", query, type, limit, market or ("user", user_id))
+
+    async def fetch():
+        # Stripped once here, so cached entries and every response stay small
+        results = strip_unused(await sp.search(query, limit=limit, type=type, market=market))
+        # Titles are learned once per upstream fetch, not on every cache hit
+        suggestion_index.record_results(results)
+        return results
+
+    # (results, stale)
+    return await search_cache.get_or_fetch_stale(
+        key, fetch, upstream_outage, lambda: breakers.retry_in("search"), lambda: breakers.is_open("search")
+    )
+
+async def cached_player_read(kind: str, user_id: str, fetch):
+    async def fetch_stripped():
+        # Wrapped so "nothing playing" (no body) is cached too
+        return {"payload": strip_unused(await fetch())}
+
+    entry, stale = await player_cache.get_or_fetch_stale(
+        cache_key(kind, user_id),
+        fetch_stripped,
+        upstream_outage,
+        lambda: breakers.retry_in("player"),
+        lambda: breakers.is_open("player"),
     )
+    return entry["payload"], stale
+
+def invalidate_player_cache(user_id: str) -> None:
+    for kind in ("playback_state", "devices"):
+        player_cache.discard(cache_key(kind, user_id))
+
+def proxied_images(payload, cached: bool = False):
+    # Image URLs pointed at /api/images; cache entries are rewritten once rather than per response
+    if not IMAGE_PROXY:
+        return payload
+    if cached:
+        return image_proxy.rewrite_cached(payload, IMAGE_PROXY_BASE_URL)
+    return image_proxy.rewrite(payload, IMAGE_PROXY_BASE_URL)
+
+def spotify_http_error(e: SpotifyAPIError) -> HTTPException:
+    # Surface upstream rate limiting as-is so clients can back off
+    if e.http_status == 429:
+        return HTTPException(
+            status_code=429,
+            detail="Spotify rate limit reached, retry later",
+            headers={"Retry-After": e.headers.get("retry-after", "1")},
+        )
+    # Spotify down or our circuit open: a retryable outage, not a bad request
+    if e.http_status >= 500:
+        return HTTPException(
+            status_code=503,
+            detail="Spotify is unavailable, retry later",
+            headers={"Retry-After": e.headers.get("retry-after", "5")},
+        )
+    return HTTPException(status_code=400, detail=f"Spotify API error: {str(e)}")
+
+def get_authorization_header(request: Request) -> Optional[str]:
+    return request.headers.get("Authorization")
+
+async def resolve_auth_session(access_token: str) -> AuthSession:
+    try:
+        return await token_cache.resolve(access_token, get_spotify_client(access_token).me)
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error validating token: {str(e)}")
+        if e.http_status in (401, 403):
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        raise spotify_http_error(e)
+
+async def get_auth_session(authorization: Optional[str] = Depends(get_authorization_header)) -> AuthSession:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization header")
+
+    return await resolve_auth_session(authorization[len("Bearer "):])
+
+def get_library_sync() -> LibrarySync:
+    library_sync = app.state.library_sync
+    if library_sync is None:
+        raise HTTPException(status_code=503, detail="Library mirror is not enabled")
+    return library_sync
+
+async def get_stream_subscription(request: Request, ticket: Optional[str] = None) -> Tuple[str, TokenSource]:
+    # EventSource cannot send headers, so browsers connect with a ticket from /api/playback/stream/ticket
+    if ticket:
+        grant = stream_tickets.redeem(ticket)
+        if grant is None:
+            raise HTTPException(status_code=401, detail="Unknown, used or expired stream ticket")
+        session_id, user_id = grant
+        return user_id, session_token_source(session_id)
+    session = await get_auth_session(get_authorization_header(request))
+    return session.user_id, bearer_token_source(session.access_token)
+
+def bearer_token_source(access_token: str) -> TokenSource:
+    # A bare bearer token cannot be refreshed here and is used until Spotify rejects it
+    async def bearer_token() -> str:
+        return access_token
+    return bearer_token
+
+def session_token_source(session_id: str) -> TokenSource:
+    # Session streams re-read the session each poll, refreshing like the REST routes do
+    async def session_token() -> str:
+        oauth_session = await session_store.get(session_id)
+        if not oauth_session:
+            raise SpotifyAPIError(401, "Unknown or expired session")
+        try:
+            oauth_session = await session_store.current_token(oauth_session)
+        except SpotifyAPIError as e:
+            if e.http_status in (400, 401):
+                raise SpotifyAPIError(401, f"Token refresh failed: {e.msg}")
+            raise
+        return oauth_session.access_token
+    return session_token
 
 # Root endpoint
 @app.get("/")
@@ -45,6 +420,50 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
+def collect_stats():
+    stats = {
+        "http": connection_stats.snapshot(),
+        "search_cache": search_cache.snapshot(),
+        "entity_cache": entity_cache.snapshot(),
+        "player_cache": player_cache.snapshot(),
+        "image_cache": image_cache.snapshot(),
+        "suggestions": suggestion_index.snapshot(),
+        "conditional": conditional_snapshot(),
+        "auth_cache": token_cache.snapshot(),
+        "sessions": session_store.snapshot(),
+        "playback_stream": playback_hub.snapshot(),
+        "governor": rate_governor.snapshot(),
+        "breakers": breakers.snapshot(),
+        "process": process_snapshot(),
+        "startup": startup_profile.snapshot(),
+    }
+    if app.state.library_sync is not None:
+        stats["library_sync"] = app.state.library_sync.snapshot()
+        stats["library_index"] = library_indexes.snapshot()
+    return stats
+
+# Upstream connection pool and cache statistics
+# Stats and metrics expose breaker state, cache sizes and traffic. They need
+# "Authorization: Bearer <OPS_TOKEN>" and are off without OPS_TOKEN: the client address
+# can't tell a local operator from a reverse proxy on the same host.
+OPS_TOKEN = os.getenv("OPS_TOKEN")
+
+def require_ops_access(request: Request):
+    if not OPS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), OPS_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+@app.get("/api/stats", dependencies=[Depends(require_ops_access)])
+async def get_stats():
+    return collect_stats()
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_ops_access)])
+async def get_metrics():
+    return PlainTextResponse(registry.render(collect_stats()), media_type="text/plain; version=0.0.4")
+
 # Authentication endpoints
 @app.get("/api/auth/login")
 async def spotify_login():
@@ -61,17 +480,22 @@ async def spotify_login():
 async def spotify_callback(code: str):
     try:
         sp_oauth = get_spotify_oauth()
-        token_info = sp_oauth.get_access_token(code)
+        token_info = await sp_oauth.get_access_token(code)
         
         if not token_info:
             raise HTTPException(status_code=400, detail="Failed to get access token")
             
+        token_cache.remember_expiry(token_info["access_token"], token_info["expires_at"])
+        session = await session_store.create(token_info)
         logger.info("Successfully obtained access token")
         return {
             "access_token": token_info["access_token"], 
             "refresh_token": token_info["refresh_token"],
-            "expires_in": token_info.get("expires_in", 3600)
+            "expires_in": token_info.get("expires_in", 3600),
+            "session_id": session.session_id
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in auth callback: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error in auth callback: {str(e)}")
@@ -81,47 +505,69 @@ async def refresh_token(request: Request):
     try:
         body = await request.json()
         refresh_token = body.get("refresh_token")
-        
+
+        # The refresh token is the credential; a session id alone never yields tokens
         if not refresh_token:
             raise HTTPException(status_code=400, detail="Refresh token is required")
-            
-        sp_oauth = get_spotify_oauth()
-        token_info = sp_oauth.refresh_access_token(refresh_token)
+
+        # Known sessions are kept fresh in the background: answer from memory
+        session = await session_store.find_by_refresh_token(refresh_token)
+        if session:
+            session = await session_store.current_token(session)
+            return {
+                "access_token": session.access_token,
+                # Changes when Spotify rotates it; clients keep the latest
+                "refresh_token": session.refresh_token,
+                "expires_in": session.expires_in(),
+                "session_id": session.session_id
+            }
+
+        # First refresh since a restart: exchange once and adopt it as a session
+        token_info = await session_store.refresh(refresh_token)
+        session = (
+            await session_store.find_by_refresh_token(token_info["refresh_token"])
+            or await session_store.create(token_info)
+        )
         
         return {
             "access_token": token_info["access_token"],
-            "expires_in": token_info.get("expires_in", 3600)
+            "refresh_token": token_info["refresh_token"],
+            "expires_in": token_info.get("expires_in", 3600),
+            "session_id": session.session_id
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error refreshing token: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error refreshing token: {str(e)}")
 
+# Ends the server-side session: no more background refreshes, and it is removed from the token store
+@app.post("/api/auth/logout", status_code=204)
+async def logout(request: Request):
+    body = await request.json()
+    refresh_token = body.get("refresh_token")
+    if not refresh_token:
+        raise HTTPException(status_code=400, detail="Refresh token is required")
+    session = await session_store.find_by_refresh_token(refresh_token)
+    if session:
+        token_cache.invalidate(session.access_token)
+        await session_store.discard(session)
+    return Response(status_code=204)
+
 # User profile endpoint
 @app.get("/api/user/profile")
-async def get_user_profile(authorization: str = Depends(lambda request: request.headers.get("Authorization"))):
-    try:
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Invalid authorization header")
-            
-        access_token = authorization.replace("Bearer ", "")
-        sp = spotipy.Spotify(auth=access_token)
-        
-        profile = sp.me()
-        return {
-            "id": profile["id"],
-            "display_name": profile.get("display_name", "User"),
-            "email": profile.get("email", ""),
-            "product": profile.get("product", "free"),
-            "is_premium": profile.get("product") == "premium",
-            "images": profile.get("images", []),
-            "followers": profile.get("followers", {}).get("total", 0)
-        }
-    except spotipy.exceptions.SpotifyException as e:
-        logger.error(f"Spotify API error: {str(e)}")
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-    except Exception as e:
-        logger.error(f"Error getting user profile: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error getting user profile: {str(e)}")
+async def get_user_profile(request: Request, session: AuthSession = Depends(get_auth_session)):
+    # Served from the token cache; /me was already fetched to validate the token
+    profile = session.profile
+    return conditional_response(request, "/api/user/profile", proxied_images({
+        "id": profile["id"],
+        "display_name": profile.get("display_name", "User"),
+        "email": profile.get("email", ""),
+        "product": session.product,
+        "is_premium": session.is_premium,
+        "images": profile.get("images", []),
+        "followers": profile.get("followers", {}).get("total", 0)
+    }), cache_control="private, max-age=60")
 
 # Search endpoint
 @app.get("/api/search")
@@ -129,64 +575,151 @@ async def search_tracks(
     q: str, 
     type: str = "track",
     limit: int = 20,
-    authorization: str = Depends(lambda request: request.headers.get("Authorization"))
+    market: Optional[str] = None,
+    fields: Optional[str] = None,
+    session: AuthSession = Depends(get_auth_session)
 ):
+    spec = field_spec(fields)
     try:
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Invalid authorization header")
-            
-        access_token = authorization.replace("Bearer ", "")
-        sp = spotipy.Spotify(auth=access_token)
+        sp = get_spotify_client(session.access_token, session.user_id)
         
-        results = sp.search(q, limit=limit, type=type)
-        return results
-    except spotipy.exceptions.SpotifyException as e:
+        results, stale = await cached_search(
+            sp, q, type, limit, resolve_market(market, session), session.user_id
+        )
+        suggestion_index.record_search(q, session.user_id)
+        return json_response(proxied_images(results, cached=True), spec, headers=stale_headers(stale))
+    except SpotifyAPIError as e:
         logger.error(f"Spotify API error in search: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Spotify API error: {str(e)}")
+        raise spotify_http_error(e)
     except Exception as e:
         logger.error(f"Error in search: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error in search: {str(e)}")
 
+# Combined multi-type search: one round-trip and one upstream call per query
+@app.get("/api/search/all")
+async def search_all(
+    q: str,
+    track_limit: int = Query(10, ge=0, le=50),
+    artist_limit: int = Query(6, ge=0, le=50),
+    playlist_limit: int = Query(6, ge=0, le=50),
+    album_limit: int = Query(0, ge=0, le=50),
+    market: Optional[str] = None,
+    session: AuthSession = Depends(get_auth_session)
+):
+    limits = {
+        "track": track_limit,
+        "artist": artist_limit,
+        "playlist": playlist_limit,
+        "album": album_limit,
+    }
+    limits = {kind: limit for kind, limit in limits.items() if limit > 0}
+    try:
+        if not limits:
+            raise HTTPException(status_code=400, detail="At least one result type limit must be positive")
+
+        sp = get_spotify_client(session.access_token, session.user_id)
+
+        # Spotify applies one limit to every type, so fetch the largest and trim
+        results, stale = await cached_search(
+            sp, q, ",".join(limits), max(limits.values()), resolve_market(market, session), session.user_id
+        )
+        suggestion_index.record_search(q, session.user_id)
+
+        response = {}
+        for kind, limit in limits.items():
+            items = (results.get(f"{kind}s") or {}).get("items") or []
+            # Playlist search can return null entries for unavailable playlists
+            response[f"{kind}s"] = [SLIM_BY_TYPE[kind](item) for item in items if item][:limit]
+        return json_response(proxied_images(response), headers=stale_headers(stale))
+    except HTTPException:
+        raise
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error in combined search: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error in combined search: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error in combined search: {str(e)}")
+
+# Typeahead for the search box, answered from memory without calling Spotify
+@app.get("/api/search/suggest")
+async def search_suggest(
+    q: str,
+    limit: int = Query(8, ge=1, le=20),
+    session: AuthSession = Depends(get_auth_session)
+):
+    return json_response({"q": q, "suggestions": suggestion_index.suggest(q, limit)})
+
+# Batch track/artist/album metadata in request order
+@app.post("/api/catalog")
+async def get_catalog_entities(
+    request: Request,
+    session: AuthSession = Depends(get_auth_session)
+):
+    try:
+        body = await request.json()
+        kind = body.get("type", "track")
+        ids = body.get("ids") or []
+        market = body.get("market")
+
+        if kind not in CHUNK_SIZES:
+            raise HTTPException(status_code=400, detail=f"type must be one of: {', '.join(CHUNK_SIZES)}")
+        if market is not None and not isinstance(market, str):
+            raise HTTPException(status_code=400, detail="market must be a country code")
+        if not isinstance(ids, list) or not ids:
+            raise HTTPException(status_code=400, detail="ids must be a non-empty list")
+        if len(ids) > CATALOG_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {CATALOG_MAX_IDS} ids per request")
+        invalid = [entity_id for entity_id in ids if not isinstance(entity_id, str) or not is_spotify_id(entity_id)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid Spotify ids: {', '.join(map(str, invalid[:10]))}")
+
+        sp = get_spotify_client(session.access_token, session.user_id)
+        entities = await get_entities(entity_cache, sp, kind, ids, resolve_market(market, session))
+        return proxied_images({f"{kind}s": entities})
+    except HTTPException:
+        raise
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error in catalog lookup: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error in catalog lookup: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error in catalog lookup: {str(e)}")
+
 # Playback control endpoints
 @app.post("/api/play")
 async def start_playback(
     request: Request,
-    authorization: str = Depends(lambda request: request.headers.get("Authorization"))
+    session: AuthSession = Depends(get_auth_session)
 ):
     try:
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Invalid authorization header")
-            
-        access_token = authorization.replace("Bearer ", "")
         body = await request.json()
-        
-        track_uri = body.get("track_uri")
-        position_ms = body.get("position_ms", 0)
         device_id = body.get("device_id")
-        
-        if not track_uri:
-            raise HTTPException(status_code=400, detail="track_uri is required")
-            
-        sp = spotipy.Spotify(auth=access_token)
-        
-        play_kwargs = {
-            "uris": [track_uri],
-            "position_ms": position_ms
-        }
-        
-        if device_id:
-            play_kwargs["device_id"] = device_id
-            
-        sp.start_playback(**play_kwargs)
-        
+
+        # track_uri is the original single-track form; uris/context_uri/offset extend it
+        try:
+            play_kwargs = play_arguments(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if body.get("track_uri") and play_kwargs["position_ms"] is None:
+            play_kwargs["position_ms"] = 0
+
+        sp = get_spotify_client(session.access_token, session.user_id)
+        await sp.start_playback(device_id=device_id, **play_kwargs)
+        invalidate_player_cache(session.user_id)
+
         return {
-            "status": "playing", 
-            "position_ms": position_ms,
-            "track_uri": track_uri
+            "status": "playing",
+            "position_ms": play_kwargs["position_ms"],
+            "track_uri": body.get("track_uri"),
+            "uris": play_kwargs["uris"],
+            "context_uri": play_kwargs["context_uri"],
+            "offset": play_kwargs["offset"],
         }
-    except spotipy.exceptions.SpotifyException as e:
+    except HTTPException:
+        raise
+    except SpotifyAPIError as e:
         logger.error(f"Spotify API error in play: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Spotify API error: {str(e)}")
+        raise spotify_http_error(e)
     except Exception as e:
         logger.error(f"Error starting playback: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error starting playback: {str(e)}")
@@ -194,74 +727,363 @@ async def start_playback(
 @app.post("/api/pause")
 async def pause_playback(
     request: Request,
-    authorization: str = Depends(lambda request: request.headers.get("Authorization"))
+    session: AuthSession = Depends(get_auth_session)
 ):
     try:
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Invalid authorization header")
-            
-        access_token = authorization.replace("Bearer ", "")
         body = await request.json()
         device_id = body.get("device_id")
         
-        sp = spotipy.Spotify(auth=access_token)
+        sp = get_spotify_client(session.access_token, session.user_id)
         
         if device_id:
-            sp.pause_playback(device_id=device_id)
+            await sp.pause_playback(device_id=device_id)
         else:
-            sp.pause_playback()
+            await sp.pause_playback()
+        invalidate_player_cache(session.user_id)
             
         return {"status": "paused"}
-    except spotipy.exceptions.SpotifyException as e:
+    except SpotifyAPIError as e:
         logger.error(f"Spotify API error in pause: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Spotify API error: {str(e)}")
+        raise spotify_http_error(e)
     except Exception as e:
         logger.error(f"Error pausing playback: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error pausing playback: {str(e)}")
 
+@app.post("/api/player/commands")
+async def run_player_commands(
+    request: Request,
+    session: AuthSession = Depends(get_auth_session)
+):
+    """Run an ordered batch of play/queue/seek/volume/transfer commands in one request."""
+    try:
+        body = await request.json()
+        try:
+            commands = validate_commands(body.get("commands"), PLAYER_MAX_COMMANDS)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        sp = get_spotify_client(session.access_token, session.user_id)
+        results = await run_commands(
+            sp,
+            commands,
+            device_id=body.get("device_id"),
+            stop_on_error=bool(body.get("stop_on_error", True)),
+        )
+        invalidate_player_cache(session.user_id)
+        return {
+            "status": "ok" if all(r["status"] in ("ok", "superseded") for r in results) else "partial",
+            "results": results,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running player commands: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error running player commands: {str(e)}")
+
 @app.get("/api/playback/state")
-async def get_playback_state(authorization: str = Depends(lambda request: request.headers.get("Authorization"))):
+async def get_playback_state(
+    request: Request,
+    fields: Optional[str] = None,
+    session: AuthSession = Depends(get_auth_session)
+):
+    spec = field_spec(fields)
     try:
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Invalid authorization header")
-            
-        access_token = authorization.replace("Bearer ", "")
-        sp = spotipy.Spotify(auth=access_token)
+        sp = get_spotify_client(session.access_token, session.user_id)
         
-        state = sp.current_playback()
-        return state
-    except spotipy.exceptions.SpotifyException as e:
+        state, stale = await cached_player_read("playback_state", session.user_id, sp.current_playback)
+        return conditional_response(
+            request, "/api/playback/state", proxied_images(state, cached=True), spec, headers=stale_headers(stale)
+        )
+    except SpotifyAPIError as e:
         logger.error(f"Spotify API error getting playback state: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Spotify API error: {str(e)}")
+        raise spotify_http_error(e)
     except Exception as e:
         logger.error(f"Error getting playback state: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting playback state: {str(e)}")
 
+# Single-use ticket for opening the playback stream from a browser
+@app.post("/api/playback/stream/ticket")
+async def issue_stream_ticket(request: Request, session: AuthSession = Depends(get_auth_session)):
+    body = await request.json()
+    oauth_session = await session_store.get(body.get("session_id") or "")
+    if not oauth_session:
+        raise HTTPException(status_code=401, detail="Unknown or expired session")
+    oauth_session = await session_store.current_token(oauth_session)
+    # The session must belong to the caller, not merely exist
+    if (await resolve_auth_session(oauth_session.access_token)).user_id != session.user_id:
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
+    return {
+        "ticket": stream_tickets.issue(oauth_session.session_id, session.user_id),
+        "expires_in": int(stream_tickets.ttl),
+    }
+
+# Server-Sent Events stream of playback changes (track, play/pause, seek, device)
+@app.get("/api/playback/stream")
+async def stream_playback_state(subscription: Tuple[str, TokenSource] = Depends(get_stream_subscription)):
+    user_id, token_source = subscription
+    queue = playback_hub.subscribe(user_id, token_source)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                if event["event"] == "end":
+                    return
+        finally:
+            playback_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Get user's devices
 @app.get("/api/devices")
-async def get_devices(authorization: str = Depends(lambda request: request.headers.get("Authorization"))):
+async def get_devices(
+    request: Request,
+    fields: Optional[str] = None,
+    session: AuthSession = Depends(get_auth_session)
+):
+    spec = field_spec(fields)
     try:
-        if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Invalid authorization header")
-            
-        access_token = authorization.replace("Bearer ", "")
-        sp = spotipy.Spotify(auth=access_token)
+        sp = get_spotify_client(session.access_token, session.user_id)
         
-        devices = sp.devices()
-        return devices
-    except spotipy.exceptions.SpotifyException as e:
+        devices, stale = await cached_player_read("devices", session.user_id, sp.devices)
+        return conditional_response(request, "/api/devices", devices, spec, headers=stale_headers(stale))
+    except SpotifyAPIError as e:
         logger.error(f"Spotify API error getting devices: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Spotify API error: {str(e)}")
+        raise spotify_http_error(e)
     except Exception as e:
         logger.error(f"Error getting devices: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting devices: {str(e)}")
 
-if __name__ == "__main__":
+# Album art proxy; no auth, since <img> tags cannot send a bearer token, so only Spotify's CDN hosts are allowed
+@app.get("/api/images")
+async def get_image(request: Request, src: str, w: int = Query(0, ge=0, le=4096)):
+    if not image_proxy.allowed(src):
+        raise HTTPException(status_code=400, detail="Image host is not allowed")
+    try:
+        image = await image_cache.get(src, w, webp="image/webp" in request.headers.get("accept", ""))
+    except ImageError as e:
+        logger.error(f"Error proxying image {src}: {str(e)}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    # Spotify image URLs name their content, so a given proxy URL never changes
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": image.etag, "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), image.etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image.path, media_type=image.media_type, headers=headers, stat_result=image.stat)
+
+# Library endpoints, served from the MongoDB mirror (LIBRARY_MIRROR=1); until a user's first
+# background sync finishes they answer with an empty library and synced_at null
+@app.get("/api/library/tracks")
+async def get_saved_tracks(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: AuthSession = Depends(get_auth_session),
+    library_sync: LibrarySync = Depends(get_library_sync)
+):
+    try:
+        state = await library_sync.ensure_synced(session.user_id, session.access_token)
+        items = await library_sync.mirror.list_saved_tracks(session.user_id, limit, offset)
+        return {
+            "items": proxied_images(items),
+            "total": state.get("saved_tracks_count", 0),
+            "limit": limit,
+            "offset": offset,
+            "synced_at": state.get("synced_at")
+        }
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error syncing library: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error getting saved tracks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting saved tracks: {str(e)}")
+
+# Search within the user's saved tracks, answered from the in-memory index
+@app.get("/api/library/search")
+async def search_library(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: AuthSession = Depends(get_auth_session),
+    library_sync: LibrarySync = Depends(get_library_sync)
+):
+    try:
+        await library_sync.ensure_synced(session.user_id, session.access_token)
+        index = await library_indexes.get(session.user_id)
+        results = index.search(q, limit=limit, offset=offset)
+        return {**proxied_images(results), "limit": limit, "offset": offset}
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error syncing library: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error searching library: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching library: {str(e)}")
+
+@app.get("/api/library/playlists")
+async def get_library_playlists(
+    session: AuthSession = Depends(get_auth_session),
+    library_sync: LibrarySync = Depends(get_library_sync)
+):
+    try:
+        state = await library_sync.ensure_synced(session.user_id, session.access_token)
+        items = await library_sync.mirror.list_playlists(session.user_id)
+        return {"items": proxied_images(items), "total": len(items), "synced_at": state.get("synced_at")}
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error syncing library: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error getting playlists: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting playlists: {str(e)}")
+
+@app.get("/api/library/playlists/{playlist_id}/tracks")
+async def get_library_playlist_tracks(
+    playlist_id: str,
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: AuthSession = Depends(get_auth_session),
+    library_sync: LibrarySync = Depends(get_library_sync)
+):
+    try:
+        await library_sync.ensure_synced(session.user_id, session.access_token)
+        playlist = await library_sync.mirror.get_playlist(session.user_id, playlist_id)
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist not found in library")
+        items = await library_sync.mirror.list_playlist_tracks(playlist_id, limit, offset)
+        return {**proxied_images({"playlist": playlist, "items": items}), "limit": limit, "offset": offset}
+    except HTTPException:
+        raise
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error syncing library: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error getting playlist tracks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting playlist tracks: {str(e)}")
+
+@app.post("/api/library/sync")
+async def sync_library(
+    full: bool = False,
+    session: AuthSession = Depends(get_auth_session),
+    library_sync: LibrarySync = Depends(get_library_sync)
+):
+    try:
+        state = await library_sync.sync(session.user_id, session.access_token, full=full)
+        return {
+            "saved_tracks": state.get("saved_tracks_count", 0),
+            "playlists": state.get("playlists_count", 0),
+            "synced_at": state.get("synced_at")
+        }
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error syncing library: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error syncing library: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error syncing library: {str(e)}")
+
+async def export_response(fetch_page, page_size: int) -> StreamingResponse:
+    # The first page is fetched up front so upstream errors still map to a status code
+    first_page = await fetch_page(0)
+    pages = iter_pages(fetch_page, page_size, window=EXPORT_WINDOW, first_page=first_page)
+    return StreamingResponse(
+        ndjson_stream(pages, rows=lambda offset, page: track_rows(offset, proxied_images(page))),
+        media_type="application/x-ndjson",
+        headers={"X-Total-Count": str(first_page.get("total", 0)), "Cache-Control": "no-store"},
+    )
+
+# Streaming NDJSON exports: one row per track, in order, without buffering the collection
+@app.get("/api/export/tracks")
+async def export_saved_tracks(
+    market: Optional[str] = None,
+    session: AuthSession = Depends(get_auth_session)
+):
+    try:
+        sp = get_spotify_client(session.access_token, session.user_id)
+        return await export_response(lambda offset: sp.saved_tracks(limit=50, offset=offset, market=market), 50)
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error exporting saved tracks: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error exporting saved tracks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting saved tracks: {str(e)}")
+
+@app.get("/api/export/playlists/{playlist_id}/tracks")
+async def export_playlist_tracks(
+    playlist_id: str,
+    market: Optional[str] = None,
+    session: AuthSession = Depends(get_auth_session)
+):
+    try:
+        sp = get_spotify_client(session.access_token, session.user_id)
+        return await export_response(
+            lambda offset: sp.playlist_items(
+                playlist_id, limit=100, offset=offset, fields=PLAYLIST_ITEM_FIELDS, market=market
+            ),
+            100,
+        )
+    except SpotifyAPIError as e:
+        logger.error(f"Spotify API error exporting playlist: {str(e)}")
+        raise spotify_http_error(e)
+    except Exception as e:
+        logger.error(f"Error exporting playlist: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting playlist: {str(e)}")
+
+def run_server(argv: Optional[list] = None):
+    import argparse
+    import importlib.util
     import uvicorn
+
+    # Before the defaults below; workers and the reloader inherit the environment, .env included
+    configure_process()
+    parser = argparse.ArgumentParser(description="Run the Spotify Clone API")
+    parser.add_argument("--mode", choices=["dev", "prod"], default=os.getenv("SERVER_MODE", "dev"))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("SERVER_BACKLOG", "2048")))
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("SERVER_KEEP_ALIVE", "5")))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30")))
+    args = parser.parse_args(argv)
+
+    if args.mode == "dev":
+        uvicorn.run(
+            "server:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
+        return
+
+    # Workers inherit this, so per-process limits (e.g. the rate governor) split the app budget
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    # One stream ticket secret for all workers, so a ticket issued by one is redeemable by any
+    os.environ.setdefault("STREAM_TICKET_SECRET", secrets.token_hex(32))
     uvicorn.run(
         "server:app",
-        host="0.0.0.0",
-        port=8001,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        # No WebSocket routes, so workers skip importing a WebSocket implementation
+        ws="none",
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        # SIGTERM stops accepting connections and lets in-flight requests drain
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=False,
+        proxy_headers=True,
+        log_level="warning"
+    )
+
+startup_profile.imported()
+
+if __name__ == "__main__":
+    run_server()
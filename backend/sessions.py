@@ -0,0 +1,353 @@
+"""
+Server-side OAuth sessions with proactive token refresh.
+
+Each successful login creates a session holding the user's access and
+refresh tokens. A background task refreshes access tokens shortly before
+they expire, so user-facing requests read a fresh token from memory instead
+of waiting on an OAuth round-trip. Concurrent refreshes of the same refresh
+token collapse into a single upstream exchange.
+
+Sessions live in a bounded LRU. With a ``TokenStore`` behind it, changes are
+written through and LRU misses are loaded from the store, so sessions
+survive eviction, restarts and being created on another worker. Workers
+sharing a store refresh each session once between them: the worker that
+claims the store's refresh lease calls the Accounts service, and the others
+pick up the tokens it writes back.
+"""
+
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from auth import hash_token
+from spotify_client import SpotifyAPIError, SpotifyOAuth
+from token_store import TokenStore
+
+logger = logging.getLogger(__name__)
+
+# How often a worker that lost the refresh lease checks the store for the winner's tokens
+LEASE_POLL_SECONDS = 0.25
+
+
+class OAuthSession:
+    __slots__ = ("session_id", "access_token", "refresh_token", "expires_at", "last_used")
+
+    def __init__(self, session_id: str, access_token: str, refresh_token: str, expires_at: float):
+        self.session_id = session_id
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.last_used = time.time()
+
+    def expires_in(self) -> int:
+        return max(0, int(self.expires_at - time.time()))
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "expires_at": self.expires_at,
+        }
+
+
+class SessionStore:
+    """Session LRU, optional shared token store, and the background refresher."""
+
+    def __init__(
+        self,
+        oauth_factory: Callable[[], SpotifyOAuth],
+        refresh_margin: float = 300.0,
+        check_interval: float = 30.0,
+        idle_timeout: float = 7 * 24 * 3600,
+        max_concurrent_refreshes: int = 8,
+        on_token: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_sessions: int = 100000,
+        token_store: Optional[TokenStore] = None,
+        refresh_lease: float = 15.0,
+        adopt_wait: float = 1.5,
+    ):
+        self.oauth_factory = oauth_factory
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.idle_timeout = idle_timeout
+        self.on_token = on_token
+        self.max_sessions = max_sessions
+        self.token_store = token_store
+        self.refresh_lease = refresh_lease
+        # How long a request waits for another worker's refresh before refreshing itself
+        self.adopt_wait = adopt_wait
+        self._sessions: "OrderedDict[str, OAuthSession]" = OrderedDict()
+        self._by_refresh_token: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_slots = asyncio.Semaphore(max_concurrent_refreshes)
+        self._task: Optional[asyncio.Task] = None
+        self.upstream_refreshes = 0
+        self.coalesced_refreshes = 0
+        self.proactive_refreshes = 0
+        self.failed_refreshes = 0
+        self.evictions = 0
+        self.store_loads = 0
+        self.store_errors = 0
+        self.adopted_refreshes = 0
+        self.refresh_conflicts = 0
+
+    def _remember(self, session: OAuthSession) -> OAuthSession:
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        self._by_refresh_token[hash_token(session.refresh_token)] = session.session_id
+        while len(self._sessions) > self.max_sessions:
+            # Still in the token store, if there is one
+            _, evicted = self._sessions.popitem(last=False)
+            self._by_refresh_token.pop(hash_token(evicted.refresh_token), None)
+            self.evictions += 1
+        return session
+
+    async def _persist(self, session: OAuthSession, expected_hash: Optional[str] = None) -> None:
+        if self.token_store is None:
+            return
+        try:
+            saved = await self.token_store.save(session.record(), hash_token(session.refresh_token), expected_hash)
+        except Exception as e:
+            # The in-memory copy keeps serving; only other workers and restarts miss it
+            self.store_errors += 1
+            logger.warning(f"Session store write failed: {str(e)}")
+            return
+        if not saved:
+            # Another worker stored a newer refresh first; the store keeps its tokens
+            self.refresh_conflicts += 1
+            logger.info("Session was refreshed by another worker; not overwriting it")
+
+    async def _load(self, lookup: Callable[[TokenStore], Any]) -> Optional[OAuthSession]:
+        if self.token_store is None:
+            return None
+        try:
+            record = await lookup(self.token_store)
+        except Exception as e:
+            self.store_errors += 1
+            logger.warning(f"Session store read failed: {str(e)}")
+            return None
+        if record is None:
+            return None
+        self.store_loads += 1
+        existing = self._sessions.get(record["session_id"])
+        if existing is not None:
+            # Loaded concurrently by another request
+            return existing
+        session = OAuthSession(
+            record["session_id"], record["access_token"], record["refresh_token"], record["expires_at"]
+        )
+        return self._remember(session)
+
+    async def create(self, token_info: Dict[str, Any]) -> OAuthSession:
+        session = self._remember(OAuthSession(
+            secrets.token_urlsafe(32),
+            token_info["access_token"],
+            token_info["refresh_token"],
+            token_info["expires_at"],
+        ))
+        await self._persist(session)
+        return session
+
+    async def get(self, session_id: str) -> Optional[OAuthSession]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = await self._load(lambda store: store.load(session_id))
+            if session is None:
+                return None
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        return session
+
+    async def find_by_refresh_token(self, refresh_token: str) -> Optional[OAuthSession]:
+        key = hash_token(refresh_token)
+        session_id = self._by_refresh_token.get(key)
+        if session_id is not None:
+            return await self.get(session_id)
+        session = await self._load(lambda store: store.find(key))
+        if session is not None:
+            session.last_used = time.time()
+        return session
+
+    def _forget(self, session: OAuthSession) -> None:
+        self._sessions.pop(session.session_id, None)
+        self._by_refresh_token.pop(hash_token(session.refresh_token), None)
+
+    async def discard(self, session: OAuthSession) -> None:
+        self._forget(session)
+        if self.token_store is not None:
+            try:
+                await self.token_store.delete(session.session_id)
+            except Exception as e:
+                self.store_errors += 1
+                logger.warning(f"Session store delete failed: {str(e)}")
+
+    def _is_fresh(self, session: OAuthSession) -> bool:
+        return session.expires_at - time.time() > self.refresh_margin
+
+    async def current_token(self, session: OAuthSession) -> OAuthSession:
+        """Return the session with a usable access token.
+
+        The background refresher normally renews tokens well before expiry,
+        so this only waits on the Accounts service if that renewal failed.
+        """
+        if session.expires_at > time.time():
+            return session
+        await self.refresh(session.refresh_token)
+        return session
+
+    async def _claim(self, session: OAuthSession, key: str) -> bool:
+        """Whether this worker may exchange the session's refresh token now."""
+        if self.token_store is None:
+            return True
+        try:
+            return await self.token_store.claim_refresh(session.session_id, key, self.refresh_lease)
+        except Exception as e:
+            # Refreshing uncoordinated beats not refreshing; the conditional write still applies
+            self.store_errors += 1
+            logger.warning(f"Session store lease failed: {str(e)}")
+            return True
+
+    async def _adopt(self, session: OAuthSession, key: str, wait: float) -> Optional[Dict[str, Any]]:
+        """Tokens another worker refreshed, waiting up to ``wait``; None to refresh here instead."""
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                record = await self.token_store.load(session.session_id)
+            except Exception as e:
+                self.store_errors += 1
+                logger.warning(f"Session store read failed: {str(e)}")
+                return None
+            if record is None:
+                # Never persisted or already expired from the store: nobody else refreshes it
+                return None
+            if hash_token(record["refresh_token"]) != key or record["expires_at"] > session.expires_at:
+                self.adopted_refreshes += 1
+                return record
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(LEASE_POLL_SECONDS)
+
+    async def refresh(self, refresh_token: str, wait: Optional[float] = None) -> Dict[str, Any]:
+        """Exchange a refresh token, sharing one upstream call among concurrent callers.
+
+        With a token store, the call is also shared with other workers: only
+        the lease holder calls upstream, and the rest adopt what it stores.
+        They wait ``wait`` seconds for it (default ``adopt_wait``, short
+        enough for a request) and then refresh themselves; the conditional
+        write keeps a late exchange from overwriting a newer rotation.
+        """
+        key = hash_token(refresh_token)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced_refreshes += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            session = self._session_for(key)
+            token_info = None
+            if session is not None and not await self._claim(session, key):
+                token_info = await self._adopt(session, key, self.adopt_wait if wait is None else wait)
+            if token_info is not None:
+                self._apply(key, token_info)
+            else:
+                async with self._refresh_slots:
+                    self.upstream_refreshes += 1
+                    token_info = await self.oauth_factory().refresh_access_token(refresh_token)
+                session = self._apply(key, token_info)
+                if session is not None:
+                    await self._persist(session, expected_hash=key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.failed_refreshes += 1
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(token_info)
+            return token_info
+        finally:
+            del self._inflight[key]
+
+    def _session_for(self, key: str) -> Optional[OAuthSession]:
+        session_id = self._by_refresh_token.get(key)
+        return self._sessions.get(session_id) if session_id else None
+
+    def _apply(self, key: str, token_info: Dict[str, Any]) -> Optional[OAuthSession]:
+        if self.on_token is not None:
+            self.on_token(token_info)
+        session = self._session_for(key)
+        if session is None:
+            return None
+        session.access_token = token_info["access_token"]
+        session.expires_at = token_info["expires_at"]
+        if token_info["refresh_token"] != session.refresh_token:
+            del self._by_refresh_token[key]
+            session.refresh_token = token_info["refresh_token"]
+            self._by_refresh_token[hash_token(session.refresh_token)] = session.session_id
+        return session
+
+    async def refresh_due(self) -> None:
+        """Refresh every session whose token expires within the margin."""
+        now = time.time()
+        due = []
+        for session in list(self._sessions.values()):
+            if now - session.last_used > self.idle_timeout:
+                # Only idle here; the token store expires it on its own schedule
+                self._forget(session)
+            elif not self._is_fresh(session):
+                due.append(session)
+        results = await asyncio.gather(
+            # Nobody is waiting on these, so they can sit out the whole lease
+            *(self.refresh(session.refresh_token, wait=self.refresh_lease) for session in due),
+            return_exceptions=True,
+        )
+        for session, result in zip(due, results):
+            if isinstance(result, SpotifyAPIError) and result.http_status in (400, 401):
+                # Revoked or invalid refresh token: nothing left to keep alive
+                logger.info(f"Dropping session after failed refresh: {result.msg}")
+                await self.discard(session)
+            elif isinstance(result, Exception):
+                logger.warning(f"Proactive token refresh failed: {str(result)}")
+            else:
+                self.proactive_refreshes += 1
+
+    async def run_refresher(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.error(f"Token refresher error: {str(e)}")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run_refresher())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "upstream_refreshes": self.upstream_refreshes,
+            "coalesced_refreshes": self.coalesced_refreshes,
+            "proactive_refreshes": self.proactive_refreshes,
+            "failed_refreshes": self.failed_refreshes,
+            "evictions": self.evictions,
+            "store_loads": self.store_loads,
+            "store_errors": self.store_errors,
+            "adopted_refreshes": self.adopted_refreshes,
+            "refresh_conflicts": self.refresh_conflicts,
+        }
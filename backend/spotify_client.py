@@ -0,0 +1,356 @@
+"""
+Async Spotify Web API client.
+
+Thin wrappers around the Spotify Web API and Accounts service built on a
+shared ``httpx.AsyncClient`` so route handlers never block the event loop
+on an upstream call. With a ``BreakerSet``, calls to an endpoint group whose
+circuit is open fail immediately with ``CircuitOpenError``, and calls that
+outlast the breaker's slow-call threshold fail with a 504.
+"""
+
+import asyncio
+import base64
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+import httpx
+
+from breaker import BreakerSet, endpoint_group
+from governor import PRIORITY_BACKGROUND, PRIORITY_CONTROL, PRIORITY_INTERACTIVE, PRIORITY_READ, RateGovernor
+
+API_BASE_URL = "https://api.spotify.com/v1"
+ACCOUNTS_BASE_URL = "https://accounts.spotify.com"
+
+
+class SpotifyAPIError(Exception):
+    """Raised when Spotify answers with a non-success status code."""
+
+    def __init__(self, http_status: int, msg: str, url: str = "", headers: Optional[Dict[str, str]] = None):
+        self.http_status = http_status
+        self.msg = msg
+        self.url = url
+        self.headers = headers or {}
+        super().__init__(f"http status: {http_status} - {url}: {msg}")
+
+
+class CircuitOpenError(SpotifyAPIError):
+    """Raised instead of calling Spotify while the endpoint group's circuit is open."""
+
+    def __init__(self, group: str, retry_after: float, url: str = ""):
+        self.group = group
+        super().__init__(
+            503, f"Spotify {group} circuit is open", url, {"retry-after": str(max(1, round(retry_after)))}
+        )
+
+
+async def _send(
+    breakers: Optional[BreakerSet],
+    group: str,
+    url: str,
+    send: Callable[[], Awaitable[httpx.Response]],
+    acquire: Optional[Callable[[], Awaitable[None]]] = None,
+    idempotent: bool = False,
+) -> httpx.Response:
+    """One upstream request through the group's breaker; transport failures become 502/504.
+
+    ``acquire`` (rate-limit pacing) runs after the breaker check, so a refused
+    call spends no budget, and is not counted towards the call's latency.
+
+    Calls slower than the breaker's slow-call threshold count as failures.
+    Only ``idempotent`` calls are abandoned at the threshold; anything else
+    (playback commands, token exchanges) may already have taken effect
+    upstream, so it runs to the HTTP client's own timeout.
+    """
+    breaker = breakers.get(group) if breakers is not None and breakers.enabled else None
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(group, breaker.retry_in(), url)
+    # A read slower than the threshold has failed already; stop waiting for it, so a
+    # hanging Spotify trips the breaker after one threshold rather than after the hang
+    call_timeout = breaker.slow_call_seconds if breaker is not None and idempotent else None
+    try:
+        if acquire is not None:
+            await acquire()
+        started = time.monotonic()
+        response = await asyncio.wait_for(send(), call_timeout)
+    except asyncio.TimeoutError:
+        breaker.record(True, time.monotonic() - started)
+        raise SpotifyAPIError(504, f"Spotify did not answer within {breaker.slow_call_seconds:g} s", url)
+    except httpx.TransportError as e:
+        if breaker is not None:
+            breaker.record(True, time.monotonic() - started)
+        status = 504 if isinstance(e, httpx.TimeoutException) else 502
+        raise SpotifyAPIError(status, str(e) or type(e).__name__, url)
+    except BaseException:
+        if breaker is not None:
+            breaker.release()
+        raise
+    if breaker is not None:
+        breaker.record(response.status_code >= 500, time.monotonic() - started)
+    return response
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.headers.get("retry-after", 1))
+    except ValueError:
+        return 1.0
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        payload = response.json()
+    except ValueError:
+        return response.text or response.reason_phrase
+    error = payload.get("error") if isinstance(payload, dict) else None
+    if isinstance(error, dict):
+        return error.get("message", response.reason_phrase)
+    if isinstance(error, str):
+        return payload.get("error_description", error)
+    return response.reason_phrase
+
+
+class SpotifyClient:
+    """Per-token view over the shared HTTP client."""
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        access_token: str,
+        base_url: str = API_BASE_URL,
+        governor: Optional[RateGovernor] = None,
+        breakers: Optional[BreakerSet] = None,
+        user_id: Optional[str] = None,
+    ):
+        self.http = http
+        self.access_token = access_token
+        self.base_url = base_url
+        self.governor = governor
+        self.breakers = breakers
+        # Rate-limit key: the Spotify user, so a refreshed token keeps the same bucket.
+        # None (token validation, before the user is known) is paced by the app bucket only.
+        self.user_key = user_id
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_READ,
+    ) -> Optional[Dict[str, Any]]:
+        url = f"{self.base_url}{path}"
+        if params:
+            params = {k: v for k, v in params.items() if v is not None}
+        group = endpoint_group(path)
+
+        async def acquire() -> None:
+            if self.governor is not None:
+                await self.governor.acquire(priority, self.user_key)
+
+        async def send() -> httpx.Response:
+            return await self.http.request(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+            )
+
+        attempt = 0
+        while True:
+            response = await _send(self.breakers, group, url, send, acquire, idempotent=method == "GET")
+            if response.status_code != 429 or self.governor is None:
+                break
+            retry_after = _retry_after(response)
+            self.governor.record_throttle(retry_after, attempt)
+            if not self.governor.should_retry(retry_after, attempt):
+                break
+            attempt += 1
+        if response.status_code >= 400:
+            raise SpotifyAPIError(response.status_code, _error_message(response), url, dict(response.headers))
+        if response.status_code == 204 or not response.content:
+            return None
+        return response.json()
+
+    async def me(self) -> Dict[str, Any]:
+        return await self._request("GET", "/me", priority=PRIORITY_INTERACTIVE)
+
+    async def search(
+        self,
+        q: str,
+        limit: int = 10,
+        offset: int = 0,
+        type: str = "track",
+        market: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return await self._request(
+            "GET",
+            "/search",
+            params={"q": q, "limit": limit, "offset": offset, "type": type, "market": market},
+        )
+
+    async def start_playback(
+        self,
+        device_id: Optional[str] = None,
+        context_uri: Optional[str] = None,
+        uris: Optional[List[str]] = None,
+        offset: Optional[Dict[str, Any]] = None,
+        position_ms: Optional[int] = None,
+    ) -> None:
+        data: Dict[str, Any] = {}
+        if context_uri is not None:
+            data["context_uri"] = context_uri
+        if uris is not None:
+            data["uris"] = uris
+        if offset is not None:
+            data["offset"] = offset
+        if position_ms is not None:
+            data["position_ms"] = position_ms
+        await self._request(
+            "PUT", "/me/player/play", params={"device_id": device_id}, json=data, priority=PRIORITY_CONTROL
+        )
+
+    async def pause_playback(self, device_id: Optional[str] = None) -> None:
+        await self._request("PUT", "/me/player/pause", params={"device_id": device_id}, priority=PRIORITY_CONTROL)
+
+    async def add_to_queue(self, uri: str, device_id: Optional[str] = None) -> None:
+        await self._request(
+            "POST", "/me/player/queue", params={"uri": uri, "device_id": device_id}, priority=PRIORITY_CONTROL
+        )
+
+    async def seek_track(self, position_ms: int, device_id: Optional[str] = None) -> None:
+        await self._request(
+            "PUT", "/me/player/seek", params={"position_ms": position_ms, "device_id": device_id},
+            priority=PRIORITY_CONTROL,
+        )
+
+    async def volume(self, volume_percent: int, device_id: Optional[str] = None) -> None:
+        await self._request(
+            "PUT", "/me/player/volume", params={"volume_percent": volume_percent, "device_id": device_id},
+            priority=PRIORITY_CONTROL,
+        )
+
+    async def next_track(self, device_id: Optional[str] = None) -> None:
+        await self._request("POST", "/me/player/next", params={"device_id": device_id}, priority=PRIORITY_CONTROL)
+
+    async def previous_track(self, device_id: Optional[str] = None) -> None:
+        await self._request("POST", "/me/player/previous", params={"device_id": device_id}, priority=PRIORITY_CONTROL)
+
+    async def transfer_playback(self, device_id: str, force_play: bool = False) -> None:
+        await self._request(
+            "PUT", "/me/player", json={"device_ids": [device_id], "play": force_play}, priority=PRIORITY_CONTROL
+        )
+
+    async def current_playback(
+        self, market: Optional[str] = None, background: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        priority = PRIORITY_BACKGROUND if background else PRIORITY_READ
+        return await self._request("GET", "/me/player", params={"market": market}, priority=priority)
+
+    async def devices(self) -> Dict[str, Any]:
+        return await self._request("GET", "/me/player/devices")
+
+    async def tracks(self, ids: List[str], market: Optional[str] = None) -> Dict[str, Any]:
+        return await self._request("GET", "/tracks", params={"ids": ",".join(ids), "market": market})
+
+    async def artists(self, ids: List[str]) -> Dict[str, Any]:
+        return await self._request("GET", "/artists", params={"ids": ",".join(ids)})
+
+    async def albums(self, ids: List[str], market: Optional[str] = None) -> Dict[str, Any]:
+        return await self._request("GET", "/albums", params={"ids": ",".join(ids), "market": market})
+
+    async def saved_tracks(
+        self, limit: int = 50, offset: int = 0, market: Optional[str] = None, background: bool = False
+    ) -> Dict[str, Any]:
+        priority = PRIORITY_BACKGROUND if background else PRIORITY_READ
+        return await self._request(
+            "GET", "/me/tracks", params={"limit": limit, "offset": offset, "market": market}, priority=priority
+        )
+
+    async def current_user_playlists(
+        self, limit: int = 50, offset: int = 0, background: bool = False
+    ) -> Dict[str, Any]:
+        priority = PRIORITY_BACKGROUND if background else PRIORITY_READ
+        return await self._request("GET", "/me/playlists", params={"limit": limit, "offset": offset}, priority=priority)
+
+    async def playlist_items(
+        self,
+        playlist_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        fields: Optional[str] = None,
+        market: Optional[str] = None,
+        background: bool = False,
+    ) -> Dict[str, Any]:
+        priority = PRIORITY_BACKGROUND if background else PRIORITY_READ
+        return await self._request(
+            "GET",
+            f"/playlists/{playlist_id}/tracks",
+            params={"limit": limit, "offset": offset, "fields": fields, "market": market},
+            priority=priority,
+        )
+
+
+class SpotifyOAuth:
+    """Authorization-code flow against the Spotify Accounts service."""
+
+    def __init__(
+        self,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        redirect_uri: Optional[str],
+        scope: str,
+        http: httpx.AsyncClient,
+        accounts_url: str = ACCOUNTS_BASE_URL,
+        breakers: Optional[BreakerSet] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.scope = scope
+        self.http = http
+        self.accounts_url = accounts_url
+        self.breakers = breakers
+
+    def get_authorize_url(self, state: Optional[str] = None) -> str:
+        params = {
+            "client_id": self.client_id,
+            "response_type": "code",
+            "redirect_uri": self.redirect_uri,
+            "scope": self.scope,
+        }
+        if state:
+            params["state"] = state
+        return f"{self.accounts_url}/authorize?{urlencode(params)}"
+
+    def _auth_header(self) -> Dict[str, str]:
+        credentials = f"{self.client_id}:{self.client_secret}".encode()
+        return {"Authorization": f"Basic {base64.b64encode(credentials).decode()}"}
+
+    async def _token_request(self, data: Dict[str, str]) -> Dict[str, Any]:
+        url = f"{self.accounts_url}/api/token"
+        response = await _send(
+            self.breakers, "auth", url, lambda: self.http.post(url, data=data, headers=self._auth_header())
+        )
+        if response.status_code >= 400:
+            raise SpotifyAPIError(response.status_code, _error_message(response), url, dict(response.headers))
+        token_info = response.json()
+        token_info["expires_at"] = int(time.time()) + token_info.get("expires_in", 3600)
+        return token_info
+
+    async def get_access_token(self, code: str) -> Dict[str, Any]:
+        return await self._token_request({
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": self.redirect_uri,
+        })
+
+    async def refresh_access_token(self, refresh_token: str) -> Dict[str, Any]:
+        token_info = await self._token_request({
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+        })
+        # Spotify only rotates the refresh token occasionally
+        token_info.setdefault("refresh_token", refresh_token)
+        return token_info
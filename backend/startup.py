@@ -0,0 +1,124 @@
+"""
+Startup profile: how long a worker takes from process start to serving.
+
+``server.py`` imports this module first. Each worker then reports:
+
+- ``time_to_import_s``: process age when ``server.py`` finished importing
+- ``time_to_ready_s``: process age when the lifespan startup completed,
+  i.e. when the worker can serve its first request
+- ``phases_ms``: named steps of the import and the lifespan warm-up
+
+With ``STARTUP_PROFILE=1`` every module imported before the worker is
+ready is also timed, the in-process equivalent of ``python -X importtime``:
+
+- ``imports_ms``: the modules ``server.py`` imports directly, with their
+  dependencies included
+- ``slowest_imports_ms``: the modules with the most time of their own
+
+The report is logged once at ready and served under ``startup`` in
+``/api/stats``. Process age comes from ``/proc`` and is absent elsewhere.
+"""
+
+import builtins
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPORTED_IMPORTS = 15
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started, to the kernel's clock tick (Linux only)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields after it are space-separated
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - started_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupProfile:
+    def __init__(self, trace_imports: bool = False):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.time_to_import: Optional[float] = None
+        self.time_to_ready: Optional[float] = None
+        # module -> (cumulative, self) seconds, and the modules imported at the top level
+        self.imports: Dict[str, List[float]] = {}
+        self.top_level: List[str] = []
+        self._stack: List[float] = []
+        self._thread = threading.get_ident()
+        self._import = builtins.__import__
+        if trace_imports:
+            builtins.__import__ = self._traced_import
+
+    def _traced_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules or threading.get_ident() != self._thread:
+            return self._import(name, globals, locals, fromlist, level)
+        depth = len(self._stack)
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self.imports[name] = [elapsed, elapsed - nested]
+            if depth == 0:
+                self.top_level.append(name)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def imported(self) -> None:
+        self.phases["import"] = time.perf_counter() - self.started
+        self.time_to_import = process_age()
+
+    def ready(self) -> None:
+        """Stop tracing imports and log the report; called once the lifespan startup is done."""
+        if builtins.__import__ == self._traced_import:
+            builtins.__import__ = self._import
+        self.time_to_ready = process_age()
+        report = self.snapshot()
+        logger.info(
+            f"Ready: {report['time_to_ready_s']} s after process start, "
+            f"server.py imported in {report['phases_ms'].get('import')} ms"
+        )
+        if self.imports:
+            logger.info(f"Slowest imports (ms): {report['slowest_imports_ms']}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        def ms(seconds: float) -> float:
+            return round(seconds * 1000, 1)
+
+        snapshot: Dict[str, Any] = {
+            "pid": os.getpid(),
+            "time_to_import_s": None if self.time_to_import is None else round(self.time_to_import, 2),
+            "time_to_ready_s": None if self.time_to_ready is None else round(self.time_to_ready, 2),
+            "phases_ms": {name: ms(seconds) for name, seconds in self.phases.items()},
+        }
+        if self.imports:
+            top_level = sorted(self.top_level, key=lambda name: self.imports[name][0], reverse=True)
+            slowest = sorted(self.imports, key=lambda name: self.imports[name][1], reverse=True)
+            snapshot["imports_ms"] = {name: ms(self.imports[name][0]) for name in top_level[:REPORTED_IMPORTS]}
+            snapshot["slowest_imports_ms"] = {name: ms(self.imports[name][1]) for name in slowest[:REPORTED_IMPORTS]}
+        return snapshot
+
+
+startup_profile = StartupProfile(trace_imports=os.getenv("STARTUP_PROFILE") == "1")
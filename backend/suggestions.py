@@ -0,0 +1,432 @@
+"""
+Search-as-you-type suggestions from a sorted-array index of popular text.
+
+Every user's ``/api/search`` queries are recorded, and so are the track,
+artist, album and playlist names in the results fetched from Spotify. A keystroke
+is answered from memory: the normalized prefix picks one contiguous run of
+the sorted keys (two bisects), and the heaviest entries in that run are
+returned. No upstream call is made.
+
+- Weights decay exponentially with ``half_life``. This uses forward decay:
+  a hit adds ``2 ** (age / half_life)`` relative to a fixed epoch, so
+  stored weights never need updating and still compare correctly.
+- Keys, weights and kinds live in parallel arrays. New keys collect in a
+  small sorted buffer and are merged in bulk with slice copies, not
+  inserted one by one. Inside an event loop the merge builds new arrays
+  in a worker thread and swaps them in when done. Until then the old
+  arrays and the batch being merged stay readable and are not written to.
+  Hits on their keys are deferred and applied after the swap.
+- Every block of ``BLOCK_SIZE`` keys keeps its maximum weight. A long run
+  is answered by picking its heaviest blocks first and then scanning only
+  those, so the cost depends on ``limit`` rather than on the run length.
+  Broad prefixes are also cached for ``top_ttl`` seconds.
+- A query only becomes a suggestion once ``min_query_hits`` different users
+  have searched for it, so one user's searches are never shown to anyone
+  else. Until then it waits in a bounded probation set, with hashed user
+  IDs, and takes no space in the index. Titles come from Spotify's catalog
+  and are indexed at once.
+- Each user counts once per query: the last ``max_searches`` (user, query)
+  pairs are remembered, and repeats of them (refreshes, the same query on
+  another search route) add no weight.
+- The index is capped at ``max_entries``. A merge that crosses the cap
+  drops the lightest entries down to 90% of it.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from itertools import compress
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from library_index import tokenize
+
+KIND_QUERY, KIND_TRACK, KIND_ARTIST, KIND_ALBUM, KIND_PLAYLIST = range(5)
+KIND_NAMES = ("query", "track", "artist", "album", "playlist")
+_RESULT_KINDS = {"tracks": KIND_TRACK, "artists": KIND_ARTIST, "albums": KIND_ALBUM, "playlists": KIND_PLAYLIST}
+
+MAX_KEY_LENGTH = 100
+BLOCK_SIZE = 32
+# Above every character a normalized key can contain
+_PREFIX_END = "\x7f"
+# Forward-decay exponent after which weights are rescaled, well inside float range
+_REBASE_EXPONENT = 64
+_MAX_CACHED_PREFIXES = 4096
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join(tokenize(text))
+
+
+def _user_digest(user_id: str) -> bytes:
+    return hashlib.blake2b(user_id.encode(), digest_size=8).digest()
+
+
+def _largest(values: array, ranges: Sequence[Tuple[int, int]], limit: int) -> List[int]:
+    """Positions of the ``limit`` largest values within ``ranges``, largest first.
+
+    Sorting and ``list.index`` run in C, so only ``limit`` steps happen in
+    Python however long the ranges are.
+    """
+    chunk: List[float] = []
+    offsets: List[int] = []
+    starts: List[int] = []
+    for start, stop in ranges:
+        if start < stop:
+            offsets.append(len(chunk))
+            starts.append(start)
+            chunk += values[start:stop].tolist()
+    positions = []
+    found = -1
+    previous = None
+    for value in sorted(chunk, reverse=True)[:limit]:
+        # Equal values are found left to right
+        found = chunk.index(value, found + 1 if value == previous else 0)
+        previous = value
+        i = bisect.bisect_right(offsets, found) - 1
+        positions.append(starts[i] + found - offsets[i])
+    return positions
+
+
+def _prune(keys: List[str], weights: array, kinds: bytearray, texts: List[Optional[str]], keep: int) -> tuple:
+    """The ``keep`` heaviest entries of the parallel arrays, still in key order."""
+    ordered = sorted(weights)
+    cutoff = ordered[len(ordered) - keep]
+    # Entries weighing exactly the cutoff that still fit under ``keep``
+    ties = keep - (len(ordered) - bisect.bisect_right(ordered, cutoff))
+    mask = []
+    for weight in weights:
+        if weight == cutoff and ties > 0:
+            ties -= 1
+            mask.append(True)
+        else:
+            mask.append(weight > cutoff)
+    return (
+        list(compress(keys, mask)),
+        array("d", compress(weights, mask)),
+        bytearray(compress(kinds, mask)),
+        list(compress(texts, mask)),
+    )
+
+
+class SuggestionIndex:
+    def __init__(
+        self,
+        max_entries: int = 200_000,
+        half_life: float = 86400.0,
+        min_query_hits: int = 2,
+        max_candidates: int = 50_000,
+        max_searches: int = 200_000,
+        title_weight: float = 0.25,
+        merge_threshold: int = 4096,
+        scan_limit: int = 128,
+        max_limit: int = 20,
+        top_ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.half_life = half_life
+        self.min_query_hits = min_query_hits
+        self.max_candidates = max_candidates
+        self.max_searches = max_searches
+        self.title_weight = title_weight
+        self.merge_threshold = merge_threshold
+        self.scan_limit = max(scan_limit, 2 * BLOCK_SIZE)
+        self.max_limit = max_limit
+        self.top_ttl = top_ttl
+        self._clock = clock
+        self._epoch = clock()
+        self._keys: List[str] = []
+        self._weights = array("d")
+        self._block_max = array("d")
+        self._kinds = bytearray()
+        # Display text, or None when it is the key itself
+        self._texts: List[Optional[str]] = []
+        # Keys not merged yet: sorted list plus key -> [weight, kind, text]
+        self._pending_keys: List[str] = []
+        self._pending: Dict[str, list] = {}
+        # Batch being merged in the background, and hits on merging keys to apply after the swap
+        self._merging: Optional[Tuple[List[str], Dict[str, list]]] = None
+        self._merge_task: Optional[asyncio.Task] = None
+        self._deferred: Dict[str, list] = {}
+        # Queries below min_query_hits users, oldest first: key -> [weight, {user digest}]
+        self._candidates: "OrderedDict[str, list]" = OrderedDict()
+        # Recent (user digest, key) searches, oldest first
+        self._searches: "OrderedDict[Tuple[bytes, str], None]" = OrderedDict()
+        # (broad prefix, limit) -> suggestions, refreshed every top_ttl
+        self._top: Dict[Tuple[str, int], List[Dict[str, str]]] = {}
+        self._top_expires = self._epoch + top_ttl
+        self.merges = 0
+        self.pruned = 0
+        self.lookups = 0
+
+    def __len__(self) -> int:
+        merging = len(self._merging[1]) if self._merging is not None else 0
+        return len(self._keys) + merging + len(self._pending)
+
+    def _boost(self) -> float:
+        exponent = (self._clock() - self._epoch) / self.half_life
+        # Not while a merge reads the arrays; the exponent has plenty of headroom
+        if exponent > _REBASE_EXPONENT and self._merging is None:
+            self._rebase()
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def _rebase(self) -> None:
+        now = self._clock()
+        factor = 2.0 ** (-(now - self._epoch) / self.half_life)
+        self._weights = array("d", [weight * factor for weight in self._weights])
+        self._block_max = array("d", [weight * factor for weight in self._block_max])
+        for entry in self._pending.values():
+            entry[0] *= factor
+        for entry in self._candidates.values():
+            entry[0] *= factor
+        self._top = {}
+        self._epoch = now
+
+    def record_search(self, text: Optional[str], user_id: str) -> None:
+        """A search by ``user_id``; repeats of a remembered (user, query) pair are ignored."""
+        key = normalize(text)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return
+        user = _user_digest(user_id)
+        search = (user, key)
+        if search in self._searches:
+            return
+        self._searches[search] = None
+        if len(self._searches) > self.max_searches:
+            self._searches.popitem(last=False)
+        self._add(key, KIND_QUERY, self._boost(), None, user)
+
+    def record(self, text: Optional[str], kind: int, weight: float = 1.0) -> None:
+        """A catalog title; queries go through ``record_search``."""
+        key = normalize(text)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return
+        display = text.strip() if kind != KIND_QUERY and text.strip() != key else None
+        self._add(key, kind, weight * self._boost(), display)
+
+    def _add(self, key: str, kind: int, boost: float, display: Optional[str], user: Optional[bytes] = None) -> None:
+        keys = self._keys
+        pos = bisect.bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            if self._merging is not None:
+                self._defer(key, kind, boost, display)
+            else:
+                self._bump(pos, kind, boost, display)
+            return
+        if self._merging is not None and key in self._merging[1]:
+            self._defer(key, kind, boost, display)
+            return
+
+        if key not in self._pending:
+            candidate = self._candidates.pop(key, None)
+            if candidate is not None:
+                boost += candidate[0]
+            if kind == KIND_QUERY:
+                users = candidate[1] if candidate is not None else set()
+                if user is not None:
+                    users.add(user)
+                if len(users) < self.min_query_hits:
+                    # Re-inserted at the end, so recent searches are evicted last
+                    self._candidates[key] = [boost, users]
+                    if len(self._candidates) > self.max_candidates:
+                        self._candidates.popitem(last=False)
+                    return
+        self._bump_pending(key, kind, boost, display)
+        if len(self._pending) >= self.merge_threshold and self._merging is None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                self.merge()
+            else:
+                self._merge_task = asyncio.create_task(self._merge_in_background(self._begin_merge()))
+
+    def _bump(self, pos: int, kind: int, boost: float, display: Optional[str]) -> None:
+        weight = self._weights[pos] + boost
+        self._weights[pos] = weight
+        block = pos // BLOCK_SIZE
+        if weight > self._block_max[block]:
+            self._block_max[block] = weight
+        if kind != KIND_QUERY and self._kinds[pos] == KIND_QUERY:
+            self._kinds[pos] = kind
+            self._texts[pos] = display
+
+    def _bump_pending(self, key: str, kind: int, boost: float, display: Optional[str]) -> None:
+        entry = self._pending.get(key)
+        if entry is None:
+            bisect.insort(self._pending_keys, key)
+            entry = self._pending[key] = [0.0, kind, display]
+        entry[0] += boost
+        if kind != KIND_QUERY and entry[1] == KIND_QUERY:
+            entry[1] = kind
+            entry[2] = display
+
+    def _defer(self, key: str, kind: int, boost: float, display: Optional[str]) -> None:
+        entry = self._deferred.get(key)
+        if entry is None:
+            entry = self._deferred[key] = [0.0, kind, display]
+        entry[0] += boost
+        if kind != KIND_QUERY and entry[1] == KIND_QUERY:
+            entry[1] = kind
+            entry[2] = display
+
+    def record_results(self, results: Dict[str, Any]) -> None:
+        """Names from a Spotify search payload, at ``title_weight`` each."""
+        for field, kind in _RESULT_KINDS.items():
+            for item in (results.get(field) or {}).get("items") or []:
+                if item:
+                    self.record(item.get("name"), kind, self.title_weight)
+                    if kind == KIND_TRACK:
+                        for artist in item.get("artists") or []:
+                            self.record(artist.get("name"), KIND_ARTIST, self.title_weight)
+
+    def merge(self) -> None:
+        """Fold the pending keys into the sorted arrays, blocking until done."""
+        if not self._pending or self._merging is not None:
+            return
+        batch = self._begin_merge()
+        self._finish_merge(self._build(batch))
+
+    async def _merge_in_background(self, batch: Tuple[List[str], Dict[str, list]]) -> None:
+        try:
+            built = await asyncio.to_thread(self._build, batch)
+        except BaseException:
+            # Nothing was swapped in: the batch goes back to pending
+            self._merging = None
+            for key in batch[0]:
+                weight, kind, display = batch[1][key]
+                self._bump_pending(key, kind, weight, display)
+            self._apply_deferred()
+            raise
+        self._finish_merge(built)
+
+    def _begin_merge(self) -> Tuple[List[str], Dict[str, list]]:
+        batch = self._merging = (self._pending_keys, self._pending)
+        self._pending_keys = []
+        self._pending = {}
+        return batch
+
+    def _build(self, batch: Tuple[List[str], Dict[str, list]]) -> tuple:
+        """New arrays from the current ones plus ``batch``; reads shared state, writes none of it."""
+        pending_keys, pending = batch
+        old_keys, old_weights, old_kinds, old_texts = self._keys, self._weights, self._kinds, self._texts
+        keys: List[str] = []
+        weights = array("d")
+        kinds = bytearray()
+        texts: List[Optional[str]] = []
+        start = 0
+        for key in pending_keys:
+            pos = bisect.bisect_left(old_keys, key, start)
+            keys += old_keys[start:pos]
+            weights += old_weights[start:pos]
+            kinds += old_kinds[start:pos]
+            texts += old_texts[start:pos]
+            weight, kind, display = pending[key]
+            keys.append(key)
+            weights.append(weight)
+            kinds.append(kind)
+            texts.append(display)
+            start = pos
+        keys += old_keys[start:]
+        weights += old_weights[start:]
+        kinds += old_kinds[start:]
+        texts += old_texts[start:]
+
+        pruned = 0
+        if len(keys) > self.max_entries:
+            before = len(keys)
+            keys, weights, kinds, texts = _prune(keys, weights, kinds, texts, int(self.max_entries * 0.9))
+            pruned = before - len(keys)
+        block_max = array("d", [max(weights[i:i + BLOCK_SIZE]) for i in range(0, len(weights), BLOCK_SIZE)])
+        return keys, weights, kinds, texts, block_max, pruned
+
+    def _finish_merge(self, built: tuple) -> None:
+        self._keys, self._weights, self._kinds, self._texts, self._block_max, pruned = built
+        self._merging = None
+        self.merges += 1
+        self.pruned += pruned
+        self._apply_deferred()
+
+    def _apply_deferred(self) -> None:
+        deferred, self._deferred = self._deferred, {}
+        keys = self._keys
+        for key, (boost, kind, display) in deferred.items():
+            pos = bisect.bisect_left(keys, key)
+            if pos < len(keys) and keys[pos] == key:
+                self._bump(pos, kind, boost, display)
+            else:
+                # Pruned by the merge, but hit since: it starts over as a new key
+                self._bump_pending(key, kind, boost, display)
+
+    def _heaviest(self, lo: int, hi: int, limit: int) -> List[int]:
+        if hi - lo <= self.scan_limit:
+            return _largest(self._weights, [(lo, hi)], limit)
+        # Each of the top ``limit`` entries sits in a block whose maximum is
+        # at least its weight, so only the ``limit`` heaviest whole blocks and
+        # the partial blocks at either end can hold them.
+        first = -(-lo // BLOCK_SIZE)
+        last = hi // BLOCK_SIZE
+        ranges = [(lo, first * BLOCK_SIZE), (last * BLOCK_SIZE, hi)]
+        for block in _largest(self._block_max, [(first, last)], limit):
+            ranges.append((block * BLOCK_SIZE, (block + 1) * BLOCK_SIZE))
+        return _largest(self._weights, ranges, limit)
+
+    def _suggestions(self, key: str, limit: int) -> List[Dict[str, str]]:
+        end = key + _PREFIX_END
+        keys = self._keys
+        lo = bisect.bisect_left(keys, key)
+        hi = bisect.bisect_left(keys, end, lo)
+        weights, kinds, texts = self._weights, self._kinds, self._texts
+        candidates = [(weights[i], keys[i], kinds[i], texts[i]) for i in self._heaviest(lo, hi, limit)]
+
+        batches = [(self._pending_keys, self._pending)]
+        if self._merging is not None:
+            batches.append(self._merging)
+        for pending_keys, pending in batches:
+            plo = bisect.bisect_left(pending_keys, key)
+            phi = bisect.bisect_left(pending_keys, end, plo)
+            for pending_key in pending_keys[plo:phi]:
+                weight, kind, display = pending[pending_key]
+                candidates.append((weight, pending_key, kind, display))
+        candidates.sort(reverse=True)
+        return [{"text": display or key, "kind": KIND_NAMES[kind]} for _, key, kind, display in candidates[:limit]]
+
+    def _is_broad(self, key: str) -> bool:
+        keys = self._keys
+        lo = bisect.bisect_left(keys, key)
+        return lo + self.scan_limit < len(keys) and keys[lo + self.scan_limit].startswith(key)
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, str]]:
+        self.lookups += 1
+        key = normalize(prefix)
+        if not key:
+            return []
+        limit = min(limit, self.max_limit)
+        if self._is_broad(key):
+            now = self._clock()
+            if now >= self._top_expires or len(self._top) >= _MAX_CACHED_PREFIXES:
+                # New and pruned entries show up within top_ttl
+                self._top = {}
+                self._top_expires = now + self.top_ttl
+            suggestions = self._top.get((key, limit))
+            if suggestions is None:
+                suggestions = self._top[key, limit] = self._suggestions(key, limit)
+            return suggestions
+        return self._suggestions(key, limit)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._keys),
+            "pending": len(self._pending),
+            "merging": len(self._merging[1]) if self._merging is not None else 0,
+            "candidates": len(self._candidates),
+            "remembered_searches": len(self._searches),
+            "max_entries": self.max_entries,
+            "cached_prefixes": len(self._top),
+            "merges": self.merges,
+            "pruned": self.pruned,
+            "lookups": self.lookups,
+        }
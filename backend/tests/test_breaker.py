@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, BreakerSet, CircuitBreaker, endpoint_group
+from spotify_client import CircuitOpenError, SpotifyAPIError, _send
+
+
+def test_breaker_opens_at_the_failure_rate_and_refuses_calls():
+    breaker = CircuitBreaker("search", failure_rate=0.5, min_calls=4, open_seconds=60)
+    for failed in (False, True, False):
+        assert breaker.allow()
+        breaker.record(failed, 0.01)
+    assert breaker.state == CLOSED
+
+    breaker.allow()
+    breaker.record(True, 0.01)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+    assert 59 < breaker.retry_in() <= 60
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("player", min_calls=1, open_seconds=0.01, half_open_calls=1)
+    breaker.allow()
+    breaker.record(True, 0.01)
+    time.sleep(0.02)
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record(True, 0.01)
+    assert (breaker.state, breaker.opened) == (OPEN, 2)
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record(False, 0.01)
+    assert breaker.state == CLOSED
+
+
+def test_released_probe_frees_its_slot():
+    breaker = CircuitBreaker("me", min_calls=1, open_seconds=0.01)
+    breaker.allow()
+    breaker.record(True, 0.01)
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("catalog", min_calls=2, slow_call_seconds=0.5)
+    for _ in range(2):
+        breaker.allow()
+        breaker.record(False, 0.6)
+    assert breaker.state == OPEN
+    assert breaker.slow_calls == 2
+
+
+def test_old_outcomes_leave_the_window():
+    breaker = CircuitBreaker("search", min_calls=2, window=0.01)
+    breaker.allow()
+    breaker.record(True, 0.01)
+    time.sleep(0.02)
+    breaker.allow()
+    breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("path, group", [
+    ("/search", "search"),
+    ("/me", "me"),
+    ("/me/player/devices", "player"),
+    ("/me/tracks", "library"),
+    ("/me/playlists", "library"),
+    ("/tracks", "catalog"),
+    ("/playlists/abc/tracks", "catalog"),
+])
+def test_endpoint_groups(path, group):
+    assert endpoint_group(path) == group
+
+
+def slow_send(seconds, status=204):
+    async def send():
+        await asyncio.sleep(seconds)
+        return httpx.Response(status)
+    return send
+
+
+def test_slow_reads_are_abandoned_but_slow_writes_are_not():
+    async def main():
+        breakers = BreakerSet(slow_call_seconds=0.05)
+        response = await _send(breakers, "player", "u", slow_send(0.1))
+        assert response.status_code == 204
+
+        with pytest.raises(SpotifyAPIError) as raised:
+            await _send(breakers, "player", "u", slow_send(0.1), idempotent=True)
+        assert raised.value.http_status == 504
+        assert breakers.get("player").slow_calls == 2
+
+    asyncio.run(main())
+
+
+def test_open_breaker_refuses_before_pacing():
+    async def main():
+        breakers = BreakerSet(min_calls=1, open_seconds=60)
+        await _send(breakers, "search", "u", slow_send(0, status=503))
+        paced = []
+
+        async def acquire():
+            paced.append(True)
+
+        with pytest.raises(CircuitOpenError):
+            await _send(breakers, "search", "u", slow_send(0), acquire)
+        assert paced == []
+        assert breakers.is_open("search")
+        assert not breakers.is_open("player")
+
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from cache import TTLCache
+
+
+class Upstream:
+    """Fetch function that counts calls and can be made to fail."""
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return {"n": self.calls}
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def main():
+        cache, upstream = TTLCache(ttl=60, max_bytes=1 << 20), Upstream()
+        results = await asyncio.gather(*(cache.get_or_fetch("k", upstream.fetch) for _ in range(10)))
+
+        assert upstream.calls == 1
+        assert results == [{"n": 1}] * 10
+        assert (cache.misses, cache.coalesced) == (1, 9)
+        assert await cache.get_or_fetch("k", upstream.fetch) == {"n": 1}
+        assert cache.hits == 1
+
+    asyncio.run(main())
+
+
+def test_failed_fetch_reaches_every_waiter_and_is_not_cached():
+    async def main():
+        cache, upstream = TTLCache(ttl=60, max_bytes=1 << 20), Upstream()
+        upstream.error = RuntimeError("down")
+        results = await asyncio.gather(
+            *(cache.get_or_fetch("k", upstream.fetch) for _ in range(3)), return_exceptions=True
+        )
+        assert upstream.calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        upstream.error = None
+        assert await cache.get_or_fetch("k", upstream.fetch) == {"n": 2}
+
+    asyncio.run(main())
+
+
+def test_outage_serves_stale_entry_and_refreshes_it_in_the_background():
+    async def main():
+        cache, upstream = TTLCache(ttl=0.05, max_bytes=1 << 20, stale_ttl=60), Upstream()
+        await cache.get_or_fetch_stale("k", upstream.fetch, lambda e: True)
+        await asyncio.sleep(0.06)
+
+        upstream.error = RuntimeError("down")
+        value, stale = await cache.get_or_fetch_stale("k", upstream.fetch, lambda e: True)
+        assert (value, stale) == ({"n": 1}, True)
+        assert cache.stale_served == 1
+
+        # One background refresh, which succeeds once the upstream is back
+        upstream.error = None
+        await asyncio.sleep(0.05)
+        assert upstream.calls == 3
+        assert await cache.get_or_fetch_stale("k", upstream.fetch, lambda e: True) == ({"n": 3}, False)
+
+    asyncio.run(main())
+
+
+def test_errors_not_marked_as_outages_are_raised_despite_a_stale_entry():
+    async def main():
+        cache, upstream = TTLCache(ttl=0.01, max_bytes=1 << 20, stale_ttl=60), Upstream()
+        await cache.get_or_fetch_stale("k", upstream.fetch, lambda e: True)
+        await asyncio.sleep(0.02)
+
+        upstream.error = ValueError("bad request")
+        with pytest.raises(ValueError):
+            await cache.get_or_fetch_stale("k", upstream.fetch, lambda e: not isinstance(e, ValueError))
+
+    asyncio.run(main())
+
+
+def test_open_breaker_serves_stale_without_calling_upstream():
+    async def main():
+        cache, upstream = TTLCache(ttl=0.01, max_bytes=1 << 20, stale_ttl=60), Upstream()
+        await cache.get_or_fetch_stale("k", upstream.fetch, lambda e: True)
+        await asyncio.sleep(0.02)
+
+        value, stale = await cache.get_or_fetch_stale(
+            "k", upstream.fetch, lambda e: True, refresh_in=lambda: 60, upstream_down=lambda: True
+        )
+        assert (value, stale) == ({"n": 1}, True)
+        assert upstream.calls == 1
+        assert cache.snapshot()["refreshing"] == 1
+
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import asyncio
+
+from cache import TTLCache
+from catalog import get_entities, is_spotify_id
+
+
+def spotify_id(n):
+    return f"{n:022d}"
+
+
+class FakeCatalog:
+    """Multi-ID endpoints that answer later chunks first and return null for unknown IDs."""
+
+    def __init__(self, unknown=()):
+        self.requests = []
+        self.unknown = set(unknown)
+
+    async def _lookup(self, kind, ids):
+        self.requests.append((kind, list(ids)))
+        await asyncio.sleep(0.05 / len(self.requests))
+        return {f"{kind}s": [
+            None if entity_id in self.unknown else {"id": entity_id, "name": f"{kind} {entity_id}"}
+            for entity_id in reversed(ids)
+        ]}
+
+    async def tracks(self, ids, market=None):
+        return await self._lookup("track", ids)
+
+    async def albums(self, ids, market=None):
+        return await self._lookup("album", ids)
+
+    async def artists(self, ids):
+        return await self._lookup("artist", ids)
+
+
+def test_entities_come_back_in_request_order_across_chunks():
+    async def main():
+        ids = [spotify_id(n) for n in range(120)]
+        requested = ids + [ids[3], spotify_id(999)]
+        sp = FakeCatalog(unknown={spotify_id(999)})
+
+        entities = await get_entities(TTLCache(ttl=60, max_bytes=1 << 20), sp, "track", requested)
+
+        assert [len(chunk) for _, chunk in sp.requests] == [50, 50, 21]
+        assert [entity["id"] for entity in entities[:-1]] == requested[:-1]
+        assert entities[-1] is None
+
+    asyncio.run(main())
+
+
+def test_albums_use_smaller_chunks():
+    async def main():
+        sp = FakeCatalog()
+        ids = [spotify_id(n) for n in range(45)]
+        entities = await get_entities(TTLCache(ttl=60, max_bytes=1 << 20), sp, "album", ids)
+        assert [len(chunk) for _, chunk in sp.requests] == [20, 20, 5]
+        assert [entity["id"] for entity in entities] == ids
+
+    asyncio.run(main())
+
+
+def test_overlapping_batches_only_fetch_new_ids():
+    async def main():
+        cache, sp = TTLCache(ttl=60, max_bytes=1 << 20), FakeCatalog()
+        first = [spotify_id(n) for n in range(10)]
+        second = [spotify_id(n) for n in range(5, 15)]
+        await get_entities(cache, sp, "artist", first)
+        entities = await get_entities(cache, sp, "artist", second)
+
+        assert sp.requests[-1] == ("artist", [spotify_id(n) for n in range(10, 15)])
+        assert [entity["id"] for entity in entities] == second
+
+    asyncio.run(main())
+
+
+def test_spotify_ids_are_22_base62_characters():
+    assert is_spotify_id("4uLU6hMCjMI75M1A2tKUQC")
+    assert not is_spotify_id("4uLU6hMCjMI75M1A2tKUQ")
+    assert not is_spotify_id("4uLU6hMCjMI75M1A2tKU/C")
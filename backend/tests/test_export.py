@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from export import iter_pages, ndjson_stream, track_rows
+
+
+class PagedUpstream:
+    """Pages of ``size`` items out of ``total``; later pages answer sooner."""
+
+    def __init__(self, total, size, fail_at=None, stall_from=None):
+        self.total = total
+        self.size = size
+        self.fail_at = fail_at
+        self.stall_from = stall_from
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fetched = []
+        self.cancelled = 0
+
+    async def fetch(self, offset):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            stalled = self.stall_from is not None and offset >= self.stall_from
+            await asyncio.sleep(10 if stalled else 0.02 / (1 + offset // self.size))
+            if offset == self.fail_at:
+                raise RuntimeError("upstream failed")
+            self.fetched.append(offset)
+            items = [
+                {"added_at": f"t{n}", "track": {"id": f"track{n}", "name": f"Track {n}"}}
+                for n in range(offset, min(offset + self.size, self.total))
+            ]
+            return {"total": self.total, "items": items}
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+
+def test_pages_are_yielded_in_order_within_the_window():
+    async def main():
+        upstream = PagedUpstream(total=1000, size=50)
+        offsets = [offset async for offset, _ in iter_pages(upstream.fetch, 50, window=4)]
+
+        assert offsets == list(range(0, 1000, 50))
+        assert upstream.max_in_flight == 4
+
+    asyncio.run(main())
+
+
+def test_closing_the_stream_cancels_prefetched_pages():
+    async def main():
+        upstream = PagedUpstream(total=1000, size=50, stall_from=150)
+        pages = iter_pages(upstream.fetch, 50, window=3)
+        async for offset, _ in pages:
+            if offset == 100:
+                break
+        await pages.aclose()
+        await asyncio.sleep(0.05)
+
+        assert upstream.in_flight == 0
+        assert upstream.cancelled >= 1
+        assert sorted(upstream.fetched) == [0, 50, 100]
+
+    asyncio.run(main())
+
+
+def test_ndjson_rows_are_numbered_and_a_failure_ends_with_an_error_row():
+    async def main():
+        upstream = PagedUpstream(total=120, size=50, fail_at=100)
+        chunks = [chunk async for chunk in ndjson_stream(iter_pages(upstream.fetch, 50, window=2))]
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+        assert [row["position"] for row in rows[:-1]] == list(range(100))
+        assert rows[5]["track"]["id"] == "track5"
+        assert rows[-1] == {"error": "upstream failed"}
+
+    asyncio.run(main())
+
+
+def test_track_rows_keep_removed_tracks_as_null():
+    page = {"items": [{"added_at": "t0", "track": None}, None]}
+    rows = [json.loads(line) for line in track_rows(10, page).splitlines()]
+    assert rows == [
+        {"position": 10, "added_at": "t0", "track": None},
+        {"position": 11, "added_at": None, "track": None},
+    ]
+    assert track_rows(0, {"items": []}) == b""
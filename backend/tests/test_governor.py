@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from governor import PRIORITY_BACKGROUND, PRIORITY_CONTROL, PRIORITY_READ, RateGovernor
+
+
+def test_queued_calls_are_dispatched_by_priority():
+    async def main():
+        governor = RateGovernor(app_rate=50, app_burst=1)
+        await governor.acquire()
+        order = []
+
+        async def call(priority, name):
+            await governor.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(
+            call(PRIORITY_BACKGROUND, "background"),
+            call(PRIORITY_READ, "read"),
+            call(PRIORITY_CONTROL, "control"),
+        )
+        assert order == ["control", "read", "background"]
+        assert governor.snapshot()["max_queue_depth"] == 3
+
+    asyncio.run(main())
+
+
+def test_app_bucket_paces_calls_to_its_rate():
+    async def main():
+        governor = RateGovernor(app_rate=100, app_burst=5)
+        started = time.monotonic()
+        await asyncio.gather(*(governor.acquire() for _ in range(15)))
+        # Five from the burst, then ten at 100/s
+        assert 0.09 <= time.monotonic() - started < 0.5
+        assert governor.granted == 15
+
+    asyncio.run(main())
+
+
+def test_user_bucket_slows_reads_but_not_playback_control():
+    async def main():
+        governor = RateGovernor(app_rate=1000, app_burst=1000, user_rate=10, user_burst=1)
+        await governor.acquire(PRIORITY_READ, "user-a")
+
+        started = time.monotonic()
+        await governor.acquire(PRIORITY_CONTROL, "user-a")
+        assert time.monotonic() - started < 0.05
+        # Other users have their own bucket
+        await governor.acquire(PRIORITY_READ, "user-b")
+        assert time.monotonic() - started < 0.05
+
+        await governor.acquire(PRIORITY_READ, "user-a")
+        assert time.monotonic() - started >= 0.08
+
+    asyncio.run(main())
+
+
+def test_throttle_pauses_every_caller():
+    async def main():
+        governor = RateGovernor(app_rate=1000, app_burst=1000)
+        pause = governor.record_throttle(0.1)
+        # Jitter of up to a quarter of at least one second
+        assert 0.1 <= pause <= 0.35
+
+        started = time.monotonic()
+        await asyncio.gather(governor.acquire(), governor.acquire(PRIORITY_CONTROL))
+        assert time.monotonic() - started >= 0.1
+        assert governor.throttled == 1
+
+    asyncio.run(main())
+
+
+def test_retries_are_bounded_by_count_and_wait():
+    governor = RateGovernor(max_retries=2, max_retry_wait=5)
+    assert governor.should_retry(1, 0)
+    assert governor.should_retry(1, 1)
+    assert not governor.should_retry(1, 2)
+    assert not governor.should_retry(10, 0)
+    assert governor.retries == 2
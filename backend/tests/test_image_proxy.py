@@ -0,0 +1,67 @@
+import asyncio
+import io
+import os
+
+import httpx
+from PIL import Image
+
+from image_proxy import ImageCache
+
+
+def png(size):
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 40, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def upstream(bodies, requests):
+    def handler(request):
+        requests.append(str(request.url))
+        return httpx.Response(200, content=bodies[str(request.url)], headers={"content-type": "image/png"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_cached_variant_is_served_without_refetch_or_rerender(tmp_path):
+    async def main():
+        requests = []
+        http = upstream({"http://img/a": png(64)}, requests)
+        cache = ImageCache(str(tmp_path), max_bytes=10_000_000, widths=[32], http=http)
+
+        first = await cache.get("http://img/a", 32, webp=False)
+        second = await cache.get("http://img/a", 32, webp=False)
+
+        assert requests == ["http://img/a"]
+        assert (cache.fetches, cache.renders, cache.hits) == (1, 1, 1)
+        assert first.path == second.path and second.stat.st_size == os.path.getsize(second.path)
+        await http.aclose()
+
+    asyncio.run(main())
+
+
+def test_reload_reads_refs_and_eviction_deletes_files(tmp_path):
+    async def main():
+        requests = []
+        bodies = {f"http://img/{n}": png(64 + n) for n in range(3)}
+        http = upstream(bodies, requests)
+        cache = ImageCache(str(tmp_path), max_bytes=10_000_000, widths=[32], http=http)
+        await cache.get("http://img/0", 0, webp=False)
+
+        # A restart indexes the files without their ref contents
+        reloaded = ImageCache(str(tmp_path), max_bytes=10_000_000, widths=[32], http=http)
+        await asyncio.to_thread(reloaded.load)
+        hit = await reloaded.get("http://img/0", 0, webp=False)
+        assert requests == ["http://img/0"] and reloaded.hits == 1
+        assert os.path.exists(hit.path)
+
+        # Room for one more image and its ref: the third pushes out the first
+        reloaded.max_bytes = reloaded.current_bytes + len(bodies["http://img/1"]) + 200
+        await reloaded.get("http://img/1", 0, webp=False)
+        await reloaded.get("http://img/2", 0, webp=False)
+
+        assert reloaded.evictions > 0
+        assert not os.path.exists(hit.path)
+        assert sum(len(files) for _, _, files in os.walk(tmp_path)) == len(reloaded._files)
+        await http.aclose()
+
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+import asyncio
+
+from library_index import LibraryIndex, LibraryIndexes
+
+
+def saved(track_id, name, added_at):
+    return {
+        "track": {"id": track_id, "name": name, "artists": [{"name": "Artist"}], "album": {"name": "Album"}},
+        "added_at": added_at,
+    }
+
+
+# Enough older tracks that a few tombstones do not trigger compaction
+LIBRARY = [saved(f"old{i}", f"Song {i}", "2023-01-01T00:00:00Z") for i in range(20)]
+SYNC = [saved("a", "Hello", "2024-01-01T00:00:01Z"), saved("b", "Help", "2024-01-01T00:00:01Z")]
+
+
+def test_second_identical_sync_leaves_no_tombstones():
+    index = LibraryIndex()
+    index.add_many(LIBRARY + SYNC)
+    index.add_many(SYNC)
+    assert index.dead == 0
+    assert len(index) == 22
+    assert index.search("hel")["total"] == 2
+
+
+def test_changed_track_replaces_the_old_copy():
+    index = LibraryIndex()
+    index.add_many(SYNC)
+    index.add_many([saved("a", "Goodbye", "2024-01-01T00:00:01Z")])
+    assert len(index) == 2
+    assert [item["track"]["id"] for item in index.search("hel")["items"]] == ["b"]
+    assert [item["track"]["id"] for item in index.search("goodbye")["items"]] == ["a"]
+
+
+def test_sync_hook_with_unchanged_ties_keeps_index_clean():
+    async def load_tracks(user_id):
+        return LIBRARY + SYNC
+
+    indexes = LibraryIndexes(load_tracks)
+    index = asyncio.run(indexes.get("user"))
+    # Incremental syncs pass new documents newest first
+    indexes.on_saved_tracks("user", list(reversed(SYNC)), rebuilt=False)
+    assert index.dead == 0
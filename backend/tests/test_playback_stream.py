@@ -0,0 +1,25 @@
+import time
+
+from playback_stream import StreamTickets
+
+
+def test_stream_ticket_is_single_use():
+    tickets = StreamTickets("secret")
+    ticket = tickets.issue("session-1", "user-1")
+
+    assert tickets.redeem(ticket) == ("session-1", "user-1")
+    assert tickets.redeem(ticket) is None
+
+
+def test_stream_ticket_rejects_other_secrets_and_expiry():
+    ticket = StreamTickets("secret").issue("session-1", "user-1")
+    assert StreamTickets("other-secret").redeem(ticket) is None
+    # Another worker with the same secret accepts it
+    assert StreamTickets("secret").redeem(ticket) == ("session-1", "user-1")
+
+    expired = StreamTickets("secret", ttl=-1)
+    assert expired.redeem(expired.issue("session-1", "user-1")) is None
+
+    body, _, signature = StreamTickets("secret").issue("session-1", "user-1").partition(".")
+    assert StreamTickets("secret").redeem(f"{body}x.{signature}") is None
+    assert StreamTickets("secret").redeem("not-a-ticket") is None
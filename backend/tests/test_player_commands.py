@@ -0,0 +1,122 @@
+import asyncio
+import re
+
+import pytest
+
+from player_commands import play_arguments, run_commands, validate_commands
+from spotify_client import SpotifyAPIError
+
+
+class FakePlayer:
+    """Records the order in which calls start and finish; ``fail`` names ops that 404."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.events = []
+
+    async def _call(self, op, *args, device_id=None):
+        self.events.append(("start", op, args, device_id))
+        await asyncio.sleep(0.01)
+        self.events.append(("end", op, args, device_id))
+        if op in self.fail:
+            raise SpotifyAPIError(404, "No active device")
+
+    async def start_playback(self, device_id=None, **kwargs):
+        await self._call("play", kwargs.get("context_uri"), device_id=device_id)
+
+    async def pause_playback(self, device_id=None):
+        await self._call("pause", device_id=device_id)
+
+    async def next_track(self, device_id=None):
+        await self._call("next", device_id=device_id)
+
+    async def previous_track(self, device_id=None):
+        await self._call("previous", device_id=device_id)
+
+    async def transfer_playback(self, device_id, force_play=False):
+        await self._call("transfer", device_id=device_id)
+
+    async def add_to_queue(self, uri, device_id=None):
+        await self._call("queue", uri, device_id=device_id)
+
+    async def seek_track(self, position_ms, device_id=None):
+        await self._call("seek", position_ms, device_id=device_id)
+
+    async def volume(self, volume_percent, device_id=None):
+        await self._call("volume", volume_percent, device_id=device_id)
+
+
+def run(sp, commands, **kwargs):
+    return asyncio.run(run_commands(sp, validate_commands(commands, 50), **kwargs))
+
+
+def test_only_the_last_setting_between_barriers_is_sent():
+    sp = FakePlayer()
+    results = run(sp, [
+        {"op": "seek", "position_ms": 1000},
+        {"op": "volume", "volume_percent": 10},
+        {"op": "seek", "position_ms": 2000},
+        {"op": "pause"},
+        {"op": "seek", "position_ms": 3000},
+    ])
+
+    assert [r["status"] for r in results] == ["superseded", "ok", "ok", "ok", "ok"]
+    sent = [(op, args) for kind, op, args, _ in sp.events if kind == "start"]
+    assert ("seek", (1000,)) not in sent
+    assert sent[-2:] == [("pause", ()), ("seek", (3000,))]
+
+
+def test_queue_keeps_its_order_and_barriers_wait_for_everything_before_them():
+    sp = FakePlayer()
+    run(sp, [
+        {"op": "queue", "uri": "spotify:track:a"},
+        {"op": "volume", "volume_percent": 50},
+        {"op": "queue", "uri": "spotify:track:b"},
+        {"op": "next"},
+    ])
+
+    queued = [args[0] for kind, op, args, _ in sp.events if kind == "start" and op == "queue"]
+    assert queued == ["spotify:track:a", "spotify:track:b"]
+    # Volume runs alongside the first queue call rather than after the chain
+    assert [op for _, op, _, _ in sp.events[:2]] == ["queue", "volume"]
+    assert sp.events[-2][:2] == ("start", "next")
+
+
+def test_transfer_retargets_later_commands():
+    sp = FakePlayer()
+    run(sp, [{"op": "pause"}, {"op": "transfer", "device_id": "kitchen"}, {"op": "pause"}], device_id="desk")
+    devices = [(op, device) for kind, op, _, device in sp.events if kind == "start"]
+    assert devices == [("pause", "desk"), ("transfer", "kitchen"), ("pause", "kitchen")]
+
+
+def test_a_failure_skips_the_rest_unless_asked_to_continue():
+    commands = [{"op": "pause"}, {"op": "next"}, {"op": "queue", "uri": "spotify:track:a"}]
+    results = run(FakePlayer(fail={"pause"}), commands)
+    assert [r["status"] for r in results] == ["error", "skipped", "skipped"]
+    assert results[0]["http_status"] == 404
+
+    results = run(FakePlayer(fail={"pause"}), commands, stop_on_error=False)
+    assert [r["status"] for r in results] == ["error", "ok", "ok"]
+
+
+@pytest.mark.parametrize("commands, message", [
+    ([], "non-empty list"),
+    ([{"op": "rewind"}], "commands[0]: op must be one of"),
+    ([{"op": "pause"}, {"op": "volume", "volume_percent": 101}], "commands[1]: volume needs"),
+    ([{"op": "queue"}], "queue needs a uri"),
+    ([{"op": "play", "context_uri": "spotify:album:x", "uris": ["spotify:track:a"]}], "not both"),
+    ([{"op": "pause"}] * 51, "At most 50"),
+])
+def test_invalid_commands_are_rejected_with_their_index(commands, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        validate_commands(commands, 50)
+
+
+def test_play_arguments_accept_offsets_as_position_or_uri():
+    assert play_arguments({"context_uri": "spotify:album:x", "offset": 3})["offset"] == {"position": 3}
+    assert play_arguments({"uris": ["spotify:track:a"], "offset": "spotify:track:a"})["offset"] == {
+        "uri": "spotify:track:a"
+    }
+    assert play_arguments({"track_uri": "spotify:track:a"})["uris"] == ["spotify:track:a"]
+    with pytest.raises(ValueError):
+        play_arguments({"offset": 1})
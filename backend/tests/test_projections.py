@@ -0,0 +1,47 @@
+import pytest
+from fastapi import HTTPException
+
+from projections import parse_fields, project
+from responses import field_spec
+
+
+def test_nested_and_dotted_fields_parse_to_one_spec():
+    assert parse_fields("tracks.items(name, uri, album(name)),tracks.total") == {
+        "tracks": {"items": {"name": None, "uri": None, "album": {"name": None}}, "total": None}
+    }
+    # A whole subtree wins over a narrower selection of it
+    assert parse_fields("album(name),album") == {"album": None}
+
+
+def test_projection_keeps_only_selected_fields_in_lists_and_objects():
+    payload = {
+        "tracks": {
+            "items": [
+                {"name": "A", "uri": "u:a", "popularity": 5, "album": {"name": "X", "images": []}},
+                {"name": "B", "uri": "u:b", "album": None},
+            ],
+            "total": 2,
+            "next": None,
+        },
+        "artists": {},
+    }
+    spec = parse_fields("tracks.items(name,album(name)),tracks.total,missing")
+    assert project(payload, spec) == {
+        "tracks": {"items": [{"name": "A", "album": {"name": "X"}}, {"name": "B", "album": None}], "total": 2}
+    }
+    assert project(payload, None) is payload
+
+
+@pytest.mark.parametrize("fields", ["name,", "a(b", "a)b", "a..b", "(name)"])
+def test_malformed_fields_are_a_400(fields):
+    with pytest.raises(ValueError):
+        parse_fields(fields)
+    with pytest.raises(HTTPException) as raised:
+        field_spec(fields)
+    assert raised.value.status_code == 400
+    assert raised.value.detail.startswith("Invalid fields:")
+
+
+def test_missing_fields_parameter_selects_everything():
+    assert field_spec(None) is None
+    assert field_spec("") is None
@@ -0,0 +1,49 @@
+from starlette.requests import Request
+
+from metrics import conditional_responses
+from projections import parse_fields
+from responses import conditional_response, etag_for, etag_matches
+
+
+def request_with(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def test_etag_matching_is_weak_and_accepts_lists_and_wildcards():
+    etag = etag_for(b"{}")
+    opaque = etag.removeprefix("W/")
+    assert etag.startswith('W/"')
+    assert etag_matches(etag, etag)
+    assert etag_matches(opaque, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(" * ", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+
+def test_unchanged_content_gets_an_empty_304_with_the_same_tag():
+    content = {"is_playing": True, "item": {"name": "A", "uri": "u:a"}}
+    full = conditional_response(request_with(), "/test", content)
+    assert full.status_code == 200
+    assert full.headers["Cache-Control"] == "private, no-cache"
+
+    not_modified = conditional_response(request_with(full.headers["ETag"]), "/test", content)
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+    assert not_modified.headers["ETag"] == full.headers["ETag"]
+    assert conditional_responses.values[("/test", "not_modified")] == 1
+
+
+def test_changed_content_or_projection_changes_the_tag():
+    content = {"is_playing": True, "item": {"name": "A", "uri": "u:a"}}
+    etag = conditional_response(request_with(), "/test", content).headers["ETag"]
+
+    changed = conditional_response(request_with(etag), "/test", {**content, "is_playing": False})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+    projected = conditional_response(request_with(etag), "/test", content, parse_fields("item(name)"))
+    assert projected.status_code == 200
+    assert projected.body == b'{"item":{"name":"A"}}'
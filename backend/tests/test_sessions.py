@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import time
+
+from auth import hash_token
+from sessions import SessionStore
+from token_store import TokenStore
+
+
+class MemoryTokenStore(TokenStore):
+    """The MongoTokenStore contract over a dict, shared by several SessionStores."""
+
+    def __init__(self):
+        self.records = {}
+
+    async def claim_refresh(self, session_id, refresh_hash, lease_seconds):
+        doc = self.records.get(session_id)
+        if doc is None or doc["refresh_hash"] != refresh_hash or doc.get("lease", 0) > time.time():
+            return False
+        doc["lease"] = time.time() + lease_seconds
+        return True
+
+    async def load(self, session_id):
+        doc = self.records.get(session_id)
+        return dict(doc["record"]) if doc else None
+
+    async def find(self, refresh_hash):
+        for doc in self.records.values():
+            if doc["refresh_hash"] == refresh_hash:
+                return dict(doc["record"])
+        return None
+
+    async def save(self, record, refresh_hash, expected_hash=None):
+        doc = self.records.get(record["session_id"])
+        if expected_hash is not None and (doc is None or doc["refresh_hash"] != expected_hash):
+            return False
+        self.records[record["session_id"]] = {"record": dict(record), "refresh_hash": refresh_hash}
+        return True
+
+    async def delete(self, session_id):
+        self.records.pop(session_id, None)
+
+
+class RotatingOAuth:
+    """Accounts service that rotates the refresh token on every exchange."""
+
+    def __init__(self):
+        self.counter = itertools.count(1)
+        self.exchanges = []
+
+    async def refresh_access_token(self, refresh_token):
+        self.exchanges.append(refresh_token)
+        await asyncio.sleep(0.05)
+        n = next(self.counter)
+        return {"access_token": f"access-{n}", "refresh_token": f"refresh-{n}", "expires_at": time.time() + 3600}
+
+
+def test_workers_sharing_a_store_refresh_each_session_once():
+    async def main():
+        store, oauth = MemoryTokenStore(), RotatingOAuth()
+        workers = [SessionStore(lambda: oauth, token_store=store, refresh_lease=2.0) for _ in range(3)]
+        session = await workers[0].create(
+            {"access_token": "access-0", "refresh_token": "refresh-0", "expires_at": time.time() + 60}
+        )
+        for worker in workers[1:]:
+            await worker.get(session.session_id)
+
+        await asyncio.gather(*(worker.refresh_due() for worker in workers))
+
+        assert oauth.exchanges == ["refresh-0"]
+        stored = store.records[session.session_id]
+        assert stored["refresh_hash"] == hash_token("refresh-1")
+        for worker in workers:
+            current = await worker.get(session.session_id)
+            assert (current.access_token, current.refresh_token) == ("access-1", "refresh-1")
+        assert sum(worker.adopted_refreshes for worker in workers) == 2
+
+    asyncio.run(main())
+
+
+def test_stale_refresh_does_not_overwrite_a_newer_rotation():
+    async def main():
+        store = MemoryTokenStore()
+        newer = {}
+
+        class RacingOAuth(RotatingOAuth):
+            async def refresh_access_token(self, refresh_token):
+                # Meanwhile another worker, past this one's lease, stores a newer rotation
+                store.records[newer["session_id"]] = {"record": newer, "refresh_hash": hash_token("refresh-9")}
+                return await super().refresh_access_token(refresh_token)
+
+        worker = SessionStore(lambda: RacingOAuth(), token_store=store)
+        session = await worker.create(
+            {"access_token": "access-0", "refresh_token": "refresh-0", "expires_at": time.time() + 60}
+        )
+        newer.update(session.record(), access_token="access-9", refresh_token="refresh-9")
+
+        await worker.refresh("refresh-0")
+
+        assert store.records[session.session_id]["refresh_hash"] == hash_token("refresh-9")
+        assert worker.refresh_conflicts == 1
+
+    asyncio.run(main())
+
+
+def test_request_stops_waiting_on_a_stalled_lease_holder():
+    async def main():
+        store, oauth = MemoryTokenStore(), RotatingOAuth()
+        worker = SessionStore(lambda: oauth, token_store=store, refresh_lease=15.0, adopt_wait=0.2)
+        session = await worker.create(
+            {"access_token": "access-0", "refresh_token": "refresh-0", "expires_at": time.time() - 1}
+        )
+        # Another worker took the lease and never stored a result
+        store.records[session.session_id]["lease"] = time.time() + 15
+
+        started = time.monotonic()
+        current = await worker.current_token(session)
+
+        assert time.monotonic() - started < 1.0
+        assert oauth.exchanges == ["refresh-0"]
+        assert current.access_token == "access-1"
+        assert store.records[session.session_id]["refresh_hash"] == hash_token("refresh-1")
+
+    asyncio.run(main())
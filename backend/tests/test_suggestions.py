@@ -0,0 +1,58 @@
+import asyncio
+
+from suggestions import KIND_TRACK, SuggestionIndex
+
+
+def test_one_users_repeated_searches_are_never_published():
+    index = SuggestionIndex(min_query_hits=2)
+    for _ in range(50):
+        index.record_search("hello from me", "user-a")
+    index.merge()
+    assert index.suggest("hello") == []
+
+
+def test_query_is_published_once_enough_users_search_it():
+    index = SuggestionIndex(min_query_hits=2)
+    index.record_search("hello world", "user-a")
+    assert index.suggest("hello") == []
+    index.record_search("Hello  World", "user-b")
+    assert index.suggest("hello") == [{"text": "hello world", "kind": "query"}]
+
+
+def test_repeated_searches_add_no_weight():
+    index = SuggestionIndex(min_query_hits=2)
+    for user in ("user-a", "user-b"):
+        index.record_search("alpha", user)
+        index.record_search("alpine", user)
+    for _ in range(10):
+        index.record_search("alpine", "user-a")
+    index.record_search("alpha", "user-c")
+    assert [s["text"] for s in index.suggest("alp")] == ["alpha", "alpine"]
+
+
+def test_titles_are_indexed_at_once():
+    index = SuggestionIndex(min_query_hits=2)
+    index.record("Hello Again", KIND_TRACK)
+    assert index.suggest("hello") == [{"text": "Hello Again", "kind": "track"}]
+
+
+def test_background_merge_keeps_entries_visible_and_defers_hits():
+    async def main():
+        index = SuggestionIndex(merge_threshold=3, clock=lambda: 0.0)
+        index.record("Alpha", KIND_TRACK, weight=2)
+        index.record("Alpine", KIND_TRACK, weight=3)
+        index.record("Alps", KIND_TRACK, weight=0.5)
+        merge = index._merge_task
+        assert index.snapshot()["merging"] == 3
+
+        # While the batch merges it is still searchable, and hits on it wait for the swap
+        for _ in range(3):
+            index.record("Alps", KIND_TRACK)
+        index.record("Alto", KIND_TRACK)
+        assert [s["text"] for s in index.suggest("al")] == ["Alpine", "Alpha", "Alto", "Alps"]
+
+        await merge
+        assert index.snapshot()["entries"] == 3
+        assert [s["text"] for s in index.suggest("al")] == ["Alps", "Alpine", "Alpha", "Alto"]
+
+    asyncio.run(main())
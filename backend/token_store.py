@@ -0,0 +1,154 @@
+"""
+Shared, encrypted persistence for OAuth sessions.
+
+``SessionStore`` keeps live sessions in a bounded in-process LRU, so the
+auth hot path never leaves memory. A ``TokenStore`` is the optional tier
+behind it. It is written through on every login, refresh and logout, and
+read only on an LRU miss: a session created by another worker, or one
+evicted from this worker, or the first request after a restart.
+
+``MongoTokenStore`` stores one document per session. The tokens inside it
+are a compact JWE (``dir`` + A256GCM via python-jose) keyed from
+``TOKEN_ENCRYPTION_KEY``. Only the session id and a SHA-256 of the refresh
+token are stored in clear, for lookups.
+
+Workers sharing the store coordinate refreshes through the record: a worker
+claims a short lease, conditional on the refresh token it holds still being
+the stored one, before exchanging it. The refreshed tokens are then written
+only if that is still true, so a slow worker cannot overwrite a newer
+rotation with stale tokens.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCipher:
+    """Authenticated encryption of token payloads as compact JWE strings."""
+
+    def __init__(self, secret: str):
+        from jose import jwe
+
+        self._jwe = jwe
+        # "dir" uses the key as-is; A256GCM needs exactly 32 bytes
+        self._key = hashlib.sha256(secret.encode()).digest()
+
+    def encrypt(self, payload: Dict[str, Any]) -> str:
+        token = self._jwe.encrypt(json.dumps(payload).encode(), self._key, algorithm="dir", encryption="A256GCM")
+        return token.decode() if isinstance(token, bytes) else token
+
+    def decrypt(self, token: str) -> Optional[Dict[str, Any]]:
+        """The payload, or None if the token was tampered with or sealed under another key."""
+        from jose.exceptions import JOSEError
+
+        try:
+            return json.loads(self._jwe.decrypt(token, self._key))
+        except (JOSEError, ValueError) as e:
+            logger.warning(f"Discarding undecryptable session tokens: {str(e)}")
+            return None
+
+
+class TokenStore:
+    """Persistence tier for session records.
+
+    A record is ``{"session_id", "access_token", "refresh_token", "expires_at"}``.
+    ``refresh_hash`` is the SHA-256 of the refresh token.
+    """
+
+    async def claim_refresh(self, session_id: str, refresh_hash: str, lease_seconds: float) -> bool:
+        """Take the right to refresh the session for ``lease_seconds``.
+
+        False if the stored refresh token is no longer ``refresh_hash`` or
+        another worker holds an unexpired lease.
+        """
+        raise NotImplementedError
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def find(self, refresh_hash: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def save(self, record: Dict[str, Any], refresh_hash: str, expected_hash: Optional[str] = None) -> bool:
+        """Write the record; with ``expected_hash``, only over a record still holding that refresh token."""
+        raise NotImplementedError
+
+    async def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+
+class MongoTokenStore(TokenStore):
+    """Sessions in a MongoDB collection, tokens encrypted, expired by a TTL index after ``idle_timeout``."""
+
+    def __init__(
+        self,
+        mongo_url: str,
+        cipher: TokenCipher,
+        idle_timeout: float,
+        database: str = "spotify_clone",
+        collection: str = "oauth_sessions",
+    ):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
+        self.collection = self.client[database][collection]
+        self.cipher = cipher
+        self.idle_timeout = idle_timeout
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self) -> None:
+        if not self._indexes_ready:
+            await self.collection.create_index("refresh_hash")
+            await self.collection.create_index("expire_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+
+    def _record(self, doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if doc is None:
+            return None
+        tokens = self.cipher.decrypt(doc["tokens"])
+        return {"session_id": doc["_id"], **tokens} if tokens is not None else None
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._record(await self.collection.find_one({"_id": session_id}))
+
+    async def find(self, refresh_hash: str) -> Optional[Dict[str, Any]]:
+        return self._record(await self.collection.find_one({"refresh_hash": refresh_hash}))
+
+    async def claim_refresh(self, session_id: str, refresh_hash: str, lease_seconds: float) -> bool:
+        now = datetime.now(timezone.utc)
+        result = await self.collection.update_one(
+            {
+                "_id": session_id,
+                "refresh_hash": refresh_hash,
+                "$or": [{"refresh_lease": {"$exists": False}}, {"refresh_lease": {"$lt": now}}],
+            },
+            {"$set": {"refresh_lease": now + timedelta(seconds=lease_seconds)}},
+        )
+        return result.modified_count == 1
+
+    async def save(self, record: Dict[str, Any], refresh_hash: str, expected_hash: Optional[str] = None) -> bool:
+        await self._ensure_indexes()
+        tokens = {k: record[k] for k in ("access_token", "refresh_token", "expires_at")}
+        query = {"_id": record["session_id"]}
+        if expected_hash is not None:
+            query["refresh_hash"] = expected_hash
+        # Replacing the document also drops any refresh lease on it
+        result = await self.collection.replace_one(
+            query,
+            {
+                "_id": record["session_id"],
+                "refresh_hash": refresh_hash,
+                "tokens": self.cipher.encrypt(tokens),
+                "expire_at": datetime.now(timezone.utc) + timedelta(seconds=self.idle_timeout),
+            },
+            upsert=expected_hash is None,
+        )
+        return expected_hash is None or result.matched_count == 1
+
+    async def delete(self, session_id: str) -> None:
+        await self.collection.delete_one({"_id": session_id})
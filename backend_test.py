@@ -268,10 +268,17 @@ class SpotifyBackendTester:
         protected_endpoints = [
             ("/api/user/profile", "GET"),
             ("/api/search?q=test", "GET"),
+            ("/api/search/all?q=test", "GET"),
             ("/api/play", "POST", {"track_uri": "spotify:track:test"}),
             ("/api/pause", "POST"),
+            ("/api/player/commands", "POST", {"commands": [{"op": "pause"}]}),
             ("/api/devices", "GET"),
-            ("/api/playback/state", "GET")
+            ("/api/playback/state", "GET"),
+            ("/api/playback/stream", "GET"),
+            ("/api/library/tracks", "GET"),
+            ("/api/library/playlists", "GET"),
+            ("/api/library/sync", "POST"),
+            ("/api/export/tracks", "GET")
         ]
         
         for endpoint_info in protected_endpoints:
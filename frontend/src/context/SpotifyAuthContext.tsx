@@ -73,11 +73,12 @@ export const SpotifyAuthProvider: React.FC<SpotifyAuthProviderProps> = ({ childr
   const handleAuthCallback = async (code: string) => {
     try {
       const response = await axios.get(`${API_BASE_URL}/api/auth/callback?code=${code}`);
-      const { access_token, refresh_token } = response.data;
+      const { access_token, refresh_token, session_id } = response.data;
       
       setAccessToken(access_token);
       localStorage.setItem('spotify_access_token', access_token);
       localStorage.setItem('spotify_refresh_token', refresh_token);
+      localStorage.setItem('spotify_session_id', session_id);
       
       await fetchUserProfile(access_token);
     } catch (error) {
@@ -114,10 +115,17 @@ export const SpotifyAuthProvider: React.FC<SpotifyAuthProviderProps> = ({ childr
   };
 
   const logout = () => {
+    const storedRefreshToken = localStorage.getItem('spotify_refresh_token');
+    if (storedRefreshToken) {
+      // End the server-side session too; the local logout does not wait for it
+      axios.post(`${API_BASE_URL}/api/auth/logout`, { refresh_token: storedRefreshToken })
+        .catch((error) => console.error('Logout error:', error));
+    }
     setAccessToken(null);
     setUser(null);
     localStorage.removeItem('spotify_access_token');
     localStorage.removeItem('spotify_refresh_token');
+    localStorage.removeItem('spotify_session_id');
   };
 
   const refreshToken = async (): Promise<boolean> => {
@@ -129,9 +137,11 @@ export const SpotifyAuthProvider: React.FC<SpotifyAuthProviderProps> = ({ childr
         refresh_token: storedRefreshToken
       });
       
-      const { access_token } = response.data;
+      const { access_token, refresh_token, session_id } = response.data;
       setAccessToken(access_token);
       localStorage.setItem('spotify_access_token', access_token);
+      localStorage.setItem('spotify_refresh_token', refresh_token);
+      localStorage.setItem('spotify_session_id', session_id);
       
       await fetchUserProfile(access_token);
       return true;
@@ -38,7 +38,14 @@ interface SpotifyPlaylist {
   uri: string;
 }
 
+interface Suggestion {
+  text: string;
+  kind: string;
+}
+
 const API_BASE_URL = import.meta.env.VITE_REACT_APP_BACKEND_URL || 'http://localhost:8001';
+// Full searches wait until typing pauses; suggestions are fetched on every keystroke
+const SEARCH_DEBOUNCE_MS = 300;
 
 const Search: React.FC = () => {
   const { accessToken } = useSpotifyAuth();
@@ -55,6 +62,8 @@ const Search: React.FC = () => {
   });
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+  const [showSuggestions, setShowSuggestions] = useState(false);
 
   const browseCategories = [
     { name: 'Pop', color: 'bg-pink-500', image: 'https://picsum.photos/300/300?random=1' },
@@ -72,23 +81,16 @@ const Search: React.FC = () => {
     setError(null);
     
     try {
-      // Search for tracks, artists, and playlists
-      const [tracksResponse, artistsResponse, playlistsResponse] = await Promise.all([
-        axios.get(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}&type=track&limit=10`, {
-          headers: { Authorization: `Bearer ${accessToken}` }
-        }),
-        axios.get(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}&type=artist&limit=6`, {
-          headers: { Authorization: `Bearer ${accessToken}` }
-        }),
-        axios.get(`${API_BASE_URL}/api/search?q=${encodeURIComponent(query)}&type=playlist&limit=6`, {
-          headers: { Authorization: `Bearer ${accessToken}` }
-        })
-      ]);
+      // Search for tracks, artists, and playlists in a single round-trip
+      const response = await axios.get(`${API_BASE_URL}/api/search/all`, {
+        params: { q: query, track_limit: 10, artist_limit: 6, playlist_limit: 6 },
+        headers: { Authorization: `Bearer ${accessToken}` }
+      });
 
       setSearchResults({
-        tracks: tracksResponse.data.tracks?.items || [],
-        artists: artistsResponse.data.artists?.items || [],
-        playlists: playlistsResponse.data.playlists?.items || []
+        tracks: response.data.tracks || [],
+        artists: response.data.artists || [],
+        playlists: response.data.playlists || []
       });
     } catch (error: any) {
       console.error('Search error:', error);
@@ -98,22 +100,49 @@ const Search: React.FC = () => {
     }
   };
 
+  useEffect(() => {
+    if (!searchQuery.trim() || !accessToken) {
+      setSuggestions([]);
+      return;
+    }
+
+    // Ignore answers for a prefix the user has already typed past
+    let current = true;
+    axios.get(`${API_BASE_URL}/api/search/suggest`, {
+      params: { q: searchQuery, limit: 8 },
+      headers: { Authorization: `Bearer ${accessToken}` }
+    }).then((response) => {
+      if (current) setSuggestions(response.data.suggestions || []);
+    }).catch(() => {
+      if (current) setSuggestions([]);
+    });
+
+    const timer = setTimeout(() => searchSpotify(searchQuery), SEARCH_DEBOUNCE_MS);
+    return () => {
+      current = false;
+      clearTimeout(timer);
+    };
+  }, [searchQuery, accessToken]);
+
   const handleSearch = (query: string) => {
     setSearchQuery(query);
-    if (query.trim()) {
-      searchSpotify(query);
-    } else {
+    setShowSuggestions(true);
+    if (!query.trim()) {
       setSearchResults({ tracks: [], artists: [], playlists: [] });
     }
   };
 
+  const handleSuggestionClick = (suggestion: Suggestion) => {
+    setSearchQuery(suggestion.text);
+    setShowSuggestions(false);
+  };
+
   const handleTrackPlay = (track: SpotifyTrack) => {
     playTrack(track.uri);
   };
 
   const handleCategoryClick = (categoryName: string) => {
     setSearchQuery(categoryName);
-    searchSpotify(categoryName);
   };
 
   return (
@@ -126,8 +155,26 @@ const Search: React.FC = () => {
           placeholder="What do you want to listen to?"
           value={searchQuery}
           onChange={(e) => handleSearch(e.target.value)}
+          onBlur={() => setShowSuggestions(false)}
           className="w-full bg-white rounded-full py-4 pl-14 pr-6 text-black placeholder-gray-500 focus:outline-none focus:ring-2 focus:ring-spotify-green"
         />
+        {showSuggestions && suggestions.length > 0 && (
+          <ul className="absolute left-0 right-0 top-full mt-2 bg-spotify-lightGray rounded-lg py-2 z-10 shadow-lg">
+            {suggestions.map((suggestion) => (
+              <li
+                key={`${suggestion.kind}:${suggestion.text}`}
+                // onMouseDown fires before the input's blur hides the list
+                onMouseDown={() => handleSuggestionClick(suggestion)}
+                className="flex items-center justify-between px-6 py-2 text-white hover:bg-gray-700 cursor-pointer"
+              >
+                <span>{suggestion.text}</span>
+                {suggestion.kind !== 'query' && (
+                  <span className="text-xs text-gray-400 uppercase">{suggestion.kind}</span>
+                )}
+              </li>
+            ))}
+          </ul>
+        )}
       </div>
 
       {/* Error Display */}